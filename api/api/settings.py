@@ -9,10 +9,13 @@ https://docs.djangoproject.com/en/5.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
+import os
 import cv2
 
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -81,13 +84,118 @@ WSGI_APPLICATION = 'api.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Perfil escolhido por DB_PROFILE (compare com: python manage.py bench_db --profiles sqlite,sqlite-wal):
+#   sqlite        (padrão) configuração padrão do Django (journal em rollback)
+#   sqlite-wal    WAL + busy_timeout: leituras não bloqueiam a escrita e
+#                 escritas concorrentes (web + Celery) esperam em vez de falhar.
+#                 O journal_mode=WAL fica gravado no arquivo (e cria -wal/-shm ao
+#                 lado): use com um SQLITE_PATH próprio, não com o db.sqlite3 do repositório
+#   postgres      conexões persistentes (CONN_MAX_AGE)
+#   postgres-pool pool de conexões do psycopg 3 (Django >= 5.1)
+
+DB_PROFILE = os.environ.get('DB_PROFILE', 'sqlite')
+SQLITE_PATH = os.environ.get('SQLITE_PATH', str(BASE_DIR / 'db.sqlite3'))
+
+POSTGRES = {
+    'ENGINE': 'django.db.backends.postgresql',
+    'NAME': os.environ.get('POSTGRES_DB', 'django_yolo'),
+    'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+    'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+    'HOST': os.environ.get('POSTGRES_HOST', '127.0.0.1'),
+    'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+}
+
+DATABASE_PROFILES = {
+    'sqlite': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': SQLITE_PATH,
+    },
+    'sqlite-wal': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': SQLITE_PATH,
+        'OPTIONS': {
+            # Espera pelo lock de escrita (segundos) em vez de "database is locked"
+            'timeout': 20,
+            # Transações pegam o lock de escrita no BEGIN: sem deadlock na troca leitura -> escrita
+            'transaction_mode': 'IMMEDIATE',
+            # Aplicado em cada conexão nova
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA busy_timeout=20000;'
+                'PRAGMA mmap_size=134217728;'
+                'PRAGMA cache_size=-20000;'
+                'PRAGMA temp_store=MEMORY'
+            ),
+        },
+    },
+    'postgres': {
+        **POSTGRES,
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+    },
+    'postgres-pool': {
+        **POSTGRES,
+        # Com pool, CONN_MAX_AGE tem que ser 0 (o pool reaproveita as conexões)
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.environ.get('DB_POOL_MIN', '2')),
+                'max_size': int(os.environ.get('DB_POOL_MAX', '10')),
+                'timeout': 10,
+            },
+        },
+    },
+}
+
+if DB_PROFILE not in DATABASE_PROFILES:
+    raise ImproperlyConfigured(f"DB_PROFILE inválido: {DB_PROFILE} (use {', '.join(DATABASE_PROFILES)})")
+
 DATABASES = {
+    'default': DATABASE_PROFILES[DB_PROFILE],
+}
+
+
+# Cache
+# Guarda o estado do Environment servido pelas views (ver app/env_cache.py).
+# O padrão (arquivos locais) já é compartilhado entre os workers da mesma
+# máquina; em produção prefira Redis:
+#   CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+#   CACHE_LOCATION=redis://127.0.0.1:6379/1
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', str(BASE_DIR / '.cache')),
     }
 }
 
+# Intervalo (s) do write-behind do Environment; 0 grava no banco a cada mudança
+ENVIRONMENT_FLUSH_INTERVAL = float(os.environ.get('ENVIRONMENT_FLUSH_INTERVAL', '1.0'))
+# Última contagem de cada câmera (lote em /api/people-detection/batch/); some
+# da soma se a câmera ficar este tempo (s) sem mandar leitura
+CAMERA_COUNT_TTL = float(os.environ.get('CAMERA_COUNT_TTL', '30.0'))
+# Área de cada câmera ("cam1:sala,cam2:corredor"): câmeras da mesma área (ou sem área) contam
+# pela maior contagem, áreas diferentes são somadas (ver app/tracking.py, combine_camera_counts)
+CAMERA_AREAS = os.environ.get('CAMERA_AREAS', '')
+
+# Status em tempo real (SSE em /api/status/stream/, ver app/streaming.py).
+# Precisa de servidor ASGI, ex.: uvicorn api.asgi:application
+STATUS_STREAM_POLL_INTERVAL = float(os.environ.get('STATUS_STREAM_POLL_INTERVAL', '0.05'))
+STATUS_STREAM_QUEUE_SIZE = int(os.environ.get('STATUS_STREAM_QUEUE_SIZE', '32'))
+STATUS_STREAM_HEARTBEAT = float(os.environ.get('STATUS_STREAM_HEARTBEAT', '15.0'))
+
+# Telemetria: amostras gravadas em lote (ver app/telemetry.py)
+TELEMETRY_BATCH_SIZE = int(os.environ.get('TELEMETRY_BATCH_SIZE', '500'))
+TELEMETRY_FLUSH_INTERVAL = float(os.environ.get('TELEMETRY_FLUSH_INTERVAL', '2.0'))
+
+# Log de eventos: gravado em lote (app/event_log.py); linhas mais antigas que
+# LOG_RETENTION_DAYS vão para LOG_ARCHIVE_DIR em .jsonl.gz (python manage.py compact_logs)
+LOG_BATCH_SIZE = int(os.environ.get('LOG_BATCH_SIZE', '200'))
+LOG_FLUSH_INTERVAL = float(os.environ.get('LOG_FLUSH_INTERVAL', '1.0'))
+LOG_RETENTION_DAYS = int(os.environ.get('LOG_RETENTION_DAYS', '30'))
+LOG_ARCHIVE_DIR = os.environ.get('LOG_ARCHIVE_DIR', str(BASE_DIR / 'log_archive'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -129,3 +237,56 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Worker de visão (câmera + YOLO + LBPH num processo só)
+# Inicie com: python manage.py run_vision_worker
+
+VISION_WORKER_ADDRESS = os.environ.get('VISION_WORKER_ADDRESS', 'tcp://127.0.0.1:8765' if os.name == 'nt' else str(BASE_DIR / 'vision.sock'))
+VISION_CAMERA_INDEX = int(os.environ.get('VISION_CAMERA_INDEX', '0'))
+YOLO_MODEL_PATH = os.environ.get('YOLO_MODEL_PATH', str(BASE_DIR / 'app' / 'yolov8n.pt'))
+# Backend do YOLO: torch, onnx, openvino ou int8 (exportar antes com: python manage.py export_yolo)
+YOLO_BACKEND = os.environ.get('YOLO_BACKEND', 'torch')
+YOLO_IMGSZ = int(os.environ.get('YOLO_IMGSZ', '640'))
+# Frames da câmera da sala para calibrar o INT8 e comparar os backends (o dataset de rostos
+# não serve: são closes, não a cena que o YOLO vê). Se a pasta estiver vazia, o export_yolo
+# captura os frames da VISION_CAMERA_INDEX
+YOLO_CALIBRATION_DIR = os.environ.get('YOLO_CALIBRATION_DIR', str(BASE_DIR / 'calibration_frames'))
+# Pasta com os modelos LBPH versionados (yolo_training/training.py e enroll.py) ou um .yml avulso.
+# O worker confere a cada FACE_MODEL_CHECK_INTERVAL segundos se há versão nova e troca sem reiniciar
+FACE_MODEL_PATH = os.environ.get('FACE_MODEL_PATH', str(BASE_DIR / 'app' / 'face_models'))
+FACE_MODEL_CHECK_INTERVAL = float(os.environ.get('FACE_MODEL_CHECK_INTERVAL', '2.0'))
+# Orçamento da decisão de acesso por votação (para antes se a decisão ficar clara)
+VISION_DECISION_MAX_FRAMES = int(os.environ.get('VISION_DECISION_MAX_FRAMES', '15'))
+VISION_DECISION_MAX_SECONDS = float(os.environ.get('VISION_DECISION_MAX_SECONDS', '2.0'))
+# Validade (s) da lista de RFIDs autorizados em memória (app/allowlist.py): limita quanto
+# tempo uma mudança feita sem sinal (ex.: UPDATE direto no banco) demora a valer
+ALLOWLIST_MAX_AGE = float(os.environ.get('ALLOWLIST_MAX_AGE', '60.0'))
+
+
+# ESP32 (sensores, RFID e LEDs). Cliente compartilhado em app/esp32.py
+# Para testar sem a placa: python manage.py esp32_stub e ESP32_URL=http://127.0.0.1:8090
+
+ESP32_URL = os.environ.get('ESP32_URL', 'http://192.168.4.1')
+ESP32_CONNECT_TIMEOUT = float(os.environ.get('ESP32_CONNECT_TIMEOUT', '0.5'))
+ESP32_READ_TIMEOUT = float(os.environ.get('ESP32_READ_TIMEOUT', '1.5'))
+# Quanto tempo uma leitura de /status é reaproveitada por requisições simultâneas
+ESP32_STATUS_TTL = float(os.environ.get('ESP32_STATUS_TTL', '1.0'))
+# Circuit breaker: após N falhas seguidas, não chama a placa por RESET_TIMEOUT segundos
+ESP32_FAILURE_THRESHOLD = int(os.environ.get('ESP32_FAILURE_THRESHOLD', '3'))
+ESP32_RESET_TIMEOUT = float(os.environ.get('ESP32_RESET_TIMEOUT', '15.0'))
+# Poller em segundo plano (python manage.py poll_esp32 ou a task poll_esp32_task no beat)
+ESP32_RFID_POLL_INTERVAL = float(os.environ.get('ESP32_RFID_POLL_INTERVAL', '1.0'))
+ESP32_STATUS_POLL_INTERVAL = float(os.environ.get('ESP32_STATUS_POLL_INTERVAL', '5.0'))
+
+# Agenda do Celery beat (app Celery configurado com namespace='CELERY')
+CELERY_BEAT_SCHEDULE = {
+    'poll-esp32': {
+        'task': 'app.tasks.poll_esp32_task',
+        'schedule': ESP32_RFID_POLL_INTERVAL,
+    },
+    'compact-logs': {
+        'task': 'app.tasks.compact_logs_task',
+        'schedule': 24 * 60 * 60,
+    },
+}
@@ -0,0 +1,123 @@
+import math
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+
+def percentiles(values, points=(50, 90, 99)):
+    if not values:
+        return {f"p{p}": None for p in points}
+    data = np.asarray(values, dtype=np.float64)
+    return {f"p{p}": round(float(np.percentile(data, p)), 2) for p in points}
+
+
+class AccessDecisionEngine:
+    """
+    Decide o acesso acumulando votos de vários frames (teste sequencial de razão
+    de verossimilhança, SPRT) em vez de confiar em um frame só.
+
+    - rosto da pessoa esperada abaixo do limiar: voto a favor, com peso maior
+      quanto menor a distância do LBPH;
+    - rosto visto mas de outra pessoa / acima do limiar: voto contra;
+    - frame sem pessoa ou sem rosto (borrão, oclusão): não vota.
+
+    Para assim que o placar cruza um dos limites, ou quando acaba o orçamento
+    de frames/tempo (nesse caso nega).
+
+    O SPRT supõe votos independentes: cada frame é reconhecido de novo, sem o
+    cache por trilha do FaceMatcher (um acerto em cache votaria o mesmo
+    resultado em todos os frames e aceitaria com uma única evidência).
+    """
+
+    def __init__(self, matcher, read_frame, detect_people, confidence_threshold=80,
+                 max_frames=15, max_seconds=2.0, p_genuine=0.8, p_impostor=0.1,
+                 alpha=0.01, beta=0.05, history=500):
+        self.matcher = matcher
+        self.read_frame = read_frame
+        self.detect_people = detect_people
+        self.confidence_threshold = confidence_threshold
+        self.max_frames = max_frames
+        self.max_seconds = max_seconds
+
+        # Quanto cada voto move o placar (log da razão de verossimilhança)
+        self.llr_match = math.log(p_genuine / p_impostor)
+        self.llr_mismatch = math.log((1 - p_genuine) / (1 - p_impostor))
+        # alpha = aceitar um impostor, beta = negar a pessoa certa
+        self.accept_at = math.log((1 - beta) / alpha)
+        self.reject_at = math.log(beta / (1 - alpha))
+
+        self.frames_to_decision = deque(maxlen=history)
+        self.time_to_decision = deque(maxlen=history)
+        self.outcomes = Counter()
+
+    def vote(self, identities, face_id):
+        """ Converte as identidades de um frame num incremento do placar """
+        best_match = None
+        saw_face = False
+        for _, label, confidence in identities:
+            if label is None:
+                continue
+            saw_face = True
+            if label == face_id and confidence < self.confidence_threshold:
+                if best_match is None or confidence < best_match:
+                    best_match = confidence
+
+        if best_match is not None:
+            # Distância 0 pesa 2x, distância no limiar pesa 1x
+            weight = 1.0 + (self.confidence_threshold - best_match) / self.confidence_threshold
+            return self.llr_match * weight
+        if saw_face:
+            return self.llr_mismatch
+        return 0.0
+
+    def decide(self, face_id, max_frames=None, max_seconds=None):
+        max_frames = self.max_frames if max_frames is None else min(max_frames, self.max_frames)
+        max_seconds = self.max_seconds if max_seconds is None else min(max_seconds, self.max_seconds)
+        start = time.monotonic()
+        deadline = start + max_seconds
+        score = 0.0
+        frames = 0
+        votes = 0
+        reason = "budget"
+
+        while frames < max_frames and time.monotonic() < deadline:
+            frame = self.read_frame(max(0.0, deadline - time.monotonic()))
+            if frame is None:
+                continue
+            frames += 1
+
+            identities = self.matcher.identify(frame, self.detect_people(frame), fresh=True)
+            delta = self.vote(identities, face_id)
+            if delta:
+                votes += 1
+                score += delta
+
+            if score >= self.accept_at:
+                reason = "accepted"
+                break
+            if score <= self.reject_at:
+                reason = "rejected"
+                break
+
+        elapsed = time.monotonic() - start
+        granted = reason == "accepted"
+        self.frames_to_decision.append(frames)
+        self.time_to_decision.append(elapsed * 1000)
+        self.outcomes[reason] += 1
+        return {
+            "granted": granted,
+            "reason": reason,
+            "frames": frames,
+            "votes": votes,
+            "score": round(score, 3),
+            "elapsed_ms": round(elapsed * 1000, 1),
+        }
+
+    def stats(self):
+        return {
+            "decisions": sum(self.outcomes.values()),
+            "outcomes": dict(self.outcomes),
+            "frames_to_decision": percentiles(list(self.frames_to_decision)),
+            "time_to_decision_ms": percentiles(list(self.time_to_decision)),
+        }
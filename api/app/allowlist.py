@@ -0,0 +1,75 @@
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import User
+
+# Lista de RFIDs autorizados em memória.
+#
+# Cada processo (Django, Celery) guarda um dict rfid -> usuário. Um toque de
+# cartão só lê a chave de version no cache compartilhado e faz um lookup no
+# dict, sem ir ao banco. Qualquer save/delete de User, e também update() e
+# bulk_* em User.objects, troca o version (ver signals.py) e cada processo
+# recarrega a lista inteira na próxima consulta. O version expira em
+# ALLOWLIST_MAX_AGE segundos: uma mudança que não passa pelo ORM (SQL direto)
+# vale no máximo depois desse tempo.
+
+VERSION_KEY = "allowlist:version"
+
+
+def load_allowlist():
+    """ {rfid: {"user_id", "name", "face_label"}} dos usuários autorizados """
+    return {
+        rfid: {"user_id": pk, "name": name, "face_label": face_label}
+        for pk, name, rfid, face_label in User.objects.filter(is_authorized=True)
+                                                      .values_list("pk", "name", "rfid", "face_label")
+    }
+
+
+class AllowlistCache:
+    def __init__(self, max_age=None):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._version = None
+
+        self.lookups = 0
+        self.reloads = 0
+
+    def _current_version(self):
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            version = uuid.uuid4().hex
+            # add: se outro processo publicou um version ao mesmo tempo, vale o dele
+            if not cache.add(VERSION_KEY, version, timeout=self.max_age):
+                version = cache.get(VERSION_KEY) or version
+        return version
+
+    def lookup(self, rfid):
+        """ Usuário autorizado para o RFID (dict) ou None """
+        version = self._current_version()
+        with self._lock:
+            if version != self._version:
+                self._entries = load_allowlist()
+                self._version = version
+                self.reloads += 1
+            self.lookups += 1
+            entry = self._entries.get(rfid)
+        return dict(entry) if entry else None
+
+    def invalidate(self):
+        """ Todos os processos recarregam na próxima consulta """
+        cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=self.max_age)
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "version": self._version,
+            "lookups": self.lookups,
+            "reloads": self.reloads,
+        }
+
+
+allowlist = AllowlistCache(max_age=settings.ALLOWLIST_MAX_AGE or None)
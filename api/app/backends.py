@@ -0,0 +1,127 @@
+import os
+
+import numpy as np
+
+# Backends de inferência do YOLO em CPU:
+#   torch    -> yolov8n.pt pelo PyTorch (padrão)
+#   onnx     -> yolov8n.onnx pelo ONNX Runtime
+#   openvino -> yolov8n_openvino_model/ pelo OpenVINO
+#   int8     -> yolov8n_int8.onnx, quantizado estaticamente com os frames de calibração
+BACKENDS = ("torch", "onnx", "openvino", "int8")
+DEFAULT_BACKEND = "torch"
+DEFAULT_IMGSZ = 640
+
+
+def exported_path(backend, pt_path):
+    """ Caminho do modelo exportado para o backend, ao lado do .pt """
+    stem, _ = os.path.splitext(pt_path)
+    if backend == "torch":
+        return pt_path
+    if backend == "onnx":
+        return f"{stem}.onnx"
+    if backend == "openvino":
+        return f"{stem}_openvino_model"
+    if backend == "int8":
+        return f"{stem}_int8.onnx"
+    raise ValueError(f"Backend desconhecido: {backend} (use um de {', '.join(BACKENDS)})")
+
+
+class Detector:
+    """
+    Envolve o YOLO do backend escolhido e fixa a resolução de entrada, para que
+    quem chama (InferenceEngine, tasks) use sempre `detector(frames, **kwargs)`.
+    """
+
+    def __init__(self, model, backend, imgsz, path):
+        self.model = model
+        self.backend = backend
+        self.imgsz = imgsz
+        self.path = path
+
+    def __call__(self, source, **kwargs):
+        kwargs.setdefault("imgsz", self.imgsz)
+        return self.model(source, **kwargs)
+
+    def __repr__(self):
+        return f"Detector(backend={self.backend!r}, imgsz={self.imgsz}, path={self.path!r})"
+
+
+def load_detector(pt_path, backend=DEFAULT_BACKEND, imgsz=DEFAULT_IMGSZ):
+    """
+    O .pt do torch pode não existir ainda: o YOLO() baixa os pesos oficiais
+    (yolov8n.pt etc.). Os outros backends só existem depois do export_yolo.
+    """
+    path = exported_path(backend, pt_path)
+    if backend != "torch" and not os.path.exists(path):
+        raise FileNotFoundError(f"Modelo {backend} não encontrado em {path}; rode: python manage.py export_yolo --backends {backend}")
+
+    from ultralytics import YOLO
+
+    model = YOLO(path) if backend == "torch" else YOLO(path, task="detect")
+    return Detector(model, backend, imgsz, path)
+
+
+def letterbox(frame, imgsz):
+    """ Mesmo pré-processamento do YOLO: redimensiona mantendo proporção e completa com cinza """
+    import cv2
+
+    h, w = frame.shape[:2]
+    scale = min(imgsz / h, imgsz / w)
+    nh, nw = int(round(h * scale)), int(round(w * scale))
+    resized = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - nh) // 2, (imgsz - nw) // 2
+    canvas[top:top+nh, left:left+nw] = resized
+    # BGR HWC uint8 -> RGB CHW float32 [0, 1], com dimensão de lote
+    return np.ascontiguousarray(canvas[:, :, ::-1].transpose(2, 0, 1), dtype=np.float32)[None] / 255.0
+
+
+def export_model(pt_path, backend, imgsz=DEFAULT_IMGSZ, calibration_frames=None):
+    """ Exporta o .pt para o backend pedido e devolve o caminho gerado """
+    from ultralytics import YOLO
+
+    if backend == "torch":
+        return pt_path
+
+    model = YOLO(pt_path)
+    if backend == "onnx":
+        # dynamic=True para o InferenceEngine poder mandar lotes de tamanho variável
+        return model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+    if backend == "openvino":
+        return model.export(format="openvino", imgsz=imgsz, dynamic=True)
+    if backend == "int8":
+        return quantize_int8(pt_path, imgsz, calibration_frames)
+    raise ValueError(f"Backend desconhecido: {backend}")
+
+
+def quantize_int8(pt_path, imgsz, calibration_frames):
+    """ Quantização estática (QDQ) do ONNX com os frames de calibração """
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    if not calibration_frames:
+        raise ValueError("A quantização INT8 precisa de frames de calibração")
+
+    fp32_path = exported_path("onnx", pt_path)
+    if not os.path.exists(fp32_path):
+        export_model(pt_path, "onnx", imgsz)
+    int8_path = exported_path("int8", pt_path)
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            import onnxruntime
+            input_name = onnxruntime.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+            self._items = iter([{input_name: letterbox(frame, imgsz)} for frame in calibration_frames])
+
+        def get_next(self):
+            return next(self._items, None)
+
+    quantize_static(
+        fp32_path,
+        int8_path,
+        Reader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+    return int8_path
@@ -0,0 +1,96 @@
+import atexit
+import threading
+import time
+
+from django.db import close_old_connections
+
+
+class BufferedWriter:
+    """
+    Junta itens em memória e grava em lote numa thread própria: quando o buffer
+    chega a `max_batch` itens ou a cada `interval` segundos. `append()` não
+    toca no banco. Se o flush falhar, os itens voltam para o buffer (até
+    `max_pending`, depois os mais antigos são descartados).
+    """
+
+    def __init__(self, flush_fn, max_batch=500, interval=1.0, max_pending=50000, name="buffered-writer"):
+        self.flush_fn = flush_fn
+        self.max_batch = max_batch
+        self.interval = interval
+        self.max_pending = max_pending
+        self.name = name
+
+        self._items = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.errors = 0
+
+        atexit.register(self.flush)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._worker, name=self.name, daemon=True)
+            self._thread.start()
+
+    def append(self, item):
+        with self._lock:
+            self._items.append(item)
+            if len(self._items) > self.max_pending:
+                overflow = len(self._items) - self.max_pending
+                del self._items[:overflow]
+                self.dropped += overflow
+            full = len(self._items) >= self.max_batch
+            self._ensure_thread()
+        if full:
+            self._wakeup.set()
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def _worker(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """ Grava tudo que estiver pendente; retorna quantos itens foram gravados """
+        with self._flush_lock:
+            total = 0
+            while True:
+                with self._lock:
+                    batch, self._items = self._items[:self.max_batch], self._items[self.max_batch:]
+                if not batch:
+                    return total
+                try:
+                    self.flush_fn(batch)
+                except Exception as e:
+                    self.errors += 1
+                    with self._lock:
+                        self._items[:0] = batch
+                    print(f"Erro ao gravar lote em {self.name}: {e}")
+                    return total
+                self.written += len(batch)
+                self.batches += 1
+                total += len(batch)
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._items)
+        return {
+            "pending": pending,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
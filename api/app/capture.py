@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+
+
+def find_working_camera(max_index=5):
+    """ Retorna o índice da primeira câmera que abre, ou None """
+    for i in range(max_index + 1):
+        cap = cv2.VideoCapture(i)
+        if cap.isOpened():
+            cap.release()
+            return i
+        cap.release()
+    return None
+
+
+class FrameGrabber:
+    """
+    Lê a câmera numa thread própria e guarda só os frames mais recentes
+    num buffer circular. Quem consome sempre pega o frame mais novo; os
+    antigos são descartados e contados em `dropped_frames`.
+    """
+
+    def __init__(self, source, width=640, height=480, buffer_size=2, name=None):
+        self.source = source
+        self.width = width
+        self.height = height
+        self.name = name or f"camera-{source}"
+
+        self._buffer = deque(maxlen=max(1, buffer_size))
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._cap = None
+
+        # Contadores expostos para o resto do pipeline
+        self._seq = 0
+        self._last_consumed_seq = 0
+        self.frames_read = 0
+        self.dropped_frames = 0
+        self.read_errors = 0
+        self.capture_fps = 0.0
+        self.last_frame_age = 0.0
+
+    def start(self):
+        if self._running:
+            return self
+        self._cap = cv2.VideoCapture(self.source)
+        if not self._cap.isOpened():
+            raise RuntimeError(f"Não foi possível abrir a câmera {self.source}")
+        self._cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self._cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        # Pede ao driver o menor buffer possível (nem todo backend respeita)
+        self._cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        self._running = True
+        self._thread = threading.Thread(target=self._reader, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _reader(self):
+        last_ts = None
+        while self._running:
+            ret, frame = self._cap.read()
+            if not ret:
+                self.read_errors += 1
+                time.sleep(0.01)
+                continue
+
+            now = time.monotonic()
+            if last_ts is not None:
+                # Média móvel exponencial para o FPS não oscilar a cada frame
+                inst_fps = 1.0 / max(now - last_ts, 1e-6)
+                self.capture_fps = inst_fps if not self.capture_fps else 0.9 * self.capture_fps + 0.1 * inst_fps
+            last_ts = now
+
+            with self._cond:
+                if len(self._buffer) == self._buffer.maxlen:
+                    self.dropped_frames += 1
+                self._seq += 1
+                self._buffer.append((self._seq, now, frame))
+                self.frames_read += 1
+                self._cond.notify_all()
+
+    def read(self, timeout=1.0):
+        """
+        Retorna (frame, timestamp) do frame mais novo ainda não consumido.
+        Bloqueia até `timeout` segundos; retorna (None, None) se nada chegar.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._running and (not self._buffer or self._buffer[-1][0] <= self._last_consumed_seq):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None, None
+                self._cond.wait(remaining)
+
+            if not self._buffer:
+                return None, None
+
+            seq, ts, frame = self._buffer[-1]
+            # Frames mais velhos que nunca foram consumidos também contam como descartados
+            self.dropped_frames += sum(1 for s, _, _ in list(self._buffer)[:-1] if s > self._last_consumed_seq)
+            self._buffer.clear()
+            self._last_consumed_seq = seq
+
+        self.last_frame_age = time.monotonic() - ts
+        return frame, ts
+
+    def stats(self):
+        return {
+            "camera": self.name,
+            "frames_read": self.frames_read,
+            "dropped_frames": self.dropped_frames,
+            "read_errors": self.read_errors,
+            "capture_fps": round(self.capture_fps, 1),
+            "frame_age_ms": round(self.last_frame_age * 1000, 1),
+        }
@@ -0,0 +1,360 @@
+import atexit
+import copy
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import close_old_connections
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from .models import Environment
+
+# Estado do Environment (linha única) servido da memória.
+#
+# - Cada processo guarda uma cópia local do estado e o "version" que ela tem.
+# - No cache compartilhado (settings.CACHES) ficam o estado atual e o version.
+#   Um GET só consulta a chave de version (bem pequena); se bater com a cópia
+#   local, responde da memória.
+# - Atualizações mudam o estado no cache compartilhado, trocam o version (todos
+#   os workers percebem no próximo GET) e marcam os campos como sujos. Uma
+#   thread grava os campos sujos no banco a cada FLUSH_INTERVAL (write-behind)
+#   com UPDATE só dessas colunas.
+# - Qualquer save() direto do model (admin, tasks antigas) relê do banco os
+#   campos salvos pelo sinal post_save (ver signals.py).
+# - O read-modify-write entre workers passa pelo SharedLock, que precisa de
+#   uma operação atômica de verdade (ver abaixo).
+
+STATE_KEY = "environment:state"
+VERSION_KEY = "environment:version"
+LOCK_KEY = "environment:lock"
+
+FIELDS = [f.attname for f in Environment._meta.concrete_fields]
+# Também fica só no estado compartilhado: última contagem de cada câmera
+CAMERA_COUNTS = "camera_counts"
+
+
+def load_environment():
+    return Environment.objects.order_by("pk").first() or Environment.objects.create()
+
+
+def environment_to_state(env):
+    state = {name: copy.copy(getattr(env, name)) for name in FIELDS}
+    # Não é coluna: vem da tabela Occupant, mas também é servido da memória
+    state["detected_people"] = list(env.detected_people)
+    return state
+
+
+def state_to_environment(state):
+    state = copy.deepcopy(state)
+    detected_people = state.pop("detected_people", None)
+    state.pop(CAMERA_COUNTS, None)
+    env = Environment(**state)
+    env._state.adding = False
+    env._detected_people = detected_people
+    return env
+
+
+class SharedLock:
+    """
+    Lock entre processos para o read-modify-write do estado compartilhado.
+
+    - FileBasedCache: todos os workers estão na mesma máquina, então o lock é
+      um flock num arquivo da pasta do cache (o add() desse backend não é
+      atômico). O sistema solta o lock sozinho se o processo morrer.
+    - Backends com add() atômico (Redis, Memcached, DatabaseCache): a chave
+      guarda um token do dono e expira em `timeout`; só o dono a apaga, e
+      ninguém rouba o lock de quem ainda está dentro do prazo.
+    - LocMemCache: o cache nem é compartilhado entre processos; o lock da
+      thread (no EnvironmentStateCache) já basta.
+    """
+
+    def __init__(self, key, timeout=5.0, mode=None):
+        self.key = key
+        self.timeout = timeout
+        self.mode = mode or self.detect_mode()
+        self.expired = 0
+        # Reentrante na mesma thread (ex.: o post_save de um create() dentro de update_with)
+        self._held = threading.local()
+
+    @staticmethod
+    def detect_mode():
+        backend = caches["default"]
+        if isinstance(backend, FileBasedCache):
+            return "file"
+        if isinstance(backend, LocMemCache):
+            return "local"
+        return "token"
+
+    @contextmanager
+    def hold(self):
+        depth = getattr(self._held, "depth", 0)
+        self._held.depth = depth + 1
+        try:
+            if depth:
+                yield
+            else:
+                with self._acquire():
+                    yield
+        finally:
+            self._held.depth = depth
+
+    @contextmanager
+    def _acquire(self):
+        if self.mode == "file":
+            with self._file_lock():
+                yield
+        elif self.mode == "token":
+            token = self._acquire_token()
+            try:
+                yield
+            finally:
+                self._release_token(token)
+        else:
+            yield
+
+    @contextmanager
+    def _file_lock(self):
+        directory = caches["default"]._dir
+        os.makedirs(directory, exist_ok=True)
+        # Um descritor por uso: dois workers (ou duas instâncias) nunca dividem o flock
+        with open(os.path.join(directory, f"{self.key.replace(':', '_')}.lock"), "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _acquire_token(self):
+        token = uuid.uuid4().hex
+        # A chave expira em `timeout`: se o dono morreu, o add volta a funcionar sozinho
+        deadline = time.monotonic() + self.timeout * 2
+        while not cache.add(self.key, token, timeout=self.timeout):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Lock {self.key} ocupado há mais de {self.timeout * 2:.0f}s")
+            time.sleep(0.001)
+        return token
+
+    def _release_token(self, token):
+        # Depois de expirar, a chave pode ser de outro dono: só apaga se ainda for nossa
+        if cache.get(self.key) == token:
+            cache.delete(self.key)
+        else:
+            self.expired += 1
+
+
+class EnvironmentStateCache:
+    def __init__(self, flush_interval=1.0, lock_timeout=5.0, lock_mode=None):
+        self.flush_interval = flush_interval
+        self.lock_timeout = lock_timeout
+        self.shared_lock = SharedLock(LOCK_KEY, lock_timeout, mode=lock_mode)
+
+        self._lock = threading.RLock()
+        self._state = None
+        self._version = None
+        # Campos alterados por este processo e ainda não gravados -> último valor escrito
+        self._dirty = {}
+        self._flusher = None
+
+        self.hits = 0
+        self.reloads = 0
+        self.flushes = 0
+
+    # ---------------- Leitura ----------------
+
+    def _load_shared(self):
+        """ Estado do cache compartilhado; se não houver, carrega do banco e publica """
+        version = cache.get(VERSION_KEY)
+        state = cache.get(STATE_KEY) if version is not None else None
+        if state is None:
+            state = environment_to_state(load_environment())
+            # O cache perdeu o estado (reinício, descarte): o que este processo
+            # ainda não gravou continua valendo por cima do banco
+            with self._lock:
+                state.update(self._dirty)
+            version = uuid.uuid4().hex
+            cache.set_many({STATE_KEY: state, VERSION_KEY: version}, timeout=None)
+        return state, version
+
+    def _sync(self):
+        """ Confere o version no cache compartilhado e recarrega se mudou (com o lock) """
+        version = cache.get(VERSION_KEY)
+        if version is not None and version == self._version:
+            self.hits += 1
+        else:
+            self._state, self._version = self._load_shared()
+            self.reloads += 1
+
+    def get_state(self):
+        """ Cópia do estado atual (dict com os campos do model) """
+        with self._lock:
+            self._sync()
+            return copy.deepcopy(self._state)
+
+    def get_versioned(self):
+        """ (version, cópia do estado) lidos juntos """
+        with self._lock:
+            self._sync()
+            return self._version, copy.deepcopy(self._state)
+
+    def current_version(self):
+        """ Version atual sem copiar o estado; serve para validar caches derivados """
+        with self._lock:
+            self._sync()
+            return self._version
+
+    def get(self):
+        """ Instância do Environment montada a partir do estado, sem ir ao banco """
+        return state_to_environment(self.get_state())
+
+    @property
+    def version(self):
+        with self._lock:
+            if self._version is None:
+                self.get_state()
+            return self._version
+
+    # ---------------- Escrita ----------------
+
+    def update_with(self, func):
+        """
+        Aplica `func(state)` ao estado atual de forma atômica entre workers.
+        `func` altera o dict recebido; os campos alterados vão para o banco no
+        próximo flush. Retorna a instância atualizada.
+        """
+        with self._lock, self.shared_lock.hold():
+            state, _ = self._load_shared()
+            before = copy.deepcopy(state)
+            func(state)
+            changed = {name for name in FIELDS if name != "id" and state.get(name) != before.get(name)}
+            # Chaves que não são colunas (ex.: CAMERA_COUNTS) também são publicadas
+            if state != before:
+                version = uuid.uuid4().hex
+                cache.set_many({STATE_KEY: state, VERSION_KEY: version}, timeout=None)
+                self._state, self._version = state, version
+                self._dirty.update({name: copy.copy(state[name]) for name in changed})
+
+        if changed:
+            self._schedule_flush()
+        return state_to_environment(state)
+
+    def update(self, **fields):
+        unknown = set(fields) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Campos desconhecidos no Environment: {', '.join(sorted(unknown))}")
+        return self.update_with(lambda state: state.update(fields))
+
+    def reload_from_db(self, fields):
+        """
+        Copia do banco para o cache os campos que foram gravados direto no banco
+        (ex.: Environment.update_presence). Lê dentro do lock, então quem chega
+        depois sempre vê um valor igual ou mais novo. Não marca nada como sujo.
+        """
+        with self._lock, self.shared_lock.hold():
+            state, _ = self._load_shared()
+            env = Environment.objects.only(*fields).get(pk=state["id"])
+            for name in fields:
+                state[name] = getattr(env, name)
+            state["detected_people"] = list(env.detected_people)
+            version = uuid.uuid4().hex
+            cache.set_many({STATE_KEY: state, VERSION_KEY: version}, timeout=None)
+            self._state, self._version = state, version
+        return state_to_environment(state)
+
+    def invalidate(self, fields=None, deleted=False):
+        """
+        Um save() direto no model mudou o banco (sinal post_save). Os campos
+        salvos (`fields`; None = todos) são a escrita mais nova: são relidos do
+        banco para o estado compartilhado e saem da fila deste processo. Os
+        outros campos pendentes continuam no estado e vão para o banco no
+        próximo flush, então nada que ainda não foi gravado se perde.
+        Com `deleted` a linha não existe mais e o estado é descartado.
+        """
+        fields = [name for name in (fields or FIELDS) if name != "id"]
+        with self._lock:
+            for name in fields:
+                self._dirty.pop(name, None)
+            if deleted:
+                self._dirty.clear()
+                with self.shared_lock.hold():
+                    cache.delete_many([STATE_KEY, VERSION_KEY])
+                self._state, self._version = None, None
+                return
+        self.reload_from_db(fields)
+
+    # ---------------- Write-behind ----------------
+
+    def _schedule_flush(self):
+        if self.flush_interval <= 0:
+            self.flush()
+            return
+        with self._lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_loop, name="environment-flush", daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                if not self.flush():
+                    # Nada pendente: a thread termina e volta na próxima escrita
+                    with self._lock:
+                        if not self._dirty:
+                            self._flusher = None
+                            return
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """ Grava no banco os campos alterados por este processo. Retorna True se gravou algo """
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return False
+
+        try:
+            # Sempre o valor mais novo do cache compartilhado, mesmo que outro worker tenha mudado depois
+            state, _ = self._load_shared()
+            values = {name: state[name] for name in dirty}
+            Environment.objects.filter(pk=state["id"]).update(**values)
+        except Exception as e:
+            with self._lock:
+                # O que foi escrito de novo enquanto isso é mais novo e fica
+                self._dirty = {**dirty, **self._dirty}
+            print(f"Erro ao gravar Environment no banco: {e}")
+            return False
+        self.flushes += 1
+        return True
+
+    def stats(self):
+        return {
+            "version": self._version,
+            "hits": self.hits,
+            "reloads": self.reloads,
+            "flushes": self.flushes,
+            "dirty": sorted(self._dirty),
+            "lock": self.shared_lock.mode,
+        }
+
+
+environment_state = EnvironmentStateCache(flush_interval=settings.ENVIRONMENT_FLUSH_INTERVAL)
+atexit.register(environment_state.flush)
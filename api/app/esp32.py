@@ -0,0 +1,203 @@
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+# Cliente único para o ESP32 (um WebServer de uma thread só).
+#
+# - Uma sessão com pool pequeno (keep-alive) e timeouts curtos de conexão e
+#   leitura: uma placa lenta ou fora do ar não segura os workers do Django.
+# - /status é reaproveitado por ESP32_STATUS_TTL segundos; requisições
+#   simultâneas esperam a mesma busca em vez de abrir uma cada (single-flight).
+# - Circuit breaker por endpoint: depois de algumas falhas seguidas o endpoint
+#   não é chamado por um tempo e status() devolve o último estado conhecido,
+#   marcado como desatualizado. Cada endpoint tem o seu: falhas do polling de
+#   /status não bloqueiam a entrega do resultado do acesso em /rfid_result.
+
+
+class ESP32Unavailable(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """ fechado -> (N falhas) -> aberto -> (reset_timeout) -> meio-aberto -> 1 tentativa """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=3, reset_timeout=15.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self.opened = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """ True se a chamada pode ir até a placa """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            # Meio-aberto: só uma chamada de teste por vez
+            if self._trial_running:
+                return False
+            self._state = self.HALF_OPEN
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def retry_in(self):
+        with self._lock:
+            if self._state == self.CLOSED:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+
+class ESP32Client:
+    def __init__(self, base_url, connect_timeout=0.5, read_timeout=1.5, status_ttl=1.0,
+                 failure_threshold=3, reset_timeout=15.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.status_ttl = status_ttl
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers = {}
+        self._breakers_lock = threading.Lock()
+
+        # A placa atende uma conexão por vez; mais que isso só enfileira lá
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._status_lock = threading.Lock()
+        self._status = None
+        self._status_at = 0.0
+
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+        self.status_hits = 0
+        self.status_fetches = 0
+        self.stale_served = 0
+
+    def breaker(self, path):
+        """ Circuit breaker do endpoint `path` (criado no primeiro uso) """
+        with self._breakers_lock:
+            if path not in self._breakers:
+                self._breakers[path] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[path]
+
+    def request(self, method, path, **kwargs):
+        breaker = self.breaker(path)
+        if not breaker.allow():
+            self.rejected += 1
+            raise ESP32Unavailable(f"ESP32 em {self.base_url}{path} indisponível (nova tentativa em {breaker.retry_in():.0f}s)")
+
+        self.requests += 1
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", timeout=self.timeout, **kwargs)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            self.failures += 1
+            breaker.record_failure()
+            raise ESP32Unavailable(f"Erro ao conectar com o ESP32: {e}") from e
+        breaker.record_success()
+        return response
+
+    def get_json(self, path):
+        try:
+            return self.request("GET", path).json()
+        except ValueError as e:
+            raise ESP32Unavailable(f"Resposta inválida do ESP32 em {path}: {e}") from e
+
+    def status(self, max_age=None):
+        """
+        Leitura de /status: (dados, desatualizado). Reaproveita a última leitura
+        se tiver menos de `max_age` segundos (padrão: status_ttl). Se a placa
+        falhar e já houver uma leitura anterior, devolve ela com desatualizado=True.
+        """
+        max_age = self.status_ttl if max_age is None else max_age
+        if self._fresh(max_age):
+            self.status_hits += 1
+            return dict(self._status), False
+
+        with self._status_lock:
+            # Quem esperou o lock provavelmente já encontra a leitura feita
+            if self._fresh(max_age):
+                self.status_hits += 1
+                return dict(self._status), False
+            try:
+                data = self.get_json("/status")
+            except ESP32Unavailable:
+                if self._status is None:
+                    raise
+                self.stale_served += 1
+                return dict(self._status), True
+            self.status_fetches += 1
+            self._status, self._status_at = data, time.monotonic()
+            return dict(data), False
+
+    def _fresh(self, max_age):
+        return self._status is not None and time.monotonic() - self._status_at < max_age
+
+    def status_rfid(self):
+        return self.get_json("/status_rfid")
+
+    def send_rfid_result(self, resultado):
+        return self.request("POST", "/rfid_result", params={"resultado": resultado})
+
+    def stats(self):
+        with self._breakers_lock:
+            breakers = sorted(self._breakers.items())
+        return {
+            "url": self.base_url,
+            "breakers": {path: breaker.state for path, breaker in breakers},
+            "breaker_opened": {path: breaker.opened for path, breaker in breakers},
+            "requests": self.requests,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "status_hits": self.status_hits,
+            "status_fetches": self.status_fetches,
+            "stale_served": self.stale_served,
+            "status_age": round(time.monotonic() - self._status_at, 3) if self._status is not None else None,
+        }
+
+
+esp32 = ESP32Client(
+    settings.ESP32_URL,
+    connect_timeout=settings.ESP32_CONNECT_TIMEOUT,
+    read_timeout=settings.ESP32_READ_TIMEOUT,
+    status_ttl=settings.ESP32_STATUS_TTL,
+    failure_threshold=settings.ESP32_FAILURE_THRESHOLD,
+    reset_timeout=settings.ESP32_RESET_TIMEOUT,
+)
@@ -0,0 +1,106 @@
+import time
+
+from django.utils import timezone
+
+from . import telemetry
+from .env_cache import environment_state
+from .esp32 import ESP32Unavailable, esp32
+
+# Leitura periódica do ESP32 em segundo plano.
+#
+# As views não falam mais com a placa: este poller consulta /status_rfid (a
+# cada `rfid_interval`) e /status (a cada `status_interval`), compara com o
+# estado atual do Environment (em memória, ver env_cache.py) e grava só o que
+# mudou. A placa recebe um
+# número fixo de requisições por segundo, independente do tráfego da API.
+
+# Campo do ESP32 -> campo do Environment
+STATUS_FIELDS = {
+    "temperatura": "temperature",
+    "umidade": "humidity",
+    "ultimo_rfid": "last_rfid",
+}
+
+
+class ESP32Poller:
+    def __init__(self, client=None, rfid_interval=1.0, status_interval=5.0):
+        self.client = client or esp32
+        self.rfid_interval = rfid_interval
+        self.status_interval = status_interval
+
+        self._next_status = 0.0
+        self._next_rfid = 0.0
+
+        self.polls = 0
+        self.errors = 0
+        self.writes = 0
+        self.unchanged = 0
+
+    def fetch(self, path):
+        try:
+            if path == "/status":
+                # Sempre uma leitura nova; a leitura antiga do breaker não é mudança
+                data, stale = self.client.status(max_age=0)
+                return None if stale else data
+            return self.client.status_rfid()
+        except ESP32Unavailable as e:
+            self.errors += 1
+            print(f"Poller ESP32: {e}")
+            return None
+        finally:
+            self.polls += 1
+
+    def diff(self, data):
+        """ Campos do Environment cujo valor na placa é diferente do estado atual """
+        state = environment_state.get_state()
+        return {
+            field: data[source]
+            for source, field in STATUS_FIELDS.items()
+            if source in data and state.get(field) != data[source]
+        }
+
+    def apply(self, changes):
+        if not changes:
+            self.unchanged += 1
+            return
+
+        def update(state):
+            state.update(changes)
+            state["last_update"] = timezone.now()
+
+        env = environment_state.update_with(update)
+        self.writes += 1
+
+        if "temperature" in changes or "humidity" in changes:
+            telemetry.record(temperature=env.temperature, humidity=env.humidity, source="esp32")
+
+    def poll_once(self):
+        """ Faz as consultas que estão vencidas; retorna os campos gravados """
+        now = time.monotonic()
+        if now >= self._next_status:
+            self._next_status = now + self.status_interval
+            # /status também traz o RFID; neste ciclo /status_rfid é desnecessário
+            self._next_rfid = now + self.rfid_interval
+            data = self.fetch("/status")
+        elif now >= self._next_rfid:
+            self._next_rfid = now + self.rfid_interval
+            data = self.fetch("/status_rfid")
+        else:
+            return {}
+        if data is None:
+            return {}
+        changes = self.diff(data)
+        self.apply(changes)
+        return changes
+
+    def seconds_to_next(self):
+        return max(0.0, min(self._next_status, self._next_rfid) - time.monotonic())
+
+    def stats(self):
+        return {
+            "polls": self.polls,
+            "errors": self.errors,
+            "writes": self.writes,
+            "unchanged": self.unchanged,
+            "esp32": self.client.stats(),
+        }
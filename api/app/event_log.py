@@ -0,0 +1,104 @@
+import gzip
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .buffers import BufferedWriter
+from .models import Log
+from .serializers import log_fast, render_json
+
+# Log de eventos (acessos, erros de câmera, ESP32).
+#
+# record() só enfileira; o BufferedWriter grava em lote com bulk_create numa
+# thread própria, então a decisão de acesso não espera o INSERT. Linhas
+# antigas vão para arquivos comprimidos com: python manage.py compact_logs
+
+
+def write_logs(entries):
+    Log.objects.bulk_create(entries)
+
+
+writer = BufferedWriter(
+    write_logs,
+    max_batch=settings.LOG_BATCH_SIZE,
+    interval=settings.LOG_FLUSH_INTERVAL,
+    name="log-writer",
+)
+
+
+def record(event, event_type=Log.SYSTEM, rfid="", outcome="", latency_ms=None, created_at=None):
+    """ Enfileira uma linha de log; não bloqueia no banco """
+    writer.append(Log(
+        event=event[:255],
+        created_at=created_at or timezone.now(),
+        event_type=event_type,
+        rfid=rfid or "",
+        outcome=outcome,
+        latency_ms=latency_ms,
+    ))
+
+
+def keyset_after(created_at, pk):
+    """ Linhas depois de (created_at, id) na ordem crescente """
+    return Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+
+
+def archive_older_than(days, directory, batch_size=5000):
+    return archive_before(timezone.now() - timedelta(days=days), directory, batch_size)
+
+
+def fsync_directory(directory):
+    """ Garante que o rename chegou ao disco (no Windows não dá para abrir a pasta) """
+    if os.name == "nt":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def archive_before(cutoff, directory, batch_size=5000):
+    """
+    Copia as linhas com created_at < cutoff para um .jsonl.gz (mesmo formato
+    da API) e só depois de o arquivo estar completo no disco apaga do banco.
+    Retorna (linhas arquivadas, caminho do arquivo ou None).
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"logs-before-{cutoff:%Y%m%dT%H%M%S}-{timezone.now():%Y%m%dT%H%M%S}.jsonl.gz")
+    tmp_path = path + ".tmp"
+
+    old = Log.objects.filter(created_at__lt=cutoff).order_by("created_at", "id")
+    rows = 0
+    last = None
+    with open(tmp_path, "wb") as raw:
+        # O trailer do gzip (CRC e tamanho) só é escrito no close do GzipFile:
+        # o fsync vem depois dele, no arquivo de verdade
+        with gzip.GzipFile(fileobj=raw, mode="wb") as out:
+            while True:
+                batch = list((old.filter(keyset_after(*last)) if last else old)[:batch_size])
+                if not batch:
+                    break
+                out.write(b"".join(render_json(row) + b"\n" for row in log_fast.to_list(batch)))
+                rows += len(batch)
+                last = (batch[-1].created_at, batch[-1].pk)
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    if not rows:
+        os.remove(tmp_path)
+        return 0, None
+    os.replace(tmp_path, path)
+    fsync_directory(directory)
+
+    # Apaga só o que foi escrito no arquivo, em lotes curtos (não segura o lock de escrita do SQLite)
+    archived = old.exclude(keyset_after(*last))
+    while True:
+        ids = list(archived.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            break
+        Log.objects.filter(id__in=ids).delete()
+    return rows, path
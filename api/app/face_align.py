@@ -0,0 +1,47 @@
+import math
+
+import cv2
+
+# Alinhamento do rosto antes do LBPH, igual ao do treino (yolo_training/faces.py,
+# que roda fora do Django e tem a sua cópia). Os dois precisam gerar o mesmo
+# recorte: o LBPH compara histogramas por região, e um rosto inclinado na
+# câmera contra um modelo treinado com rostos nivelados erra a identidade.
+# O teste AlignmentTests confere que as duas cópias dão o mesmo resultado.
+
+
+def detect_eyes(gray, box, eye_cascade):
+    """ Centros dos dois olhos (esquerdo, direito) na imagem inteira, ou None """
+    x, y, w, h = box
+    # Olhos ficam na metade de cima do rosto
+    roi = gray[y:y + h // 2, x:x + w]
+    eyes = eye_cascade.detectMultiScale(roi, scaleFactor=1.1, minNeighbors=5, minSize=(w // 10, w // 10))
+    if len(eyes) < 2:
+        return None
+    eyes = sorted(eyes, key=lambda e: e[2] * e[3], reverse=True)[:2]
+    centers = sorted((x + ex + ew / 2, y + ey + eh / 2) for ex, ey, ew, eh in eyes)
+    (lx, ly), (rx, ry) = centers
+    # Dois "olhos" muito próximos são a mesma detecção duas vezes
+    if rx - lx < w * 0.2:
+        return None
+    return (lx, ly), (rx, ry)
+
+
+def eye_angle(eyes):
+    (lx, ly), (rx, ry) = eyes
+    return math.degrees(math.atan2(ry - ly, rx - lx))
+
+
+def align_face(gray, box, size, eye_cascade=None, eyes=None):
+    """ Recorte do rosto com os olhos nivelados, equalizado e redimensionado """
+    x, y, w, h = box
+    if eyes is None and eye_cascade is not None:
+        eyes = detect_eyes(gray, box, eye_cascade)
+    if eyes is not None:
+        # Gira a imagem em torno do centro do rosto até os olhos ficarem na horizontal
+        center = (x + w / 2, y + h / 2)
+        rotation = cv2.getRotationMatrix2D(center, eye_angle(eyes), 1.0)
+        gray = cv2.warpAffine(gray, rotation, (gray.shape[1], gray.shape[0]), flags=cv2.INTER_LINEAR,
+                              borderMode=cv2.BORDER_REPLICATE)
+    crop = gray[max(0, y):y + h, max(0, x):x + w]
+    crop = cv2.resize(crop, (size, size), interpolation=cv2.INTER_AREA)
+    return cv2.equalizeHist(crop)
@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from .backends import DEFAULT_BACKEND, DEFAULT_IMGSZ, load_detector
+from .postprocess import PERSON_CLASS, PERSON_CONFIDENCE, extract_boxes
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL_PATH = os.path.join(BASE_DIR, "yolov8n.pt")
+
+
+def load_model(model_path=DEFAULT_MODEL_PATH, backend=DEFAULT_BACKEND, imgsz=DEFAULT_IMGSZ):
+    """ Carrega o YOLO no backend escolhido (import tardio para não pesar quem só usa os helpers) """
+    return load_detector(model_path, backend=backend, imgsz=imgsz)
+
+
+class InferenceEngine:
+    """
+    Serviço de inferência com um único modelo YOLO compartilhado por N câmeras.
+
+    Cada câmera chama `submit(camera_id, frame)` e recebe um Future. Uma thread
+    junta os frames pendentes em micro-lotes (até `max_batch` frames ou até o
+    mais antigo esperar `max_latency` segundos) e roda um único forward.
+    Pedidos do mesmo frame (o mesmo objeto) que ainda não saíram num lote são
+    juntados: o frame roda uma vez e todos os Futures recebem o resultado.
+    Frames diferentes nunca são juntados, mesmo da mesma câmera: quem chama
+    usa as caixas para recortar o seu próprio frame.
+    """
+
+    def __init__(self, model=None, model_path=DEFAULT_MODEL_PATH, max_batch=8,
+                 max_latency=0.02, min_conf=PERSON_CONFIDENCE, on_result=None):
+        self.model = model if model is not None else load_model(model_path)
+        self.max_batch = max(1, max_batch)
+        self.max_latency = max_latency
+        self.min_conf = min_conf
+        self.on_result = on_result
+
+        # (camera_id, id do frame) -> [frame, timestamp de chegada, lista de futures]; o frame
+        # fica referenciado enquanto está pendente, então o id não é reaproveitado nesse meio tempo
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+        self.batches = 0
+        self.frames = 0
+        self.coalesced = 0
+        self.last_batch_size = 0
+        self.last_batch_time = 0.0
+
+    def start(self):
+        if self._running:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._worker, name="inference-engine", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        # Quem ainda estava esperando não pode ficar pendurado
+        with self._cond:
+            pending, self._pending = self._pending, {}
+        for _, _, futures in pending.values():
+            for future in futures:
+                future.cancel()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def submit(self, camera_id, frame):
+        future = Future()
+        with self._cond:
+            if not self._running:
+                raise RuntimeError("InferenceEngine não foi iniciado")
+            key = (camera_id, id(frame))
+            entry = self._pending.get(key)
+            if entry is None:
+                self._pending[key] = [frame, time.monotonic(), [future]]
+            else:
+                entry[2].append(future)
+                self.coalesced += 1
+            self._cond.notify_all()
+        return future
+
+    def infer(self, frames, timeout=None):
+        """ Versão síncrona: recebe {camera_id: frame} e devolve {camera_id: resultado} """
+        futures = {camera_id: self.submit(camera_id, frame) for camera_id, frame in frames.items()}
+        return {camera_id: future.result(timeout) for camera_id, future in futures.items()}
+
+    def _next_batch(self):
+        with self._cond:
+            while self._running:
+                if self._pending:
+                    oldest = min(entry[1] for entry in self._pending.values())
+                    remaining = oldest + self.max_latency - time.monotonic()
+                    if len(self._pending) >= self.max_batch or remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                else:
+                    self._cond.wait()
+            if not self._running:
+                return []
+
+            # Mais antigos primeiro; o resto fica para o próximo lote
+            ordered = sorted(self._pending.items(), key=lambda item: item[1][1])[:self.max_batch]
+            for key, _ in ordered:
+                del self._pending[key]
+            return ordered
+
+    def _worker(self):
+        while self._running:
+            batch = self._next_batch()
+            if not batch:
+                continue
+
+            frames = [entry[0] for _, entry in batch]
+            start = time.monotonic()
+            try:
+                results = self.model(frames, verbose=False, classes=[PERSON_CLASS], conf=self.min_conf)
+            except Exception as e:
+                for _, (_, _, futures) in batch:
+                    for future in futures:
+                        future.set_exception(e)
+                continue
+            done = time.monotonic()
+
+            self.batches += 1
+            self.frames += len(frames)
+            self.last_batch_size = len(frames)
+            self.last_batch_time = done - start
+
+            for ((camera_id, _), (_, arrived, futures)), result in zip(batch, results):
+                boxes = extract_boxes(result, (PERSON_CLASS,), self.min_conf)
+                detection = {
+                    "camera": camera_id,
+                    "people_count": len(boxes),
+                    "boxes": boxes,
+                    "result": result,
+                    "latency": done - arrived,
+                }
+                if self.on_result is not None:
+                    try:
+                        self.on_result(camera_id, detection)
+                    except Exception as e:
+                        print(f"Erro no callback da câmera {camera_id}: {e}")
+                for future in futures:
+                    future.set_result(detection)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "frames": self.frames,
+            "coalesced": self.coalesced,
+            "avg_batch_size": round(self.frames / self.batches, 2) if self.batches else 0.0,
+            "last_batch_size": self.last_batch_size,
+            "last_batch_ms": round(self.last_batch_time * 1000, 1),
+        }
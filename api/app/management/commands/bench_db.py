@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.db.models import F
+
+from app.env_cache import load_environment
+from app.models import Environment, Log
+
+BENCH_PREFIX = "bench-db"
+
+
+class Command(BaseCommand):
+    help = (
+        "Vazão de escrita e latência p50/p99 com clientes concorrentes para cada perfil de banco "
+        "(DB_PROFILE). Perfis SQLite rodam num arquivo temporário; perfis PostgreSQL usam o banco "
+        "configurado e apagam as linhas de teste no fim"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiles", default=settings.DB_PROFILE,
+                            help=f"Perfis separados por vírgula: {', '.join(settings.DATABASE_PROFILES)}")
+        parser.add_argument("--clients", default="1,4,8", help="Quantidades de threads clientes")
+        parser.add_argument("--ops", type=int, default=200, help="Transações de escrita por cliente")
+        parser.add_argument("--run", action="store_true", help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        clients = [int(c) for c in options["clients"].split(",")]
+        if options["run"]:
+            # Processo filho: já está com o DB_PROFILE certo
+            self.stdout.write(json.dumps(self.run_profile(clients, options["ops"])))
+            return
+
+        profiles = [p.strip() for p in options["profiles"].split(",") if p.strip()]
+        unknown = set(profiles) - set(settings.DATABASE_PROFILES)
+        if unknown:
+            raise CommandError(f"Perfis desconhecidos: {', '.join(sorted(unknown))}")
+
+        self.stdout.write(f"{'perfil':>14} {'clientes':>9} {'tx/s':>9} {'p50 ms':>8} {'p99 ms':>9} {'travas':>7}")
+        for profile in profiles:
+            for row in self.spawn(profile, options):
+                self.stdout.write(
+                    f"{profile:>14} {row['clients']:>9} {row['tps']:>9.1f} {row['p50']:>8.2f} "
+                    f"{row['p99']:>9.2f} {row['locked']:>7}"
+                )
+
+    def spawn(self, profile, options):
+        """ Cada perfil roda num processo novo, com as conexões abertas já nesse perfil """
+        env = dict(os.environ, DB_PROFILE=profile)
+        with tempfile.TemporaryDirectory() as tmp:
+            if profile.startswith("sqlite"):
+                env["SQLITE_PATH"] = os.path.join(tmp, "bench.sqlite3")
+            result = subprocess.run(
+                [sys.executable, sys.argv[0], "bench_db", "--run",
+                 "--clients", options["clients"], "--ops", str(options["ops"])],
+                env=env, capture_output=True, text=True,
+            )
+        if result.returncode != 0:
+            raise CommandError(f"Perfil {profile} falhou:\n{result.stderr[-2000:]}")
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def run_profile(self, clients_list, ops):
+        if connection.vendor == "sqlite":
+            call_command("migrate", verbosity=0)
+        env = load_environment()
+        rows = []
+        try:
+            for clients in clients_list:
+                rows.append(self.run_round(env, clients, ops))
+        finally:
+            Log.objects.filter(event__startswith=BENCH_PREFIX).delete()
+            Environment.objects.filter(pk=env.pk).update(people_count=env.people_count)
+        return rows
+
+    def run_round(self, env, clients, ops):
+        latencies = []
+        locked = [0]
+        lock = threading.Lock()
+        barrier = threading.Barrier(clients)
+
+        # Mesmo padrão de Environment.update_presence: lê e depois escreve na mesma
+        # transação (no SQLite em modo DEFERRED a troca leitura -> escrita falha na
+        # hora com "database is locked" se outra conexão já estiver escrevendo)
+        def client(n):
+            mine = []
+            barrier.wait()
+            try:
+                for i in range(ops):
+                    start = time.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            Environment.objects.select_for_update().filter(pk=env.pk).values_list("people_count").get()
+                            Environment.objects.filter(pk=env.pk).update(people_count=F("people_count") + 1)
+                            Log.objects.create(event=f"{BENCH_PREFIX} {n}-{i}")
+                    except OperationalError:
+                        # "database is locked": é o erro que o usuário veria
+                        with lock:
+                            locked[0] += 1
+                        continue
+                    mine.append(time.perf_counter() - start)
+            finally:
+                close_old_connections()
+                connection.close()
+            with lock:
+                latencies.extend(mine)
+
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        times = np.array(latencies or [0.0]) * 1000
+        return {
+            "clients": clients,
+            "tps": len(latencies) / elapsed,
+            "p50": float(np.percentile(times, 50)),
+            "p99": float(np.percentile(times, 99)),
+            "locked": locked[0],
+        }
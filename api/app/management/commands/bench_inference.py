@@ -0,0 +1,76 @@
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.backends import BACKENDS
+from app.inference import DEFAULT_MODEL_PATH, InferenceEngine, load_model
+
+
+def parse_int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+class Command(BaseCommand):
+    help = "Mede frames/s do InferenceEngine variando o tamanho do lote e o número de câmeras"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+        parser.add_argument("--backend", default=settings.YOLO_BACKEND, choices=BACKENDS)
+        parser.add_argument("--imgsz", type=int, default=settings.YOLO_IMGSZ)
+        parser.add_argument("--batch-sizes", default="1,2,4,8")
+        parser.add_argument("--cameras", default="1,2,4,8")
+        parser.add_argument("--seconds", type=float, default=10.0, help="Duração de cada rodada")
+        parser.add_argument("--max-latency", type=float, default=0.02)
+        parser.add_argument("--width", type=int, default=640)
+        parser.add_argument("--height", type=int, default=480)
+
+    def handle(self, *args, **options):
+        model = load_model(options["model"], backend=options["backend"], imgsz=options["imgsz"])
+        rng = np.random.default_rng(0)
+        frame = rng.integers(0, 255, (options["height"], options["width"], 3), dtype=np.uint8)
+
+        # Aquecimento: a primeira chamada inclui a inicialização do modelo
+        model([frame], verbose=False)
+
+        self.stdout.write(f"{'cameras':>8} {'batch':>6} {'frames/s':>10} {'lote médio':>11} {'p50 ms':>8} {'p99 ms':>8}")
+        for cameras in parse_int_list(options["cameras"]):
+            for batch in parse_int_list(options["batch_sizes"]):
+                row = self.run_round(model, frame, cameras, batch, options["max_latency"], options["seconds"])
+                self.stdout.write(
+                    f"{cameras:>8} {batch:>6} {row['fps']:>10.1f} {row['avg_batch']:>11.2f} "
+                    f"{row['p50']:>8.1f} {row['p99']:>8.1f}"
+                )
+
+    def run_round(self, model, frame, cameras, batch, max_latency, seconds):
+        engine = InferenceEngine(model=model, max_batch=batch, max_latency=max_latency).start()
+        stop_at = time.monotonic() + seconds
+        latencies = []
+        lock = threading.Lock()
+
+        # Cada câmera manda o próximo frame assim que recebe o resultado do anterior
+        def camera_loop(camera_id):
+            while time.monotonic() < stop_at:
+                detection = engine.submit(camera_id, frame).result()
+                with lock:
+                    latencies.append(detection["latency"])
+
+        threads = [threading.Thread(target=camera_loop, args=(i,)) for i in range(cameras)]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+        stats = engine.stats()
+        engine.stop()
+
+        latencies_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+        return {
+            "fps": stats["frames"] / elapsed,
+            "avg_batch": stats["avg_batch_size"],
+            "p50": float(np.percentile(latencies_ms, 50)),
+            "p99": float(np.percentile(latencies_ms, 99)),
+        }
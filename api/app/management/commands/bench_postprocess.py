@@ -0,0 +1,62 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from app.postprocess import box_tuples, extract_boxes
+
+
+def legacy_people_boxes(result):
+    """ Laço antigo, caixa por caixa (como era em yolo_processor.py e tasks.py) """
+    people_boxes = []
+    for box in result.boxes:
+        if int(box.cls[0]) == 0 and float(box.conf[0]) > 0.5:
+            x1, y1, x2, y2 = map(int, box.xyxy[0].cpu().numpy())
+            people_boxes.append((x1, y1, x2, y2))
+    return people_boxes
+
+
+def fake_result(num_boxes, rng):
+    """ Resultado do YOLO sintético, com o mesmo tipo Boxes que o modelo devolve """
+    import torch
+    from ultralytics.engine.results import Boxes
+
+    xy = rng.uniform(0, 600, (num_boxes, 2))
+    wh = rng.uniform(10, 200, (num_boxes, 2))
+    data = np.column_stack([
+        xy, xy + wh,
+        rng.uniform(0.1, 1.0, num_boxes),
+        rng.integers(0, 5, num_boxes),
+    ]).astype(np.float32)
+
+    class Result:
+        boxes = Boxes(torch.from_numpy(data), (480, 640))
+    return Result()
+
+
+class Command(BaseCommand):
+    help = "Compara o laço por caixa com o pós-processamento vetorizado (app.postprocess)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--boxes", default="1,5,20,100", help="Quantidades de caixas por frame")
+        parser.add_argument("--repeat", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        self.stdout.write(f"{'caixas':>7} {'laço (µs)':>11} {'vetorizado (µs)':>16} {'ganho':>7}")
+        for num_boxes in [int(n) for n in options["boxes"].split(",")]:
+            result = fake_result(num_boxes, rng)
+            # Os dois caminhos precisam concordar antes de comparar tempo (sem assert: some com python -O)
+            if legacy_people_boxes(result) != box_tuples(extract_boxes(result)):
+                raise CommandError(f"Laço e vetorizado discordam com {num_boxes} caixas")
+
+            legacy = self.measure(legacy_people_boxes, result, options["repeat"])
+            vectorized = self.measure(extract_boxes, result, options["repeat"])
+            self.stdout.write(f"{num_boxes:>7} {legacy:>11.1f} {vectorized:>16.1f} {legacy / vectorized:>6.1f}x")
+
+    def measure(self, func, result, repeat):
+        func(result)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func(result)
+        return (time.perf_counter() - start) / repeat * 1e6
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from app.env_cache import load_environment
+from app.models import Environment, Occupant
+
+
+class Command(BaseCommand):
+    help = (
+        "Entradas/saídas concorrentes via Environment.update_presence: confere que "
+        "nenhuma atualização se perde e mede a vazão de escrita"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", default="1,2,4,8", help="Quantidades de threads clientes")
+        parser.add_argument("--ops", type=int, default=200, help="Operações por cliente")
+        parser.add_argument("--retries", type=int, default=20, help="Tentativas quando o banco está travado")
+
+    def handle(self, *args, **options):
+        env = load_environment()
+        self.stdout.write(f"{'clientes':>9} {'ops/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'travas':>7} {'esperado':>9} {'contador':>9} {'ocupantes':>10}")
+        for clients in [int(c) for c in options["clients"].split(",")]:
+            self.reset(env)
+            row = self.run_round(env, clients, options["ops"], options["retries"])
+            env.refresh_from_db(fields=["people_count"])
+            occupants = Occupant.objects.filter(environment=env).count()
+            status = "OK" if env.people_count == occupants == row["expected"] else "PERDEU ATUALIZAÇÕES"
+            self.stdout.write(
+                f"{clients:>9} {row['ops'] / row['elapsed']:>8.1f} {row['p50']:>8.2f} {row['p99']:>8.2f} "
+                f"{row['locked']:>7} {row['expected']:>9} {env.people_count:>9} {occupants:>10}  {status}"
+            )
+        self.reset(env)
+
+    def reset(self, env):
+        Occupant.objects.filter(environment=env, rfid__startswith="bench-").delete()
+        Environment.objects.filter(pk=env.pk).update(
+            people_count=Occupant.objects.filter(environment=env).count()
+        )
+
+    def run_round(self, env, clients, ops, retries):
+        baseline = Occupant.objects.filter(environment=env).count()
+        latencies = []
+        locked = [0]
+        lock = threading.Lock()
+
+        # Cada cliente entra com RFIDs próprios e sai com a metade deles; todos
+        # disputam a mesma linha do Environment e o mesmo contador
+        def client(n):
+            mine = Environment.objects.get(pk=env.pk)
+            try:
+                for i in range(ops):
+                    rfid = f"bench-{n}-{i // 2}"
+                    presence = i % 4 != 3
+                    start = time.perf_counter()
+                    for attempt in range(retries):
+                        try:
+                            mine.update_presence(rfid, 20.0, 50.0, presence)
+                            break
+                        except OperationalError:
+                            with lock:
+                                locked[0] += 1
+                            time.sleep(0.001 * (attempt + 1))
+                    with lock:
+                        latencies.append((time.perf_counter() - start) * 1000)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        # Por cliente: i//2 distintos entram (ops/2 RFIDs); i%4==3 tira o RFID de índice ímpar
+        entered = len({i // 2 for i in range(ops)})
+        left = len({i // 2 for i in range(ops) if i % 4 == 3})
+        return {
+            "ops": len(latencies),
+            "elapsed": elapsed,
+            "p50": float(np.percentile(latencies, 50)),
+            "p99": float(np.percentile(latencies, 99)),
+            "locked": locked[0],
+            "expected": baseline + clients * (entered - left),
+        }
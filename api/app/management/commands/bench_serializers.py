@@ -0,0 +1,75 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from app.env_cache import environment_state
+from app.models import Log
+from app.serializers import (EnvironmentSerializer, LogSerializer, environment_fast, environment_json,
+                             log_fast, render_json)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara EnvironmentSerializer/LogSerializer + JSONRenderer com o caminho rápido "
+        "(FastReadSerializer, bytes em cache por version) e mede GET /api/status/ com e sem ETag"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=5000)
+        parser.add_argument("--logs", type=int, default=100, help="Tamanho da lista de Log serializada")
+        parser.add_argument("--requests", type=int, default=1000, help="Requisições no teste HTTP")
+
+    def handle(self, *args, **options):
+        n = options["iterations"]
+        env = environment_state.get()
+        logs = [Log(id=i + 1, event=f"evento {i}", created_at=timezone.now()) for i in range(options["logs"])]
+        renderer = JSONRenderer()
+
+        # Mesma saída, byte a byte
+        drf_env = renderer.render(EnvironmentSerializer(env).data)
+        drf_logs = renderer.render(LogSerializer(logs, many=True).data)
+        fast_env = render_json(environment_fast.to_dict(env))
+        fast_logs = render_json(log_fast.to_list(logs))
+        self.stdout.write(f"Environment idêntico ao DRF: {drf_env == fast_env}")
+        self.stdout.write(f"Lista de Log idêntica ao DRF: {drf_logs == fast_logs}")
+
+        self.stdout.write("")
+        self.stdout.write(f"{'caminho':>32} {'µs/op':>9} {'ops/s':>11}")
+        rows = [
+            ("Environment DRF", lambda: renderer.render(EnvironmentSerializer(env).data), n),
+            ("Environment rápido", lambda: render_json(environment_fast.to_dict(env)), n),
+            ("Environment bytes em cache", lambda: environment_json.get(), n),
+            (f"{len(logs)} Log DRF", lambda: renderer.render(LogSerializer(logs, many=True).data), max(1, n // 50)),
+            (f"{len(logs)} Log rápido", lambda: render_json(log_fast.to_list(logs)), max(1, n // 50)),
+        ]
+        for label, func, iterations in rows:
+            self.report(label, self.measure(func, iterations))
+
+        self.stdout.write("")
+        client = Client(HTTP_HOST="localhost")
+        etag = client.get("/api/status/")["ETag"]
+        self.stdout.write(f"{'GET /api/status/':>32} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>9}")
+        for label, headers in (("sem If-None-Match (200)", {}), ("com If-None-Match (304)", {"HTTP_IF_NONE_MATCH": etag})):
+            times = []
+            for _ in range(options["requests"]):
+                start = time.perf_counter()
+                client.get("/api/status/", **headers)
+                times.append(time.perf_counter() - start)
+            self.stdout.write(
+                f"{label:>32} {np.percentile(times, 50) * 1000:>9.3f} {np.percentile(times, 99) * 1000:>9.3f} "
+                f"{len(times) / sum(times):>9.0f}"
+            )
+
+    def measure(self, func, iterations):
+        func()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return (time.perf_counter() - start) / iterations
+
+    def report(self, label, seconds):
+        self.stdout.write(f"{label:>32} {seconds * 1e6:>9.1f} {1 / seconds:>11.0f}")
@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from app import event_log
+from app.models import Log
+
+
+class Command(BaseCommand):
+    help = (
+        "Arquiva em .jsonl.gz as linhas do Log mais antigas que --days e apaga do banco. "
+        "Os arquivos ficam em LOG_ARCHIVE_DIR"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.LOG_RETENTION_DAYS)
+        parser.add_argument("--archive-dir", default=settings.LOG_ARCHIVE_DIR)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--dry-run", action="store_true", help="Só conta as linhas que seriam arquivadas")
+        parser.add_argument("--vacuum", action="store_true", help="SQLite: devolve ao disco o espaço liberado")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        if options["dry_run"]:
+            count = Log.objects.filter(created_at__lt=cutoff).count()
+            self.stdout.write(f"{count} linhas anteriores a {cutoff:%Y-%m-%d %H:%M} seriam arquivadas")
+            return
+
+        # O que ainda está no buffer deste processo entra nesta rodada
+        event_log.writer.flush()
+        rows, path = event_log.archive_before(cutoff, options["archive_dir"], options["batch_size"])
+        if not rows:
+            self.stdout.write(f"Nada anterior a {cutoff:%Y-%m-%d %H:%M} para arquivar")
+            return
+        self.stdout.write(f"{rows} linhas arquivadas em {path}")
+
+        if options["vacuum"] and connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("VACUUM")
+            self.stdout.write("VACUUM concluído")
@@ -0,0 +1,120 @@
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from django.core.management.base import BaseCommand
+
+
+class StubESP32Handler(BaseHTTPRequestHandler):
+    """ Mesmos endpoints e formato de resposta do firmware (ver README) """
+
+    def do_GET(self):
+        self.route()
+
+    def do_POST(self):
+        self.route()
+
+    def route(self):
+        server = self.server
+        server.requests += 1
+        if server.delay:
+            time.sleep(server.delay)
+        if server.fail_rate and random.random() < server.fail_rate:
+            self.send_text(500, "falha simulada")
+            return
+
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        if url.path == "/status":
+            # Leitura do DHT oscila um pouco, como na placa
+            self.send_json({
+                "temperatura": round(server.temperature + random.uniform(-0.2, 0.2), 1),
+                "umidade": round(server.humidity + random.uniform(-0.5, 0.5), 1),
+                "ultimo_rfid": server.rfid,
+            })
+        elif url.path == "/status_rfid":
+            self.send_json({"ultimo_rfid": server.rfid})
+        elif url.path == "/rfid_result":
+            resultado = params.get("resultado", [""])[0]
+            server.results.append(resultado)
+            self.send_text(200, f"Resultado recebido: {resultado}")
+        elif url.path in ("/led_branco", "/led_azul"):
+            self.send_text(200, f"{url.path[1:]} {params.get('status', ['off'])[0]}")
+        else:
+            self.send_text(404, "Endpoint nao encontrado")
+
+    def send_cors(self):
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET,POST,OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+
+    def send_json(self, data):
+        self.send_body(200, "application/json", json.dumps(data).encode())
+
+    def send_text(self, code, text):
+        self.send_body(code, "text/plain", text.encode())
+
+    def send_body(self, code, content_type, body):
+        self.send_response(code)
+        self.send_cors()
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class StubESP32Server(HTTPServer):
+    """ Uma requisição por vez, como o WebServer do ESP32 """
+
+    def __init__(self, address, rfid="", temperature=25.0, humidity=60.0, delay=0.0, fail_rate=0.0, verbose=False):
+        super().__init__(address, StubESP32Handler)
+        self.rfid = rfid
+        self.temperature = temperature
+        self.humidity = humidity
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.verbose = verbose
+        self.requests = 0
+        self.results = []
+
+
+class Command(BaseCommand):
+    help = (
+        "Servidor HTTP local que imita o ESP32 (/status, /status_rfid, /rfid_result, LEDs) "
+        "para testar a API sem a placa. Use com ESP32_URL=http://127.0.0.1:<porta>"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8090)
+        parser.add_argument("--rfid", default="6C3ACB33", help="Valor de ultimo_rfid")
+        parser.add_argument("--temperature", type=float, default=25.0)
+        parser.add_argument("--humidity", type=float, default=60.0)
+        parser.add_argument("--delay", type=float, default=0.0, help="Atraso (s) em cada resposta")
+        parser.add_argument("--fail-rate", type=float, default=0.0, help="Fração de respostas 500 (0 a 1)")
+        parser.add_argument("--verbose", action="store_true")
+
+    def handle(self, *args, **options):
+        server = StubESP32Server(
+            (options["host"], options["port"]),
+            rfid=options["rfid"],
+            temperature=options["temperature"],
+            humidity=options["humidity"],
+            delay=options["delay"],
+            fail_rate=options["fail_rate"],
+            verbose=options["verbose"],
+        )
+        self.stdout.write(f"ESP32 simulado em http://{options['host']}:{options['port']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"{server.requests} requisições atendidas; resultados RFID: {server.results}")
@@ -0,0 +1,144 @@
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.backends import BACKENDS, export_model, exported_path, load_detector
+from app.postprocess import PERSON_MODEL_KWARGS, box_coords, extract_boxes
+from app.tracking import greedy_assignment, iou_matrix
+
+
+def load_calibration_frames(directory, limit):
+    paths = sorted(
+        p for p in glob.glob(os.path.join(directory, "**", "*"), recursive=True)
+        if p.lower().endswith((".jpg", ".jpeg", ".png"))
+    )[:limit]
+    frames = [cv2.imread(p) for p in paths]
+    return [f for f in frames if f is not None]
+
+
+def capture_calibration_frames(camera, directory, count, interval):
+    """
+    Grava `count` frames da câmera da sala em `directory`, um a cada
+    `interval` segundos, para a calibração ver a cena real (luz, ângulo,
+    pessoas de corpo inteiro). Retorna quantos foram gravados.
+    """
+    cap = cv2.VideoCapture(camera)
+    if not cap.isOpened():
+        return 0
+    os.makedirs(directory, exist_ok=True)
+    saved = 0
+    try:
+        while saved < count:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            cv2.imwrite(os.path.join(directory, f"{saved:04d}.jpg"), frame)
+            saved += 1
+            time.sleep(interval)
+    finally:
+        cap.release()
+    return saved
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta o YOLO para ONNX/OpenVINO/INT8, confere a precisão contra o PyTorch "
+        "num conjunto de frames de calibração e mede a latência de cada backend nesta máquina"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", default=settings.YOLO_MODEL_PATH)
+        parser.add_argument("--backends", default="onnx,openvino,int8")
+        parser.add_argument("--imgsz", type=int, default=settings.YOLO_IMGSZ)
+        parser.add_argument("--calibration-dir", default=settings.YOLO_CALIBRATION_DIR,
+                            help="Frames da câmera da sala (capturados da --camera se a pasta estiver vazia)")
+        parser.add_argument("--max-frames", type=int, default=100)
+        parser.add_argument("--camera", type=int, default=settings.VISION_CAMERA_INDEX)
+        parser.add_argument("--capture-interval", type=float, default=1.0,
+                            help="Intervalo (s) entre os frames capturados para calibração")
+        parser.add_argument("--runs", type=int, default=50, help="Inferências por backend na medição de latência")
+        parser.add_argument("--skip-export", action="store_true", help="Só avalia modelos já exportados")
+
+    def handle(self, *args, **options):
+        backends = [b.strip() for b in options["backends"].split(",") if b.strip()]
+        unknown = set(backends) - set(BACKENDS)
+        if unknown:
+            raise CommandError(f"Backends desconhecidos: {', '.join(sorted(unknown))}")
+
+        frames = load_calibration_frames(options["calibration_dir"], options["max_frames"])
+        if not frames:
+            self.stdout.write(f"Nenhum frame em {options['calibration_dir']}; capturando {options['max_frames']} "
+                              f"da câmera {options['camera']} (a cada {options['capture_interval']}s)")
+            capture_calibration_frames(options["camera"], options["calibration_dir"],
+                                       options["max_frames"], options["capture_interval"])
+            frames = load_calibration_frames(options["calibration_dir"], options["max_frames"])
+        if not frames:
+            raise CommandError(f"Nenhum frame de calibração em {options['calibration_dir']} e a câmera "
+                               f"{options['camera']} não abriu; aponte YOLO_CALIBRATION_DIR para frames da sala")
+        self.stdout.write(f"{len(frames)} frames de calibração de {options['calibration_dir']}")
+
+        if not options["skip_export"]:
+            for backend in backends:
+                start = time.monotonic()
+                path = export_model(options["model"], backend, options["imgsz"], calibration_frames=frames)
+                self.stdout.write(f"[{backend}] exportado em {time.monotonic() - start:.1f}s -> {path}")
+
+        # Referência: PyTorch na mesma resolução
+        reference = load_detector(options["model"], "torch", options["imgsz"])
+        expected = [self.detect(reference, frame) for frame in frames]
+
+        self.stdout.write("")
+        self.stdout.write(f"{'backend':>9} {'contagem ok':>12} {'recall':>8} {'IoU médio':>10} {'p50 ms':>8} {'p99 ms':>8} {'tamanho MB':>11}")
+        for backend in ["torch"] + [b for b in backends if b != "torch"]:
+            if backend != "torch" and not os.path.exists(exported_path(backend, options["model"])):
+                self.stdout.write(f"{backend:>9} (não exportado)")
+                continue
+            detector = load_detector(options["model"], backend, options["imgsz"])
+            accuracy = self.compare(detector, frames, expected)
+            latency = self.latency(detector, frames, options["runs"])
+            size = self.size_mb(exported_path(backend, options["model"]))
+            self.stdout.write(
+                f"{backend:>9} {accuracy['count_match']:>11.1%} {accuracy['recall']:>8.1%} "
+                f"{accuracy['mean_iou']:>10.3f} {latency['p50']:>8.1f} {latency['p99']:>8.1f} {size:>11.1f}"
+            )
+
+    def detect(self, detector, frame):
+        return box_coords(extract_boxes(detector(frame, **PERSON_MODEL_KWARGS)[0]))
+
+    def compare(self, detector, frames, expected):
+        count_match = 0
+        matched = 0
+        total = 0
+        ious = []
+        for frame, reference in zip(frames, expected):
+            boxes = self.detect(detector, frame)
+            count_match += len(boxes) == len(reference)
+            total += len(reference)
+            iou = iou_matrix(reference, boxes)
+            for r, c in greedy_assignment(iou, 0.5):
+                matched += 1
+                ious.append(float(iou[r, c]))
+        return {
+            "count_match": count_match / len(frames),
+            "recall": matched / total if total else 1.0,
+            "mean_iou": float(np.mean(ious)) if ious else 0.0,
+        }
+
+    def latency(self, detector, frames, runs):
+        detector(frames[0], **PERSON_MODEL_KWARGS)  # aquecimento
+        times = []
+        for i in range(runs):
+            start = time.perf_counter()
+            detector(frames[i % len(frames)], **PERSON_MODEL_KWARGS)
+            times.append((time.perf_counter() - start) * 1000)
+        return {"p50": float(np.percentile(times, 50)), "p99": float(np.percentile(times, 99))}
+
+    def size_mb(self, path):
+        if os.path.isdir(path):
+            return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files) / 1e6
+        return os.path.getsize(path) / 1e6
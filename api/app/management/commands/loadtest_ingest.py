@@ -0,0 +1,147 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Max, Min, Q
+from django.test import Client
+from django.utils import timezone
+
+from app import telemetry
+from app.env_cache import CAMERA_COUNTS, environment_state
+from app.models import Environment, TelemetrySample
+
+
+class WriteCounter:
+    """ execute_wrapper que conta os comandos de escrita enviados ao banco """
+
+    WRITES = ("INSERT", "UPDATE", "DELETE")
+
+    def __init__(self):
+        self.writes = 0
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        if sql.lstrip().upper().startswith(self.WRITES):
+            self.writes += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara o POST por frame em /api/people-detection/ com o endpoint em lote "
+        "/api/people-detection/batch/: requisições/s, leituras/s e escritas no banco/s. "
+        "ATENÇÃO: grava no banco configurado (no fim o Environment volta ao que era e as amostras "
+        "de teste são apagadas)"
+    )
+
+    SOURCE_PREFIX = "loadtest-"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readings", type=int, default=500, help="Leituras enviadas em cada rodada")
+        parser.add_argument("--batch-sizes", default="10,50,200", help="Tamanhos de lote do endpoint em lote")
+        parser.add_argument("--cameras", type=int, default=2)
+
+    def handle(self, *args, **options):
+        client = Client(HTTP_HOST="localhost")
+        readings = options["readings"]
+
+        # O teste mexe no Environment de verdade: guarda como estava para desfazer no fim
+        environment_state.flush()
+        snapshot = environment_state.get_state()
+        last_sample = TelemetrySample.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+
+        self.stdout.write(f"{'modo':>12} {'req/s':>9} {'leituras/s':>11} {'escritas':>9} {'escritas/s':>11} {'escritas/leitura':>17}")
+        try:
+            self.report("por frame", self.run_round(self.per_frame, client, readings, options["cameras"], 1))
+            for size in [int(s) for s in options["batch_sizes"].split(",")]:
+                row = self.run_round(self.batch, client, readings, options["cameras"], size)
+                self.report(f"lote {size}", row)
+        finally:
+            self.restore(snapshot, last_sample)
+
+    def restore(self, snapshot, last_sample):
+        """ Volta o Environment ao estado de antes e apaga as amostras gravadas pelo teste """
+        telemetry.writer.flush()
+
+        def undo(state):
+            state.update({name: snapshot[name] for name in [*Environment.PRESENCE_FIELDS, "vision_count"]})
+            cameras = {camera: entry for camera, entry in state.get(CAMERA_COUNTS, {}).items()
+                       if not camera.startswith(self.SOURCE_PREFIX)}
+            if cameras or CAMERA_COUNTS in state:
+                state[CAMERA_COUNTS] = cameras
+
+        environment_state.update_with(undo)
+        environment_state.flush()
+
+        # O caminho por frame grava amostras com a origem comum do endpoint
+        samples = TelemetrySample.objects.filter(
+            Q(source__startswith=self.SOURCE_PREFIX) | Q(pk__gt=last_sample, source="people-detection")
+        )
+        span = samples.aggregate(start=Min("timestamp"), end=Max("timestamp"))
+        samples.delete()
+        if span["start"] is not None:
+            # Os agregados por minuto/hora já tinham somado essas amostras
+            telemetry.rebuild_rollups(span["start"], span["end"])
+
+    def report(self, label, row):
+        self.stdout.write(
+            f"{label:>12} {row['requests'] / row['elapsed']:>9.1f} {row['readings'] / row['elapsed']:>11.1f} "
+            f"{row['writes']:>9} {row['writes'] / row['elapsed']:>11.1f} {row['writes'] / row['readings']:>17.2f}"
+        )
+
+    def make_readings(self, total, cameras):
+        now = timezone.now().isoformat()
+        return [
+            {
+                "timestamp": now,
+                "camera": f"{self.SOURCE_PREFIX}{i % cameras}",
+                "people_count": i % 5,
+                "temperatura": 24.0 + (i % 10) / 10,
+                "umidade": 55.0,
+            }
+            for i in range(total)
+        ]
+
+    def run_round(self, send, client, total, cameras, batch_size):
+        payload = self.make_readings(total, cameras)
+        counter = WriteCounter()
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            requests_sent = send(client, payload, batch_size)
+            # O caminho por frame grava telemetria e Environment em segundo
+            # plano; o flush entra na conta para a comparação ser justa
+            telemetry.writer.flush()
+            environment_state.flush()
+            elapsed = time.perf_counter() - start
+        return {"requests": requests_sent, "readings": total, "writes": counter.writes, "elapsed": elapsed}
+
+    def per_frame(self, client, payload, batch_size):
+        for reading in payload:
+            response = client.post(
+                "/api/people-detection/",
+                {
+                    "temperatura": reading["temperatura"],
+                    "umidade": reading["umidade"],
+                    "ultimo_rfid": f"{self.SOURCE_PREFIX}rfid",
+                    "tem_presenca": False,
+                },
+                content_type="application/json",
+            )
+            if response.status_code != 200:
+                raise RuntimeError(f"people-detection respondeu {response.status_code}")
+        return len(payload)
+
+    def batch(self, client, payload, batch_size):
+        sent = 0
+        for i in range(0, len(payload), batch_size):
+            response = client.post(
+                "/api/people-detection/batch/",
+                json.dumps({"readings": payload[i:i + batch_size]}),
+                content_type="application/json",
+            )
+            if response.status_code != 201:
+                raise RuntimeError(f"people-detection/batch respondeu {response.status_code}: {response.content[:200]}")
+            sent += 1
+        return sent
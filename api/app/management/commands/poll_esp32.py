@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from app.esp32_poller import ESP32Poller
+
+
+class Command(BaseCommand):
+    help = (
+        "Consulta o ESP32 em segundo plano (/status_rfid e /status) e grava no "
+        "Environment só os valores que mudaram. As views passam a só ler o estado"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rfid-interval", type=float, default=settings.ESP32_RFID_POLL_INTERVAL)
+        parser.add_argument("--status-interval", type=float, default=settings.ESP32_STATUS_POLL_INTERVAL)
+        parser.add_argument("--stats-interval", type=float, default=60.0, help="0 desliga o log de métricas")
+
+    def handle(self, *args, **options):
+        poller = ESP32Poller(rfid_interval=options["rfid_interval"], status_interval=options["status_interval"])
+        self.stdout.write(
+            f"Consultando {poller.client.base_url}: /status_rfid a cada {poller.rfid_interval}s, "
+            f"/status a cada {poller.status_interval}s"
+        )
+        last_stats = time.monotonic()
+        try:
+            while True:
+                try:
+                    changes = poller.poll_once()
+                finally:
+                    close_old_connections()
+                if changes:
+                    self.stdout.write(f"Atualizado: {changes}")
+                if options["stats_interval"] and time.monotonic() - last_stats >= options["stats_interval"]:
+                    self.stdout.write(f"[poller] {poller.stats()}")
+                    last_stats = time.monotonic()
+                time.sleep(poller.seconds_to_next())
+        except KeyboardInterrupt:
+            self.stdout.write(f"[poller] {poller.stats()}")
@@ -0,0 +1,117 @@
+import os
+import time
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.backends import BACKENDS
+from app.inference import DEFAULT_MODEL_PATH, load_model
+from app.motion import MotionGate
+from app.postprocess import PERSON_MODEL_KWARGS, extract_boxes
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def read_frames(source):
+    """ (frames, fps) de um vídeo ou de uma pasta de imagens (ordem alfabética) """
+    if os.path.isdir(source):
+        names = sorted(n for n in os.listdir(source) if n.lower().endswith(IMAGE_EXTENSIONS))
+        return (cv2.imread(os.path.join(source, n)) for n in names), None
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise CommandError(f"Não foi possível abrir {source}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or None
+
+    def frames():
+        try:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    return
+                yield frame
+        finally:
+            cap.release()
+    return frames(), fps
+
+
+def compare_counts(full, gated):
+    """
+    (fração de frames com a mesma contagem, erro médio, maior sequência de
+    frames com contagem errada) da contagem com portão contra a de todo frame
+    """
+    full, gated = np.asarray(full), np.asarray(gated)
+    wrong = full != gated
+    # Maior sequência de frames com contagem errada (quanto tempo a contagem ficou velha)
+    longest = run = 0
+    for miss in wrong:
+        run = run + 1 if miss else 0
+        longest = max(longest, run)
+    return 1 - wrong.mean(), np.abs(full - gated).mean(), longest
+
+
+class Command(BaseCommand):
+    help = (
+        "Reproduz um vídeo (ou pasta de frames) com o YOLO em todo frame e com o MotionGate, "
+        "e compara a contagem de pessoas, a fração de frames pulados e o tempo de CPU"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="Arquivo de vídeo ou pasta com frames")
+        parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+        parser.add_argument("--backend", default=settings.YOLO_BACKEND, choices=BACKENDS)
+        parser.add_argument("--imgsz", type=int, default=settings.YOLO_IMGSZ)
+        parser.add_argument("--fps", type=float, default=None, help="Taxa do replay (padrão: a do vídeo, ou 15)")
+        parser.add_argument("--min-refresh", type=float, default=2.0)
+        parser.add_argument("--threshold", type=int, default=25)
+        parser.add_argument("--min-area", type=float, default=0.01)
+        parser.add_argument("--width", type=int, default=160, help="Largura do frame reduzido do portão")
+
+    def handle(self, *args, **options):
+        model = load_model(options["model"], backend=options["backend"], imgsz=options["imgsz"])
+        frames, video_fps = read_frames(options["source"])
+        fps = options["fps"] or video_fps or 15.0
+        gate = MotionGate(width=options["width"], threshold=options["threshold"],
+                          min_area=options["min_area"], min_refresh=options["min_refresh"])
+
+        full_counts, gated_counts = [], []
+        infer_seconds = 0.0
+        gated_count = None
+        for i, frame in enumerate(frames):
+            if frame is None:
+                continue
+            # O YOLO roda em todo frame (referência); o caminho com portão só
+            # "paga" a inferência dos frames que o portão deixa passar
+            start = time.perf_counter()
+            result = model([frame], **PERSON_MODEL_KWARGS)[0]
+            count = len(extract_boxes(result))
+            elapsed = time.perf_counter() - start
+            infer_seconds += elapsed
+
+            # Relógio do vídeo, não o da máquina: o min_refresh vale em tempo de replay
+            if gate.should_infer(frame, now=i / fps):
+                gate.record_inference(elapsed)
+                gated_count = count
+            full_counts.append(count)
+            gated_counts.append(gated_count)
+
+        if not full_counts:
+            raise CommandError("Nenhum frame lido")
+        self.report(full_counts, gated_counts, gate, infer_seconds, fps)
+
+    def report(self, full, gated, gate, infer_seconds, fps):
+        stats = gate.stats()
+        agreement, mean_error, longest = compare_counts(full, gated)
+        gate_seconds = stats["gate_ms"] * stats["frames"] / 1000
+        gated_seconds = stats["infer_ms"] * stats["inferred"] / 1000 + gate_seconds
+
+        self.stdout.write(f"Frames: {len(full)} a {fps:.1f} fps ({len(full) / fps:.1f}s de vídeo)")
+        self.stdout.write(f"Inferidos: {stats['inferred']} (refresh forçado: {stats['refreshes']}), "
+                          f"pulados: {stats['skipped']} ({stats['skip_ratio']:.1%})")
+        self.stdout.write(f"Contagem igual à do YOLO em todo frame: {agreement:.2%} dos frames, "
+                          f"erro médio {mean_error:.3f} pessoa, "
+                          f"maior atraso {longest} frames ({longest / fps:.2f}s)")
+        self.stdout.write(f"Tempo de CPU: {infer_seconds:.2f}s sem portão, {gated_seconds:.2f}s com portão "
+                          f"(portão {stats['gate_ms']:.3f} ms/frame); economia "
+                          f"{1 - gated_seconds / max(infer_seconds, 1e-9):.1%}")
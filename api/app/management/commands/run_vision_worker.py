@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.backends import BACKENDS
+from app.vision_worker import VisionWorker
+
+
+class Command(BaseCommand):
+    help = "Inicia o worker de visão (câmera + modelos carregados) que atende o Celery e as views"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--address", default=settings.VISION_WORKER_ADDRESS)
+        parser.add_argument("--camera", type=int, default=settings.VISION_CAMERA_INDEX)
+        parser.add_argument("--yolo", default=settings.YOLO_MODEL_PATH)
+        parser.add_argument("--backend", default=settings.YOLO_BACKEND, choices=BACKENDS)
+        parser.add_argument("--imgsz", type=int, default=settings.YOLO_IMGSZ)
+        parser.add_argument("--face-model", default=settings.FACE_MODEL_PATH,
+                            help="Pasta de modelos versionados (troca sozinho de versão) ou um .yml")
+        parser.add_argument("--face-model-check-interval", type=float, default=settings.FACE_MODEL_CHECK_INTERVAL)
+        parser.add_argument("--decision-max-frames", type=int, default=settings.VISION_DECISION_MAX_FRAMES)
+        parser.add_argument("--decision-max-seconds", type=float, default=settings.VISION_DECISION_MAX_SECONDS)
+
+    def handle(self, *args, **options):
+        worker = VisionWorker(
+            options["yolo"],
+            options["face_model"],
+            camera_index=options["camera"],
+            decision_max_frames=options["decision_max_frames"],
+            decision_max_seconds=options["decision_max_seconds"],
+            yolo_backend=options["backend"],
+            yolo_imgsz=options["imgsz"],
+            face_model_check_interval=options["face_model_check_interval"],
+        )
+        self.stdout.write(f"Iniciando worker de visão em {options['address']}...")
+        try:
+            worker.serve_forever(options["address"])
+        except KeyboardInterrupt:
+            self.stdout.write("Worker de visão encerrado.")
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copy_detected_people(apps, schema_editor):
+    Environment = apps.get_model('app', 'Environment')
+    Occupant = apps.get_model('app', 'Occupant')
+    for env in Environment.objects.all():
+        rfids = list(dict.fromkeys(env.detected_people or []))
+        Occupant.objects.bulk_create([Occupant(environment=env, rfid=rfid) for rfid in rfids])
+
+
+def restore_detected_people(apps, schema_editor):
+    Environment = apps.get_model('app', 'Environment')
+    Occupant = apps.get_model('app', 'Occupant')
+    for env in Environment.objects.all():
+        env.detected_people = list(Occupant.objects.filter(environment=env).values_list('rfid', flat=True))
+        env.save(update_fields=['detected_people'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_environment_has_presence_environment_people_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Occupant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rfid', models.CharField(max_length=50)),
+                ('entered_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('environment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupants', to='app.environment')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('environment', 'rfid'), name='unique_occupant_per_environment')],
+            },
+        ),
+        migrations.RunPython(copy_detected_people, restore_detected_people),
+        migrations.RemoveField(
+            model_name='environment',
+            name='detected_people',
+        ),
+    ]
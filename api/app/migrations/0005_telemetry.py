@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_occupant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelemetrySample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(db_index=True)),
+                ('source', models.CharField(blank=True, max_length=50)),
+                ('people_count', models.PositiveIntegerField(blank=True, null=True)),
+                ('temperature', models.FloatField(blank=True, null=True)),
+                ('humidity', models.FloatField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TelemetryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('minute', 'Minuto'), ('hour', 'Hora')], max_length=10)),
+                ('bucket', models.DateTimeField()),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('occupancy_count', models.PositiveIntegerField(default=0)),
+                ('occupancy_sum', models.FloatField(default=0.0)),
+                ('occupancy_min', models.FloatField(blank=True, null=True)),
+                ('occupancy_max', models.FloatField(blank=True, null=True)),
+                ('temperature_count', models.PositiveIntegerField(default=0)),
+                ('temperature_sum', models.FloatField(default=0.0)),
+                ('temperature_min', models.FloatField(blank=True, null=True)),
+                ('temperature_max', models.FloatField(blank=True, null=True)),
+                ('humidity_count', models.PositiveIntegerField(default=0)),
+                ('humidity_sum', models.FloatField(default=0.0)),
+                ('humidity_min', models.FloatField(blank=True, null=True)),
+                ('humidity_max', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('resolution', 'bucket'), name='unique_rollup_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_telemetry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='log',
+            name='event_type',
+            field=models.CharField(choices=[('access', 'Acesso'), ('vision', 'Visão'), ('device', 'Dispositivo'), ('system', 'Sistema')], default='system', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='latency_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='outcome',
+            field=models.CharField(blank=True, choices=[('granted', 'Permitido'), ('denied', 'Negado'), ('error', 'Erro')], max_length=20),
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='rfid',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['created_at', 'id'], name='log_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['outcome', 'created_at'], name='log_outcome_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['event_type', 'created_at'], name='log_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['rfid', 'created_at'], name='log_rfid_created_idx'),
+        ),
+    ]
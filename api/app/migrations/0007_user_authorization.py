@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:24
+
+from django.db import migrations, models
+
+# Antes ficava fixo em tasks.py: AUTHORIZED_NAME, AUTHORIZED_RFID e ISRAEL_FACE_ID
+LEGACY_NAME = 'Israel'
+LEGACY_RFID = '6C3ACB33'
+LEGACY_FACE_LABEL = 1
+
+
+def authorize_legacy_user(apps, schema_editor):
+    User = apps.get_model('app', 'User')
+    User.objects.filter(name=LEGACY_NAME, rfid=LEGACY_RFID).update(is_authorized=True, face_label=LEGACY_FACE_LABEL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_log_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='face_label',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='is_authorized',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(authorize_legacy_user, migrations.RunPython.noop),
+    ]
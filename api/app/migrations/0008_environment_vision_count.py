@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:49
+
+from django.db import migrations, models
+
+
+def recount_rfid_occupancy(apps, schema_editor):
+    # Até aqui a visão também gravava em people_count; a partir de agora ele
+    # é só de quem está na tabela Occupant
+    Environment = apps.get_model('app', 'Environment')
+    Occupant = apps.get_model('app', 'Occupant')
+    for env in Environment.objects.all():
+        count = Occupant.objects.filter(environment=env).count()
+        Environment.objects.filter(pk=env.pk).update(people_count=count, has_presence=count > 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_user_authorization'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='environment',
+            name='vision_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(recount_rfid_occupancy, migrations.RunPython.noop),
+    ]
@@ -1,16 +1,47 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.dispatch import Signal
 from django.utils import timezone
 
+# update() e bulk_create() não disparam post_save; o UserQuerySet avisa por
+# este sinal (a allowlist se invalida em signals.py). bulk_update() passa pelo
+# update() do próprio queryset.
+users_bulk_changed = Signal()
+
+
+class UserQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        if rows:
+            users_bulk_changed.send(sender=User)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        created = super().bulk_create(objs, *args, **kwargs)
+        if created:
+            users_bulk_changed.send(sender=User)
+        return created
+
+
 class User(models.Model):
     name = models.CharField(max_length=100)
     rfid = models.CharField(max_length=50, unique=True)
+    # Label do rosto no modelo LBPH (trainer.yml); o RFID só libera se este rosto for confirmado
+    face_label = models.PositiveIntegerField(null=True, blank=True)
+    is_authorized = models.BooleanField(default=False)
+
+    objects = UserQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
 class Environment(models.Model):
-    detected_people = models.JSONField(default=list, blank=True)
+    # Duas fontes de ocupação, cada uma com o seu campo: people_count é de
+    # quem entrou por RFID (tabela Occupant, atualizado com F()) e
+    # vision_count é a última contagem das câmeras (valor absoluto).
+    # has_presence vale se qualquer uma das duas vê alguém.
     people_count = models.PositiveIntegerField(default=0)      
+    vision_count = models.PositiveIntegerField(default=0)
     has_presence = models.BooleanField(default=False)         
     temperature = models.FloatField(default=0.0)
     humidity = models.FloatField(default=0.0)
@@ -21,32 +52,141 @@ class Environment(models.Model):
     light_red = models.BooleanField(default=False)
     last_update = models.DateTimeField(default=timezone.now)
 
+    # Campos gravados por update_presence (o resto da linha não é reescrito)
+    PRESENCE_FIELDS = ["people_count", "has_presence", "temperature", "humidity", "last_rfid", "last_update"]
+
+    @property
+    def detected_people(self):
+        """ RFIDs presentes; o cache do Environment preenche _detected_people para evitar a consulta """
+        if getattr(self, "_detected_people", None) is None:
+            self._detected_people = list(self.occupants.order_by("entered_at", "pk").values_list("rfid", flat=True))
+        return self._detected_people
 
     def update_presence(self, rfid, temperature, humidity, presence):
-        self.last_rfid = rfid
+        """
+        Entrada/saída de um RFID de forma atômica: a presença é uma linha em
+        Occupant (única por ambiente) e o contador muda com F(), então
+        requisições concorrentes não perdem atualizações umas das outras.
+        """
+        with transaction.atomic():
+            # Serializa entradas/saídas do mesmo ambiente (no SQLite a transação já faz isso)
+            Environment.objects.select_for_update().filter(pk=self.pk).values_list("pk", flat=True).first()
 
-        if presence:
-            if rfid not in self.detected_people:
-                self.detected_people.append(rfid)  
-            self.people_count = len(self.detected_people)  
-        else:
-            if rfid in self.detected_people:
-                self.detected_people.remove(rfid)  
-            self.people_count = len(self.detected_people)
+            if presence:
+                _, created = Occupant.objects.get_or_create(environment_id=self.pk, rfid=rfid)
+                delta = 1 if created else 0
+            else:
+                delta, _ = Occupant.objects.filter(environment_id=self.pk, rfid=rfid).delete()
+                delta = -delta
 
-        self.has_presence = bool(self.people_count)
+            fields = {
+                "last_rfid": rfid,
+                "temperature": temperature,
+                "humidity": humidity,
+                "last_update": timezone.now(),
+            }
+            if delta:
+                # O UPDATE enxerga o valor antigo: novo > 0  <=>  antigo > -delta
+                fields["people_count"] = F("people_count") + delta
+                fields["has_presence"] = Case(
+                    When(Q(people_count__gt=-delta) | Q(vision_count__gt=0), then=Value(True)),
+                    default=Value(False),
+                )
+            Environment.objects.filter(pk=self.pk).update(**fields)
 
-        self.temperature = temperature
-        self.humidity = humidity
+        self.refresh_from_db(fields=self.PRESENCE_FIELDS)
+        self._detected_people = None
+        return self
 
-        self.last_update = timezone.now()
 
-        self.save()
-        return self
+class Occupant(models.Model):
+    environment = models.ForeignKey(Environment, on_delete=models.CASCADE, related_name="occupants")
+    rfid = models.CharField(max_length=50)
+    entered_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["environment", "rfid"], name="unique_occupant_per_environment"),
+        ]
+
+    def __str__(self):
+        return self.rfid
 
 class Log(models.Model):
+    # Tipos de evento
+    ACCESS = "access"
+    VISION = "vision"
+    DEVICE = "device"
+    SYSTEM = "system"
+    EVENT_TYPES = [(ACCESS, "Acesso"), (VISION, "Visão"), (DEVICE, "Dispositivo"), (SYSTEM, "Sistema")]
+
+    # Resultados
+    GRANTED = "granted"
+    DENIED = "denied"
+    ERROR = "error"
+    OUTCOMES = [(GRANTED, "Permitido"), (DENIED, "Negado"), (ERROR, "Erro")]
+
     event = models.CharField(max_length=255)
     created_at = models.DateTimeField(default=timezone.now)
+    event_type = models.CharField(max_length=20, choices=EVENT_TYPES, default=SYSTEM)
+    rfid = models.CharField(max_length=50, blank=True)
+    outcome = models.CharField(max_length=20, choices=OUTCOMES, blank=True)
+    latency_ms = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Paginação por (created_at, id) e consultas por intervalo de tempo
+            models.Index(fields=["created_at", "id"], name="log_created_idx"),
+            models.Index(fields=["outcome", "created_at"], name="log_outcome_created_idx"),
+            models.Index(fields=["event_type", "created_at"], name="log_type_created_idx"),
+            models.Index(fields=["rfid", "created_at"], name="log_rfid_created_idx"),
+        ]
 
     def __str__(self):
         return f"[{self.created_at}] {self.event}"
+
+
+class TelemetrySample(models.Model):
+    """ Amostra bruta (só inserção); gravada em lote por app/telemetry.py """
+    timestamp = models.DateTimeField(db_index=True)
+    source = models.CharField(max_length=50, blank=True)
+    people_count = models.PositiveIntegerField(null=True, blank=True)
+    temperature = models.FloatField(null=True, blank=True)
+    humidity = models.FloatField(null=True, blank=True)
+
+    def __str__(self):
+        return f"[{self.timestamp}] {self.source} pessoas={self.people_count} temp={self.temperature} umid={self.humidity}"
+
+
+class TelemetryRollup(models.Model):
+    """ Agregado por minuto/hora, atualizado incrementalmente a cada lote de amostras """
+    MINUTE = "minute"
+    HOUR = "hour"
+    RESOLUTIONS = [(MINUTE, "Minuto"), (HOUR, "Hora")]
+
+    resolution = models.CharField(max_length=10, choices=RESOLUTIONS)
+    bucket = models.DateTimeField()
+    samples = models.PositiveIntegerField(default=0)
+
+    occupancy_count = models.PositiveIntegerField(default=0)
+    occupancy_sum = models.FloatField(default=0.0)
+    occupancy_min = models.FloatField(null=True, blank=True)
+    occupancy_max = models.FloatField(null=True, blank=True)
+
+    temperature_count = models.PositiveIntegerField(default=0)
+    temperature_sum = models.FloatField(default=0.0)
+    temperature_min = models.FloatField(null=True, blank=True)
+    temperature_max = models.FloatField(null=True, blank=True)
+
+    humidity_count = models.PositiveIntegerField(default=0)
+    humidity_sum = models.FloatField(default=0.0)
+    humidity_min = models.FloatField(null=True, blank=True)
+    humidity_max = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["resolution", "bucket"], name="unique_rollup_bucket"),
+        ]
+
+    def __str__(self):
+        return f"{self.resolution} {self.bucket} ({self.samples} amostras)"
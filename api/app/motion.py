@@ -0,0 +1,97 @@
+import time
+
+import cv2
+import numpy as np
+
+# Pré-estágio barato antes do YOLO: com a sala vazia ou parada, a detecção
+# anterior continua valendo e a inferência não roda.
+
+
+class MotionGate:
+    """
+    Decide, por câmera, se o frame precisa passar pelo YOLO.
+
+    Compara uma versão pequena em tons de cinza do frame (`width` pixels de
+    largura, com blur para tirar o ruído do sensor) com a do último frame que
+    foi inferido. Se a fração de pixels que mudaram mais que `threshold` níveis
+    passar de `min_area`, algo se mexeu e o YOLO roda. Comparar com o último
+    frame inferido, e não com o anterior, faz um movimento lento acumular até
+    disparar.
+
+    Mesmo sem movimento o YOLO roda a cada `min_refresh` segundos: uma pessoa
+    parada não some da contagem e mudanças lentas de luz não ficam presas.
+    """
+
+    def __init__(self, width=160, threshold=25, min_area=0.01, min_refresh=2.0, blur=5):
+        self.width = width
+        self.threshold = threshold
+        self.min_area = min_area
+        self.min_refresh = min_refresh
+        self.blur = blur
+
+        self._reference = None
+        self._last_inference = None
+
+        self.frames = 0
+        self.inferred = 0
+        self.skipped = 0
+        self.refreshes = 0
+        self.last_motion = 0.0
+        self._gate_seconds = 0.0
+        self._infer_seconds = 0.0
+        self._infer_samples = 0
+
+    def prepare(self, frame):
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(1, round(h * self.width / w))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (self.blur, self.blur), 0) if self.blur else gray
+
+    def motion(self, small):
+        """ Fração dos pixels que mudaram em relação à referência """
+        diff = cv2.absdiff(small, self._reference)
+        return np.count_nonzero(diff > self.threshold) / diff.size
+
+    def should_infer(self, frame, now=None):
+        now = time.monotonic() if now is None else now
+        start = time.perf_counter()
+        small = self.prepare(frame)
+        self.frames += 1
+
+        if self._reference is None or self._reference.shape != small.shape:
+            run = True
+        else:
+            self.last_motion = self.motion(small)
+            run = self.last_motion > self.min_area
+            if not run and now - self._last_inference >= self.min_refresh:
+                run = True
+                self.refreshes += 1
+
+        if run:
+            self._reference = small
+            self._last_inference = now
+            self.inferred += 1
+        else:
+            self.skipped += 1
+        self._gate_seconds += time.perf_counter() - start
+        return run
+
+    def record_inference(self, seconds, frames=1):
+        """ Tempo de YOLO gasto nos frames que passaram (para estimar o que foi economizado) """
+        self._infer_seconds += seconds
+        self._infer_samples += frames
+
+    def stats(self):
+        avg_infer = self._infer_seconds / self._infer_samples if self._infer_samples else 0.0
+        return {
+            "frames": self.frames,
+            "inferred": self.inferred,
+            "skipped": self.skipped,
+            "refreshes": self.refreshes,
+            "skip_ratio": round(self.skipped / self.frames, 3) if self.frames else 0.0,
+            "last_motion": round(self.last_motion, 4),
+            "gate_ms": round(self._gate_seconds / self.frames * 1000, 3) if self.frames else 0.0,
+            "infer_ms": round(avg_infer * 1000, 1),
+            # Inferências que não rodaram menos o custo do próprio portão
+            "cpu_saved_s": round(self.skipped * avg_infer - self._gate_seconds, 1),
+        }
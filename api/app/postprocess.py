@@ -0,0 +1,61 @@
+import numpy as np
+
+PERSON_CLASS = 0
+PERSON_CONFIDENCE = 0.5
+
+# Filtro aplicado já dentro da chamada do modelo (o NMS descarta o resto)
+PERSON_MODEL_KWARGS = {"classes": [PERSON_CLASS], "conf": PERSON_CONFIDENCE, "verbose": False}
+
+BOX_DTYPE = np.dtype([
+    ("x1", np.int32),
+    ("y1", np.int32),
+    ("x2", np.int32),
+    ("y2", np.int32),
+    ("conf", np.float32),
+    ("cls", np.int16),
+])
+
+
+def empty_boxes():
+    return np.empty(0, dtype=BOX_DTYPE)
+
+
+def extract_boxes(result, classes=(PERSON_CLASS,), min_conf=PERSON_CONFIDENCE):
+    """
+    Converte as caixas de um resultado do YOLO num array estruturado BOX_DTYPE.
+
+    Faz uma única cópia para a CPU por frame (`boxes.data`, N x 6: x1, y1, x2,
+    y2, conf, cls) e filtra classe/confiança com máscara NumPy, em vez de
+    `int(box.cls[0])`, `float(box.conf[0])` e `box.xyxy[0]` caixa por caixa.
+    """
+    boxes = getattr(result, "boxes", None)
+    if boxes is None or len(boxes) == 0:
+        return empty_boxes()
+
+    data = boxes.data
+    data = data.cpu().numpy() if hasattr(data, "cpu") else np.asarray(data)
+    # Com tracking o YOLO insere a coluna de id antes de conf/cls; por isso -2 e -1
+    conf = data[:, -2]
+    cls = data[:, -1]
+
+    mask = conf > min_conf
+    if classes is not None:
+        mask &= np.isin(cls, classes)
+    kept = data[mask]
+
+    out = np.empty(len(kept), dtype=BOX_DTYPE)
+    coords = kept[:, :4].astype(np.int32)
+    out["x1"], out["y1"], out["x2"], out["y2"] = coords.T
+    out["conf"] = kept[:, -2]
+    out["cls"] = kept[:, -1]
+    return out
+
+
+def box_coords(boxes):
+    """ Só as coordenadas, como array (N, 4) de int32 """
+    return np.stack([boxes["x1"], boxes["y1"], boxes["x2"], boxes["y2"]], axis=1) if len(boxes) else np.empty((0, 4), np.int32)
+
+
+def box_tuples(boxes):
+    """ Lista de tuplas (x1, y1, x2, y2) com int do Python (para o OpenCV desenhar) """
+    return [tuple(row) for row in box_coords(boxes).tolist()]
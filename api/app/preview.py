@@ -0,0 +1,186 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+
+def draw_detections(frame, people_boxes, people_count):
+    """ Desenha as caixas e a contagem direto no frame recebido """
+    for (x1, y1, x2, y2) in people_boxes:
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(frame, "Pessoa", (x1, y1-5),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,255,0), 1)
+    cv2.putText(frame, f"Count: {people_count}", (10,30),
+                cv2.FONT_HERSHEY_SIMPLEX, 1, (0,0,255), 2)
+    return frame
+
+
+class PreviewSink:
+    """
+    Base das saídas de preview. O loop de visão só chama `offer()`, que guarda
+    uma referência ao último frame e às detecções. Uma thread própria, no seu
+    próprio FPS, copia esse frame, desenha as caixas e entrega para `emit()`.
+    """
+
+    def __init__(self, fps=5.0):
+        self.fps = fps
+        self._lock = threading.Lock()
+        self._latest = None
+        self._version = 0
+        self._running = False
+        self._thread = None
+        self.emitted = 0
+
+    def start(self):
+        if self._running:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._worker, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        self.close()
+
+    def offer(self, frame, people_boxes, people_count):
+        # Nada de cópia nem desenho aqui: isso roda no caminho quente
+        with self._lock:
+            self._latest = (frame, list(people_boxes), people_count)
+            self._version += 1
+
+    def _worker(self):
+        interval = 1.0 / self.fps
+        seen = 0
+        while self._running:
+            started = time.monotonic()
+            with self._lock:
+                latest, version = self._latest, self._version
+            if latest is not None and version != seen:
+                seen = version
+                frame, people_boxes, people_count = latest
+                try:
+                    self.emit(draw_detections(frame.copy(), people_boxes, people_count))
+                    self.emitted += 1
+                except Exception as e:
+                    print(f"Erro no preview {type(self).__name__}: {e}")
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    def emit(self, frame):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class VideoFilePreview(PreviewSink):
+    """ Grava o preview anotado num arquivo de vídeo """
+
+    def __init__(self, path, fps=5.0, fourcc="MJPG"):
+        super().__init__(fps)
+        self.path = path
+        self.fourcc = fourcc
+        self._writer = None
+
+    def emit(self, frame):
+        if self._writer is None:
+            height, width = frame.shape[:2]
+            self._writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc),
+                                           self.fps, (width, height))
+        self._writer.write(frame)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+
+class MJPEGPreviewServer(PreviewSink):
+    """
+    Serve o preview como stream MJPEG (multipart/x-mixed-replace).
+    Abra http://<host>:<port>/ no navegador. O JPEG é codificado uma vez por
+    frame de preview, não uma vez por cliente.
+    """
+
+    def __init__(self, host="0.0.0.0", port=8081, fps=5.0, quality=70):
+        super().__init__(fps)
+        self.host = host
+        self.port = port
+        self.quality = quality
+        self._jpeg = None
+        self._jpeg_cond = threading.Condition()
+        self._server = None
+        self._server_thread = None
+
+    def start(self):
+        if self._running:
+            return self
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                last = None
+                try:
+                    while sink._running:
+                        with sink._jpeg_cond:
+                            sink._jpeg_cond.wait_for(lambda: sink._jpeg is not last or not sink._running, timeout=5)
+                            jpeg = sink._jpeg
+                        if jpeg is None or jpeg is last:
+                            continue
+                        last = jpeg
+                        self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\n")
+                        self.wfile.write(f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                        self.wfile.write(jpeg)
+                        self.wfile.write(b"\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self._server_thread = threading.Thread(target=self._server.serve_forever, name="mjpeg-preview", daemon=True)
+        self._server_thread.start()
+        print(f"[PREVIEW] MJPEG em http://{self.host}:{self.port}/")
+        return super().start()
+
+    def emit(self, frame):
+        ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if ok:
+            with self._jpeg_cond:
+                self._jpeg = buffer.tobytes()
+                self._jpeg_cond.notify_all()
+
+    def close(self):
+        with self._jpeg_cond:
+            self._jpeg_cond.notify_all()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def create_preview(spec, fps=5.0):
+    """
+    Cria o preview a partir de uma string de configuração:
+      "mjpeg:8081"           -> stream MJPEG na porta 8081
+      "file:/tmp/preview.avi" -> grava em arquivo
+      ""                     -> sem preview
+    """
+    if not spec:
+        return None
+    kind, _, arg = spec.partition(":")
+    if kind == "mjpeg":
+        return MJPEGPreviewServer(port=int(arg or 8081), fps=fps)
+    if kind == "file":
+        return VideoFilePreview(arg or "preview.avi", fps=fps)
+    raise ValueError(f"Preview desconhecido: {spec}")
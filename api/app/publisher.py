@@ -0,0 +1,184 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class PresencePublisher:
+    """
+    Envia a contagem de pessoas para o Django numa thread própria.
+
+    `publish()` nunca bloqueia: só guarda o valor mais recente. A thread envia
+    quando o valor muda ou quando passa o intervalo de heartbeat, reaproveitando
+    a mesma conexão (keep-alive). Em caso de falha tenta de novo com backoff
+    exponencial, sempre com o valor mais novo.
+
+    Com `events_url`, os eventos de entrada/saída do OccupancyCounter vão
+    junto com a contagem num POST para esse endpoint (no lugar do PATCH). Os
+    eventos ficam na fila até o envio dar certo; com o Django fora do ar por
+    muito tempo, os mais antigos além de `max_events` são descartados.
+    """
+
+    def __init__(self, url, heartbeat=30.0, timeout=2.0, min_backoff=0.5, max_backoff=30.0,
+                 events_url=None, max_events=1000):
+        self.url = url
+        self.events_url = events_url
+        self.max_events = max_events
+        self.heartbeat = heartbeat
+        self.timeout = timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        # Worker e stop() não enviam ao mesmo tempo
+        self._send_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._latest = None
+        self._sent = None
+        self._events = []
+        self._last_sent_at = 0.0
+        self._running = False
+        self._thread = None
+
+        self.published = 0
+        self.sent = 0
+        self.failures = 0
+        self.coalesced = 0
+        self.events_sent = 0
+        self.events_dropped = 0
+
+    def start(self):
+        if self._running:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._worker, name="presence-publisher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, flush_timeout=2.0):
+        """ Para a thread e envia o último valor (e eventos) que ainda não saiu """
+        self._running = False
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=flush_timeout)
+            self._thread = None
+        self.flush()
+        self.session.close()
+
+    def publish(self, people_count, events=()):
+        """ Chamado pelo loop de visão a cada frame; só registra o valor (e os eventos) """
+        with self._lock:
+            self.published += 1
+            if self._latest not in (None, self._sent, people_count):
+                # Ainda não saiu o anterior: ele é substituído pelo novo
+                self.coalesced += 1
+            self._latest = people_count
+            if events and self.events_url:
+                self._events.extend(events)
+                overflow = len(self._events) - self.max_events
+                if overflow > 0:
+                    del self._events[:overflow]
+                    self.events_dropped += overflow
+        self._wakeup.set()
+
+    def _payload(self, people_count):
+        return {
+            "people_count": people_count,
+            "has_presence": people_count > 0
+        }
+
+    def _send(self, people_count, events):
+        if self.events_url:
+            payload = dict(self._payload(people_count), events=events)
+            response = self.session.post(self.events_url, json=payload, timeout=self.timeout)
+        else:
+            response = self.session.patch(self.url, json=self._payload(people_count), timeout=self.timeout)
+        if response.status_code not in (200, 201):
+            raise requests.HTTPError(f"status {response.status_code}: {response.text[:200]}")
+
+    def _pending(self):
+        """ (valor, eventos, descartados até agora, mudou desde o último envio) """
+        with self._lock:
+            events = list(self._events) if self.events_url else []
+            return self._latest, events, self.events_dropped, self._latest != self._sent
+
+    def _deliver(self, value, events, dropped):
+        """ Envia e, se deu certo, marca o valor e os eventos como enviados """
+        with self._send_lock:
+            self._send(value, events)
+            self.sent += 1
+            self._last_sent_at = time.monotonic()
+            with self._lock:
+                self._sent = value
+                # Os enviados estão no começo da fila, menos os que o estouro já tirou
+                del self._events[:max(0, len(events) - (self.events_dropped - dropped))]
+            self.events_sent += len(events)
+
+    def flush(self):
+        """ Envia agora o que estiver pendente; retorna True se enviou """
+        value, events, dropped, changed = self._pending()
+        if value is None or not (changed or events):
+            return False
+        try:
+            self._deliver(value, events, dropped)
+        except Exception as e:
+            self.failures += 1
+            print(f"Erro ao enviar status: {e}")
+            return False
+        return True
+
+    def _worker(self):
+        backoff = 0.0
+        retry_at = None
+        while self._running:
+            # Espera mudança de valor, heartbeat ou fim do backoff
+            now = time.monotonic()
+            if retry_at is not None:
+                wait = max(0.0, retry_at - now)
+            elif self._latest is None:
+                # Nada publicado ainda: não há heartbeat a mandar, só o publish() acorda
+                wait = None
+            else:
+                wait = max(0.0, self._last_sent_at + self.heartbeat - now)
+            self._wakeup.wait(wait)
+            self._wakeup.clear()
+            if not self._running:
+                break
+            if retry_at is not None and time.monotonic() < retry_at:
+                # Valores novos durante o backoff só são guardados, não antecipam a tentativa
+                continue
+
+            value, events, dropped, changed = self._pending()
+            heartbeat_due = time.monotonic() - self._last_sent_at >= self.heartbeat
+            if value is None or not (changed or events or heartbeat_due or retry_at is not None):
+                continue
+
+            try:
+                self._deliver(value, events, dropped)
+            except Exception as e:
+                self.failures += 1
+                backoff = min(self.max_backoff, max(self.min_backoff, backoff * 2))
+                retry_at = time.monotonic() + backoff
+                print(f"Erro ao enviar status (nova tentativa em {backoff:.1f}s): {e}")
+                continue
+
+            backoff = 0.0
+            retry_at = None
+
+    def stats(self):
+        return {
+            "published": self.published,
+            "sent": self.sent,
+            "failures": self.failures,
+            "coalesced": self.coalesced,
+            "events_sent": self.events_sent,
+            "events_pending": len(self._events),
+            "events_dropped": self.events_dropped,
+            "last_sent": self._sent,
+        }
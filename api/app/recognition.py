@@ -0,0 +1,376 @@
+import json
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from .face_align import align_face
+from .tracking import IoUTracker
+
+# LBPH: quanto menor a "confiança", mais parecido
+CONFIDENCE_THRESHOLD = 80
+# Miniatura do rosto guardada com o reconhecimento em cache (lado, em pixels)
+FACE_SIGNATURE_SIZE = 16
+# Diferença média entre miniaturas acima da qual o rosto da trilha não é mais o mesmo
+FACE_CHANGE_THRESHOLD = 0.6
+
+
+def rss_bytes():
+    """ Memória residente do processo (Linux); None onde /proc não existe """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class HotReloadingRecognizer:
+    """
+    LBPH que acompanha o modelo publicado pelo treino e troca de versão sem
+    reiniciar o processo.
+
+    `path` pode ser a pasta de modelos versionados (manifest.json gravado pelo
+    yolo_training/model_store.py) ou um .yml avulso (acompanhado pela data de
+    modificação). A versão nova é lida num objeto novo, fora do caminho de
+    predict, e só então a referência é trocada: quem já estava no meio de um
+    predict termina com o modelo antigo, que é liberado quando ninguém mais o usa.
+    """
+
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        # (recognizer, versão, tamanho do rosto) trocados juntos numa atribuição só
+        self._current = None
+        self._signature = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_reload_ms = None
+        self.last_reload_rss_delta = None
+        self.model_bytes = None
+        self.loaded_at = None
+        self.stale = None
+
+    # ---------------- Leitura do modelo ----------------
+
+    def _manifest_path(self):
+        return os.path.join(self.path, "manifest.json")
+
+    def _read_signature(self):
+        """ O que muda quando há modelo novo: o mtime do manifest ou do .yml avulso """
+        target = self._manifest_path() if os.path.isdir(self.path) else self.path
+        stat = os.stat(target)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _resolve(self, signature):
+        """ (arquivo do modelo, versão, tamanho do rosto, marca "stale"); num .yml avulso a versão é o mtime """
+        if not os.path.isdir(self.path):
+            return self.path, signature[0], None, None
+        with open(self._manifest_path(), encoding="utf-8") as f:
+            manifest = json.load(f)
+        return (os.path.join(self.path, manifest["file"]), manifest["version"], manifest.get("face_size"),
+                manifest.get("stale"))
+
+    def load(self):
+        """ Carrega a versão atual (na inicialização, falha se não houver modelo) """
+        with self._reload_lock:
+            signature = self._read_signature()
+            self._swap(signature)
+            self._signature = signature
+        return self
+
+    def _swap(self, signature):
+        file, version, face_size, stale = self._resolve(signature)
+        rss_before = rss_bytes()
+        start = time.perf_counter()
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer.read(file)
+        elapsed = time.perf_counter() - start
+        rss_after = rss_bytes()
+
+        self._current = (recognizer, version, face_size)
+        # Fotos alteradas/removidas ainda dentro do modelo (enroll.py): falta um treino completo
+        self.stale = stale
+        self.reloads += 1
+        self.last_reload_ms = round(elapsed * 1000, 1)
+        if rss_before is not None and rss_after is not None:
+            self.last_reload_rss_delta = rss_after - rss_before
+        self.model_bytes = os.path.getsize(file)
+        self.loaded_at = time.time()
+        print(f"[FACE] Modelo {os.path.basename(file)} (versão {version}) carregado em {self.last_reload_ms} ms")
+
+    def check(self):
+        """ Troca de modelo se um novo foi publicado; True se trocou """
+        try:
+            signature = self._read_signature()
+            if signature == self._signature:
+                return False
+            with self._reload_lock:
+                if signature == self._signature:
+                    return False
+                # Marcada antes: uma versão que não carrega só é tentada de novo se mudar
+                self._signature = signature
+                self._swap(signature)
+            return True
+        except Exception as e:
+            # Um modelo com problema não derruba o processo: segue com o anterior
+            self.failures += 1
+            self.last_error = str(e)
+            print(f"[FACE] Erro ao recarregar o modelo: {e}")
+            return False
+
+    # ---------------- Acompanhamento ----------------
+
+    def start(self):
+        if self._current is None:
+            self.load()
+        if self.check_interval and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="face-model-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            self.check()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.check_interval + 1)
+            self._thread = None
+
+    # ---------------- Uso ----------------
+
+    @property
+    def version(self):
+        return self._current[1] if self._current else None
+
+    @property
+    def face_size(self):
+        return self._current[2] if self._current else None
+
+    def prepare(self, gray, box, eye_cascade=None):
+        """
+        Recorte do rosto `box` (x, y, w, h) de `gray` do mesmo jeito que o
+        treino: olhos nivelados, equalizado, no tamanho do manifest. Um .yml
+        avulso não informa o tamanho: vai o recorte cru, como antes.
+        """
+        face_size = self.face_size
+        if not face_size:
+            x, y, w, h = box
+            return gray[y:y + h, x:x + w]
+        return align_face(gray, box, face_size, eye_cascade)
+
+    def predict(self, face):
+        """ (label, confiança) de um rosto já preparado por prepare() """
+        recognizer, _, _ = self._current
+        return recognizer.predict(face)
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "version": self.version,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_reload_ms": self.last_reload_ms,
+            "last_reload_rss_delta": self.last_reload_rss_delta,
+            "model_bytes": self.model_bytes,
+            "rss_bytes": rss_bytes(),
+            "loaded_at": self.loaded_at,
+            "stale": self.stale,
+        }
+
+
+def face_thumbnail(gray_crop, relative):
+    """ Miniatura normalizada da região `relative` (x, y, w, h em fração do recorte), ou None """
+    h, w = gray_crop.shape[:2]
+    rx, ry, rw, rh = relative
+    x, y = int(rx * w), int(ry * h)
+    region = gray_crop[y:y + max(1, round(rh * h)), x:x + max(1, round(rw * w))]
+    if region.size == 0:
+        return None
+    thumb = cv2.resize(region, (FACE_SIGNATURE_SIZE, FACE_SIGNATURE_SIZE), interpolation=cv2.INTER_AREA)
+    thumb = thumb.astype(np.float32)
+    # Sem a média e escalada pelo contraste: mudança de luz não vira outro rosto
+    return (thumb - thumb.mean()) / (thumb.std() + 4.0)
+
+
+def face_signature(gray_crop, box):
+    """ (posição do rosto relativa à caixa da pessoa, miniatura) para conferir o cache depois """
+    h, w = gray_crop.shape[:2]
+    fx, fy, fw, fh = box
+    relative = (fx / w, fy / h, fw / w, fh / h)
+    return relative, face_thumbnail(gray_crop, relative)
+
+
+def same_face(gray_crop, signature, threshold=FACE_CHANGE_THRESHOLD):
+    """ True se o que está hoje no lugar do rosto guardado ainda parece o mesmo rosto """
+    relative, reference = signature
+    thumb = face_thumbnail(gray_crop, relative)
+    if thumb is None or reference is None:
+        return False
+    return float(np.abs(thumb - reference).mean()) <= threshold
+
+
+class FaceRecognitionCache:
+    """
+    Guarda, por trilha de pessoa, o último reconhecimento confiável junto com
+    a assinatura do rosto reconhecido. Enquanto a trilha existir, o TTL não
+    vencer e o rosto no mesmo lugar da caixa continuar parecido, o rosto não é
+    detectado nem reconhecido de novo.
+    """
+
+    def __init__(self, ttl=10.0, confidence_threshold=CONFIDENCE_THRESHOLD):
+        self.ttl = ttl
+        self.confidence_threshold = confidence_threshold
+        self._entries = {}  # track_id -> (label, confidence, expira_em, assinatura do rosto)
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.changed = 0
+
+    def get(self, track_id, now=None, still_valid=None):
+        """
+        (label, confiança) guardados para a trilha, ou None. `still_valid`
+        recebe a assinatura do rosto; se devolver False a entrada é descartada
+        (a trilha trocou de pessoa ou o rosto mudou).
+        """
+        now = time.monotonic() if now is None else now
+        entry = self._entries.get(track_id)
+        if entry is not None and entry[2] < now:
+            del self._entries[track_id]
+            self.expired += 1
+            entry = None
+        if entry is not None and entry[3] is not None and still_valid is not None and not still_valid(entry[3]):
+            del self._entries[track_id]
+            self.changed += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0], entry[1]
+
+    def put(self, track_id, label, confidence, now=None, signature=None):
+        # Só reconhecimentos bons entram no cache
+        if confidence >= self.confidence_threshold:
+            return
+        now = time.monotonic() if now is None else now
+        self._entries[track_id] = (label, confidence, now + self.ttl, signature)
+
+    def retain(self, track_ids):
+        """ Esquece trilhas que sumiram (a pessoa saiu ou a trilha mudou) """
+        alive = set(track_ids)
+        for track_id in [tid for tid in self._entries if tid not in alive]:
+            del self._entries[track_id]
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "changed": self.changed,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+class FaceMatcher:
+    """
+    Reconhece rostos dentro das caixas de pessoa do YOLO, usando o cache por
+    trilha para pular o Haar cascade e o LBPH quando a pessoa já foi reconhecida.
+
+    A trilha segue a caixa da pessoa, não o rosto: duas pessoas que se cruzam
+    podem trocar de trilha. Por isso um acerto do cache só vale se a região
+    onde o rosto estava ainda tiver o mesmo rosto (miniatura 16x16 comparada,
+    bem mais barata que o Haar e o LBPH); senão o rosto é reconhecido de novo.
+    """
+
+    def __init__(self, recognizer, face_cascade, confidence_threshold=CONFIDENCE_THRESHOLD,
+                 cache_ttl=10.0, tracker=None, eye_cascade=None, face_change_threshold=FACE_CHANGE_THRESHOLD):
+        self.recognizer = recognizer
+        self.face_cascade = face_cascade
+        # Para nivelar os olhos como no treino (sem ele o rosto só é redimensionado)
+        self.eye_cascade = eye_cascade
+        self.confidence_threshold = confidence_threshold
+        self.face_change_threshold = face_change_threshold
+        self.tracker = tracker or IoUTracker()
+        self.cache = FaceRecognitionCache(ttl=cache_ttl, confidence_threshold=confidence_threshold)
+        self._model_version = getattr(recognizer, "version", None)
+        # O tracker e o cache têm estado; chamadas concorrentes passam uma de cada vez
+        self._lock = threading.Lock()
+
+    def _recognize_crop(self, gray_crop):
+        """ Retorna (label, confiança, caixa do rosto) do melhor rosto no recorte, ou None """
+        faces = self.face_cascade.detectMultiScale(gray_crop, 1.1, 5)
+
+        prepare = getattr(self.recognizer, "prepare", None)
+        best = None
+        for (fx, fy, fw, fh) in faces:
+            if prepare is not None:
+                face_roi = prepare(gray_crop, (fx, fy, fw, fh), self.eye_cascade)
+            else:
+                face_roi = gray_crop[fy:fy+fh, fx:fx+fw]
+            label, confidence = self.recognizer.predict(face_roi)
+            if best is None or confidence < best[1]:
+                best = (label, confidence, (fx, fy, fw, fh))
+        return best
+
+    def identify(self, frame, people_boxes, now=None, fresh=False):
+        """
+        Para cada caixa (x1, y1, x2, y2) devolve (track_id, label, confiança);
+        label e confiança são None quando nenhum rosto foi encontrado.
+        Com `fresh` o cache não é consultado: cada caixa é reconhecida neste
+        frame (a votação do AccessDecisionEngine precisa de votos independentes).
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            # Modelo novo: reconhecimentos guardados com o anterior não valem mais
+            version = getattr(self.recognizer, "version", None)
+            if version != self._model_version:
+                self.cache.clear()
+                self._model_version = version
+            track_ids = self.tracker.update(people_boxes, now)
+            self.cache.retain(track_ids)
+
+            identities = []
+            for (x1, y1, x2, y2), track_id in zip(people_boxes, track_ids):
+                person_crop = frame[max(y1, 0):y2, max(x1, 0):x2]
+                if person_crop.size == 0:
+                    identities.append((track_id, None, None))
+                    continue
+                gray_crop = cv2.cvtColor(person_crop, cv2.COLOR_BGR2GRAY)
+                cached = None
+                if not fresh:
+                    cached = self.cache.get(
+                        track_id, now, lambda signature: same_face(gray_crop, signature, self.face_change_threshold)
+                    )
+                if cached is None:
+                    found = self._recognize_crop(gray_crop)
+                    if found is not None:
+                        cached = found[:2]
+                        self.cache.put(track_id, found[0], found[1], now, face_signature(gray_crop, found[2]))
+                label, confidence = cached if cached is not None else (None, None)
+                identities.append((track_id, label, confidence))
+            return identities
+
+    def match(self, frame, people_boxes, face_id, now=None):
+        """ True se alguma pessoa no frame for reconhecida como `face_id` """
+        for _, label, confidence in self.identify(frame, people_boxes, now):
+            if label == face_id and confidence < self.confidence_threshold:
+                return True
+        return False
+
+    def stats(self):
+        return self.cache.stats()
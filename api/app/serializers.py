@@ -1,4 +1,15 @@
-from rest_framework import serializers
+import json
+import math
+import threading
+from datetime import datetime, timezone as dt_timezone
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.conf import settings
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from .env_cache import environment_state, state_to_environment
 from .models import User, Environment, Log
 
 class UserSerializer(serializers.ModelSerializer):
@@ -7,6 +18,9 @@ class UserSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 class EnvironmentSerializer(serializers.ModelSerializer):
+    # Vem da tabela Occupant (ver Environment.detected_people)
+    detected_people = serializers.ListField(child=serializers.CharField(), read_only=True)
+
     class Meta:
         model = Environment
         fields = '__all__'
@@ -15,3 +29,277 @@ class LogSerializer(serializers.ModelSerializer):
     class Meta:
         model = Log
         fields = '__all__'
+
+
+def iso_datetime(value, tz):
+    """ Igual ao DateTimeField.to_representation do DRF no formato ISO 8601 padrão """
+    if isinstance(value, str):
+        return value
+    if tz is not None:
+        value = value.astimezone(tz) if timezone.is_aware(value) else timezone.make_aware(value, tz)
+    value = value.isoformat()
+    return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+
+class FastReadSerializer:
+    """
+    Caminho rápido, só de leitura, para um ModelSerializer. Os campos e os
+    conversores são tirados do serializer DRF uma vez só; depois cada objeto é
+    um loop de getattr, com a mesma saída do DRF.
+    """
+
+    # Campos cujo valor Python não vai direto para o JSON
+    CONVERTED = (serializers.DateTimeField, serializers.DateField, serializers.TimeField,
+                 serializers.DecimalField, serializers.UUIDField)
+
+    def __init__(self, serializer_class):
+        self.fields = [
+            (name, field.source, self.converter(field))
+            for name, field in serializer_class().fields.items()
+        ]
+
+    def converter(self, field):
+        if isinstance(field, serializers.DateTimeField) and not isinstance(field, serializers.DateField) \
+                and getattr(field, "format", api_settings.DATETIME_FORMAT) == ISO_8601 \
+                and not hasattr(field, "timezone"):
+            return iso_datetime
+        if isinstance(field, self.CONVERTED):
+            return lambda value, tz: field.to_representation(value)
+        return None
+
+    def to_dict(self, instance, tz=False):
+        # O fuso atual é resolvido uma vez por chamada, não por campo
+        if tz is False:
+            tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        data = {}
+        for name, source, convert in self.fields:
+            value = getattr(instance, source)
+            data[name] = convert(value, tz) if convert is not None and value is not None else value
+        return data
+
+    def to_list(self, instances):
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        return [self.to_dict(instance, tz) for instance in instances]
+
+
+def render_json(data):
+    """ Mesmos bytes do JSONRenderer do DRF (compacto, UTF-8) """
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+environment_fast = FastReadSerializer(EnvironmentSerializer)
+log_fast = FastReadSerializer(LogSerializer)
+
+
+class VersionedJSONCache:
+    """
+    Guarda os bytes JSON do estado do Environment para o version atual (ver
+    env_cache.py). Enquanto o version não muda, a resposta não é serializada
+    de novo; o version também serve de ETag.
+    """
+
+    def __init__(self, state_cache):
+        self.state_cache = state_cache
+        self._lock = threading.Lock()
+        self._version = None
+        self._body = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self):
+        """ (etag, bytes) do estado atual """
+        version = self.state_cache.current_version()
+        with self._lock:
+            if version == self._version:
+                self.hits += 1
+                return self.etag(version), self._body
+
+        version, state = self.state_cache.get_versioned()
+        body = render_json(environment_fast.to_dict(state_to_environment(state)))
+        with self._lock:
+            self._version, self._body = version, body
+            self.misses += 1
+        return self.etag(version), body
+
+    @staticmethod
+    def etag(version):
+        return f'"{version}"'
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "version": self._version}
+
+
+environment_json = VersionedJSONCache(environment_state)
+
+
+def parse_timestamp(value):
+    """ Datetime com fuso de um texto ISO 8601, ou None se inválido (inclusive datas impossíveis) """
+    try:
+        parsed = parse_datetime(str(value))
+    except (TypeError, ValueError):
+        return None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_number(value):
+    """ Float finito de um número ou texto numérico; ValueError caso contrário (NaN e infinito também) """
+    if isinstance(value, bool):
+        raise ValueError(value)
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(value)
+    return number
+
+
+TRUE_VALUES = {"true", "1"}
+FALSE_VALUES = {"false", "0"}
+
+
+def parse_flag(value):
+    """ Booleano de true/false, 1/0 ou do texto deles ("false" é False); ValueError caso contrário """
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower() if isinstance(value, (str, int)) else None
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(value)
+
+
+def validate_detection_batch(payload, max_readings=1000):
+    """
+    Validação leve do lote de leituras (sem um Serializer DRF por item).
+    Aceita uma lista ou {"readings": [...]}; cada leitura:
+      {"timestamp": ISO (opcional), "camera": str (opcional),
+       "people_count": int >= 0, "temperatura": float, "umidade": float}
+    Retorna (leituras normalizadas, erros por índice).
+    """
+    readings = payload.get("readings") if isinstance(payload, dict) else payload
+    if not isinstance(readings, list):
+        return [], {"non_field_errors": ["Envie uma lista de leituras ou {\"readings\": [...]}"]}
+    if not readings:
+        return [], {"non_field_errors": ["Lote vazio"]}
+    if len(readings) > max_readings:
+        return [], {"non_field_errors": [f"No máximo {max_readings} leituras por lote"]}
+
+    now = timezone.now()
+    valid, errors = [], {}
+    for i, item in enumerate(readings):
+        if not isinstance(item, dict):
+            errors[i] = ["Leitura deve ser um objeto"]
+            continue
+        item_errors = []
+
+        timestamp = item.get("timestamp")
+        if timestamp is None:
+            timestamp = now
+        else:
+            timestamp = parse_timestamp(timestamp)
+            if timestamp is None:
+                item_errors.append("timestamp inválido")
+
+        people_count = item.get("people_count")
+        if people_count is not None and (isinstance(people_count, bool) or not isinstance(people_count, int) or people_count < 0):
+            item_errors.append("people_count deve ser inteiro >= 0")
+
+        numbers = {}
+        for field in ("temperatura", "umidade"):
+            value = item.get(field)
+            if value is None:
+                numbers[field] = None
+                continue
+            try:
+                numbers[field] = parse_number(value)
+            except (TypeError, ValueError):
+                item_errors.append(f"{field} deve ser um número finito")
+
+        if people_count is None and numbers.get("temperatura") is None and numbers.get("umidade") is None:
+            item_errors.append("leitura sem people_count, temperatura ou umidade")
+
+        if item_errors:
+            errors[i] = item_errors
+            continue
+        valid.append({
+            "timestamp": timestamp,
+            "camera": str(item.get("camera", ""))[:50],
+            "people_count": people_count,
+            "temperature": numbers["temperatura"],
+            "humidity": numbers["umidade"],
+        })
+    return valid, errors
+
+
+OCCUPANCY_EVENT_TYPES = ("entry", "exit")
+
+
+def validate_occupancy_events(payload, max_events=500):
+    """
+    Validação do POST do contador de ocupação:
+      {"people_count": int >= 0, "has_presence": bool (opcional),
+       "events": [{"type": "entry"|"exit", "zone": str, "track_id": int,
+                   "camera": str (opcional), "at": epoch ou ISO (opcional)}]}
+    Retorna (dados normalizados, erros).
+    """
+    if not isinstance(payload, dict):
+        return None, {"non_field_errors": ["Envie um objeto JSON"]}
+    errors = {}
+
+    people_count = payload.get("people_count")
+    if isinstance(people_count, bool) or not isinstance(people_count, int) or people_count < 0:
+        errors["people_count"] = ["people_count deve ser inteiro >= 0"]
+    has_presence = payload.get("has_presence")
+    if has_presence is not None and not isinstance(has_presence, bool):
+        errors["has_presence"] = ["has_presence deve ser booleano"]
+
+    events = payload.get("events", [])
+    if not isinstance(events, list):
+        errors["events"] = ["events deve ser uma lista"]
+        events = []
+    elif len(events) > max_events:
+        errors["events"] = [f"No máximo {max_events} eventos por requisição"]
+        events = []
+
+    now = timezone.now()
+    valid = []
+    for i, item in enumerate(events):
+        if not isinstance(item, dict):
+            errors[f"events[{i}]"] = ["Evento deve ser um objeto"]
+            continue
+        item_errors = []
+        if item.get("type") not in OCCUPANCY_EVENT_TYPES:
+            item_errors.append(f"type deve ser um de: {', '.join(OCCUPANCY_EVENT_TYPES)}")
+        track_id = item.get("track_id")
+        if isinstance(track_id, bool) or not isinstance(track_id, int):
+            item_errors.append("track_id deve ser inteiro")
+
+        at = item.get("at")
+        if at is None:
+            at = now
+        elif isinstance(at, (int, float)) and not isinstance(at, bool):
+            # Epoch fora do intervalo da plataforma (1e20, NaN) também é inválido
+            try:
+                at = datetime.fromtimestamp(at, tz=dt_timezone.utc)
+            except (ValueError, OverflowError, OSError):
+                item_errors.append("at inválido")
+        else:
+            at = parse_timestamp(at)
+            if at is None:
+                item_errors.append("at inválido")
+
+        if item_errors:
+            errors[f"events[{i}]"] = item_errors
+            continue
+        valid.append({
+            "type": item["type"],
+            "zone": str(item.get("zone", ""))[:50],
+            "track_id": track_id,
+            "camera": str(item.get("camera", ""))[:50],
+            "at": at,
+        })
+
+    if errors:
+        return None, errors
+    return {"people_count": people_count, "has_presence": has_presence, "events": valid}, {}
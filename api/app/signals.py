@@ -0,0 +1,31 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .allowlist import allowlist
+from .env_cache import environment_state
+from .models import Environment, User, users_bulk_changed
+
+
+@receiver(post_save, sender=Environment)
+def refresh_environment_state(sender, update_fields=None, **kwargs):
+    """ save() direto no model (admin, scripts) precisa refletir em todos os workers """
+    environment_state.invalidate(fields=update_fields)
+
+
+@receiver(post_delete, sender=Environment)
+def drop_environment_state(sender, **kwargs):
+    environment_state.invalidate(deleted=True)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(users_bulk_changed, sender=User)
+def invalidate_allowlist(sender, **kwargs):
+    """
+    Cadastro/alteração de usuário vale no próximo toque de cartão, em todos os
+    processos. Só depois do commit: invalidando antes, outro processo podia
+    recarregar as linhas antigas já com a versão nova e servi-las até o
+    ALLOWLIST_MAX_AGE. Fora de transação o on_commit roda na hora.
+    """
+    transaction.on_commit(allowlist.invalidate)
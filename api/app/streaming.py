@@ -0,0 +1,140 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.utils.encoders import JSONEncoder
+
+from .env_cache import VERSION_KEY, environment_state, state_to_environment
+from .serializers import environment_fast
+
+# Status do Environment em tempo real por Server-Sent Events (ASGI).
+#
+# Um único loop por processo acompanha a chave de version do env_cache (uma
+# leitura pequena do cache a cada `poll_interval`, não importa quantos clientes
+# estejam conectados). Quando o estado muda, ele é serializado uma vez, a
+# diferença em relação ao anterior vira um evento "delta" já codificado e o
+# mesmo bytes vai para a fila de cada cliente.
+#
+# Cada cliente tem uma fila limitada. Se um cliente lento encher a fila, os
+# deltas pendentes são descartados e ele recebe um "snapshot" completo no
+# lugar: a memória fica limitada e o cliente nunca fica com um estado errado.
+
+
+class Subscriber:
+    def __init__(self, queue_size):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.resyncs = 0
+
+    def offer(self, chunk, snapshot):
+        try:
+            self.queue.put_nowait(chunk)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(snapshot)
+            self.resyncs += 1
+
+
+class StatusBroadcaster:
+    def __init__(self, poll_interval=0.05, queue_size=32, heartbeat=15.0):
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+
+        self._subscribers = set()
+        self._task = None
+        self._loop = None
+        self._version = None
+        self._data = None
+        self._snapshot = None
+        self._seq = 0
+
+        self.events = 0
+        self.resyncs = 0
+
+    def encode(self, event, data):
+        payload = json.dumps(data, cls=JSONEncoder, separators=(",", ":"))
+        return f"id: {self._seq}\nevent: {event}\ndata: {payload}\n\n".encode()
+
+    def _read(self):
+        """ (version, estado serializado) se o version mudou; senão None """
+        version = cache.get(VERSION_KEY)
+        if version is not None and version == self._version:
+            return None
+        version, state = environment_state.get_versioned()
+        return version, environment_fast.to_dict(state_to_environment(state))
+
+    async def refresh(self):
+        changed = await sync_to_async(self._read)()
+        if changed is None:
+            return
+        version, data = changed
+        previous = self._data
+        delta = {k: v for k, v in data.items() if previous is None or previous.get(k) != v}
+        self._version, self._data = version, data
+        if previous is not None and not delta:
+            return
+
+        self._seq += 1
+        self._snapshot = self.encode("snapshot", data)
+        if previous is None:
+            return
+        chunk = self.encode("delta", delta)
+        self.events += 1
+        for subscriber in list(self._subscribers):
+            subscriber.offer(chunk, self._snapshot)
+
+    async def _run(self):
+        while self._subscribers:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Erro ao acompanhar o status do Environment: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def _ensure_task(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._task = loop.create_task(self._run())
+
+    async def subscribe(self):
+        subscriber = Subscriber(self.queue_size)
+        if self._snapshot is None or self._loop is not asyncio.get_running_loop():
+            await self.refresh()
+        self._subscribers.add(subscriber)
+        self._ensure_task()
+        subscriber.offer(self._snapshot, self._snapshot)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self._subscribers.discard(subscriber)
+        self.resyncs += subscriber.resyncs
+
+    async def stream(self, subscriber):
+        """ Bytes do text/event-stream de um cliente; comentário de keep-alive quando ocioso """
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscriber.queue.get(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        return {
+            "subscribers": len(self._subscribers),
+            "events": self.events,
+            "resyncs": self.resyncs + sum(s.resyncs for s in self._subscribers),
+            "seq": self._seq,
+        }
+
+
+broadcaster = StatusBroadcaster(
+    poll_interval=settings.STATUS_STREAM_POLL_INTERVAL,
+    queue_size=settings.STATUS_STREAM_QUEUE_SIZE,
+    heartbeat=settings.STATUS_STREAM_HEARTBEAT,
+)
@@ -1,46 +1,38 @@
 # SeuApp/tasks.py
 from celery import shared_task
-import cv2
-from ultralytics import YOLO
-import requests
 import time
-from .models import Environment, Log # Importe seus models
+from . import event_log
+from .allowlist import allowlist
+from .models import Log # Importe seus models
+from .env_cache import environment_state
+from .esp32 import esp32
+from .esp32_poller import ESP32Poller
+from .vision_worker import VisionClient, VisionWorkerUnavailable
 from django.conf import settings
 
-# ================= Configurações & Inicialização (Global da Task) =================
-# O worker do Celery manterá este estado carregado e pronto!
-
-# Importe suas configurações (IPs, RFIDs, etc.) ou defina-as aqui
-ESP32_IP = "http://192.168.4.1"
-AUTHORIZED_NAME = "Israel"
-AUTHORIZED_RFID = "6C3ACB33"
-CONFIDENCE_THRESHOLD = 80
-ISRAEL_FACE_ID = 1
-
-# Inicialização dos Modelos de Visão Computacional
-try:
-    yolo_model = YOLO("yolov8n.pt")
-    recognizer = cv2.face.LBPHFaceRecognizer_create()
-    recognizer.read("trainer.yml") 
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
-    cap = cv2.VideoCapture(0)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-    if not cap.isOpened():
-        raise Exception("Câmera não abriu.")
-except Exception as e:
-    # A task falhará se os modelos não puderem ser carregados.
-    print(f"Erro no Celery Worker ao carregar modelos CV: {e}")
-    yolo_model, recognizer, face_cascade, cap = None, None, None, None
+# ================= Configurações =================
+# Câmera e modelos ficam no worker de visão (python manage.py run_vision_worker);
+# a task só pede a verificação por socket local.
+
+# Quem pode entrar: User.is_authorized + User.face_label (ver allowlist.py);
+# o endereço do ESP32 está em settings.ESP32_URL
+
+vision = VisionClient(settings.VISION_WORKER_ADDRESS)
+# O beat chama a task a cada ESP32_RFID_POLL_INTERVAL; /status só quando vencer o intervalo dele
+poller = ESP32Poller(rfid_interval=0, status_interval=settings.ESP32_STATUS_POLL_INTERVAL)
 
 
 # ================= Helpers (Copiados das Views) =================
+def elapsed_ms(start):
+    return round((time.monotonic() - start) * 1000, 1)
+
+
 def send_rfid_result(result, nome=""):
     try:
         msg = f"{result}_{nome}" if nome else result
-        requests.post(f"{ESP32_IP}/rfid_result", params={"resultado": msg}, timeout=1)
+        esp32.send_rfid_result(msg)
     except Exception as e:
-        Log.objects.create(event=f"Celery Error sending RFID result: {e}")
+        event_log.record(f"Celery Error sending RFID result: {e}", Log.DEVICE, outcome=Log.ERROR)
 
 
 @shared_task
@@ -49,61 +41,73 @@ def check_access_task(rfid_code):
     Executa a lógica de Visão Computacional para confirmar acesso.
     Esta função roda no Celery Worker, fora do processo da API do Django.
     """
-    
-    user = User.objects.filter(rfid=rfid_code).first()
-    env = Environment.objects.first() or Environment.objects.create()
-
-    if not user or user.name != AUTHORIZED_NAME or rfid_code != AUTHORIZED_RFID:
+    start = time.monotonic()
+    # Lookup em memória: RFID -> usuário autorizado e o label do rosto dele
+    user = allowlist.lookup(rfid_code)
+    if user is None or user["face_label"] is None:
         send_rfid_result("negado", "Desconhecido")
-        env.light_green = False
-        env.light_red = True
-        env.save()
-        Log.objects.create(event=f"Celery: Acesso NEGADO (RFID/Usuário inválido): {rfid_code}")
+        environment_state.update(light_green=False, light_red=True)
+        event_log.record(f"Celery: Acesso NEGADO (RFID/Usuário inválido): {rfid_code}", Log.ACCESS,
+                         rfid=rfid_code, outcome=Log.DENIED, latency_ms=elapsed_ms(start))
+        return False
+
+    try:
+        # Vários frames votam; para assim que a decisão estiver clara
+        decision = vision.verify_face(user["face_label"])
+        rosto_confirmado = decision["granted"]
+    except VisionWorkerUnavailable as e:
+        event_log.record(f"Celery: Worker de visão indisponível: {e}", Log.VISION,
+                         rfid=rfid_code, outcome=Log.ERROR, latency_ms=elapsed_ms(start))
+        send_rfid_result("negado", "Erro Cam")
         return False
 
-    israel_presente = False
-    
-    if cap and yolo_model and recognizer and face_cascade:
-        ret, frame = cap.read()
-        if not ret:
-            Log.objects.create(event="Celery: Erro ao ler frame da câmera.")
-            send_rfid_result("negado", "Erro Cam")
-            return False
-
-        results = yolo_model(frame, verbose=False)
-        for result in results:
-            for box in result.boxes:
-                cls = int(box.cls[0])
-                conf = float(box.conf[0])
-                
-                if cls == 0 and conf > 0.5: # Pessoa detectada
-                    x1, y1, x2, y2 = map(int, box.xyxy[0].cpu().numpy())
-                    person_crop = frame[y1:y2, x1:x2]
-
-                    gray_crop = cv2.cvtColor(person_crop, cv2.COLOR_BGR2GRAY)
-                    faces = face_cascade.detectMultiScale(gray_crop, 1.1, 5)
-                    
-                    for (fx, fy, fw, fh) in faces:
-                        face_roi = gray_crop[fy:fy+fh, fx:fx+fw]
-                        label, confidence = recognizer.predict(face_roi)
-                        
-                        if confidence < CONFIDENCE_THRESHOLD and label == ISRAEL_FACE_ID: 
-                            israel_presente = True
-                            break
-            if israel_presente:
-                break
-  
-    if israel_presente:
-        send_rfid_result("permitido", AUTHORIZED_NAME)
-        env.light_green = True
-        env.light_red = False
-        env.save()
-        Log.objects.create(event=f"Celery: Acesso PERMITIDO: {AUTHORIZED_NAME} (RFID e Rosto confirmados)")
+    nome = user["name"]
+    if rosto_confirmado:
+        send_rfid_result("permitido", nome)
+        environment_state.update(light_green=True, light_red=False)
+        event_log.record(f"Celery: Acesso PERMITIDO: {nome} (RFID e Rosto confirmados em {decision['frames']} frames, {decision['elapsed_ms']} ms)",
+                         Log.ACCESS, rfid=rfid_code, outcome=Log.GRANTED, latency_ms=elapsed_ms(start))
         return True
     else:
-        send_rfid_result("negado", AUTHORIZED_NAME)
-        env.light_green = False
-        env.light_red = True
-        env.save()
-        Log.objects.create(event=f"Celery: Acesso NEGADO: RFID OK, mas rosto de {AUTHORIZED_NAME} não confirmado.")
-        return False
\ No newline at end of file
+        send_rfid_result("negado", nome)
+        environment_state.update(light_green=False, light_red=True)
+        event_log.record(f"Celery: Acesso NEGADO: RFID OK, mas rosto de {nome} não confirmado ({decision['reason']}, {decision['frames']} frames, {decision['elapsed_ms']} ms).",
+                         Log.ACCESS, rfid=rfid_code, outcome=Log.DENIED, latency_ms=elapsed_ms(start))
+        return False
+
+
+@shared_task
+def allowlist_stats_task():
+    """ Tamanho e recargas da lista de RFIDs autorizados deste worker """
+    return allowlist.stats()
+
+
+@shared_task
+def face_cache_stats_task():
+    """ Métricas de acerto/erro do cache de reconhecimento facial do worker de visão """
+    try:
+        return vision.stats()["face_cache"]
+    except VisionWorkerUnavailable:
+        return {}
+
+
+@shared_task
+def access_decision_stats_task():
+    """ Distribuição de frames e tempo até a decisão de acesso """
+    try:
+        return vision.stats()["decisions"]
+    except VisionWorkerUnavailable:
+        return {}
+
+
+@shared_task(ignore_result=True)
+def poll_esp32_task():
+    """ Uma rodada do poller do ESP32; grava no Environment só o que mudou """
+    return poller.poll_once()
+
+
+@shared_task(ignore_result=True)
+def compact_logs_task():
+    """ Arquiva (gzip JSONL) e apaga as linhas do Log mais antigas que LOG_RETENTION_DAYS """
+    rows, path = event_log.archive_older_than(settings.LOG_RETENTION_DAYS, settings.LOG_ARCHIVE_DIR)
+    return {"archived": rows, "path": path}
@@ -0,0 +1,173 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+from .buffers import BufferedWriter
+from .models import TelemetryRollup, TelemetrySample
+
+# Histórico de ocupação/temperatura/umidade.
+#
+# record() só enfileira a amostra; o BufferedWriter grava em lote
+# (bulk_create) e, na mesma transação, soma o lote nos agregados por minuto e
+# por hora. Consultas de intervalo leem o agregado adequado à janela, sem
+# varrer as amostras brutas.
+
+METRICS = {
+    # prefixo no rollup -> campo na amostra
+    "occupancy": "people_count",
+    "temperature": "temperature",
+    "humidity": "humidity",
+}
+
+BUCKETS = {
+    TelemetryRollup.MINUTE: lambda ts: ts.replace(second=0, microsecond=0),
+    TelemetryRollup.HOUR: lambda ts: ts.replace(minute=0, second=0, microsecond=0),
+}
+
+# Janela máxima atendida por cada resolução no modo automático
+RAW_MAX_WINDOW = timedelta(minutes=15)
+MINUTE_MAX_WINDOW = timedelta(days=1)
+RAW_MAX_ROWS = 5000
+
+
+def aggregate_batch(samples):
+    """ Soma o lote em memória: {(resolução, bucket): agregados} """
+    buckets = {}
+    for sample in samples:
+        for resolution, truncate in BUCKETS.items():
+            agg = buckets.setdefault((resolution, truncate(sample.timestamp)), {"samples": 0})
+            agg["samples"] += 1
+            for prefix, field in METRICS.items():
+                value = getattr(sample, field)
+                if value is None:
+                    continue
+                value = float(value)
+                agg[f"{prefix}_count"] = agg.get(f"{prefix}_count", 0) + 1
+                agg[f"{prefix}_sum"] = agg.get(f"{prefix}_sum", 0.0) + value
+                agg[f"{prefix}_min"] = min(agg.get(f"{prefix}_min", value), value)
+                agg[f"{prefix}_max"] = max(agg.get(f"{prefix}_max", value), value)
+    return buckets
+
+
+def increment_expressions(agg):
+    """ UPDATE incremental: soma contadores e combina min/max com o que já está no banco """
+    updates = {"samples": F("samples") + agg["samples"]}
+    for prefix in METRICS:
+        if f"{prefix}_count" not in agg:
+            continue
+        low, high = agg[f"{prefix}_min"], agg[f"{prefix}_max"]
+        updates[f"{prefix}_count"] = F(f"{prefix}_count") + agg[f"{prefix}_count"]
+        updates[f"{prefix}_sum"] = F(f"{prefix}_sum") + agg[f"{prefix}_sum"]
+        updates[f"{prefix}_min"] = Least(Coalesce(F(f"{prefix}_min"), Value(low)), Value(low))
+        updates[f"{prefix}_max"] = Greatest(Coalesce(F(f"{prefix}_max"), Value(high)), Value(high))
+    return updates
+
+
+def update_rollups(samples):
+    for (resolution, bucket), agg in aggregate_batch(samples).items():
+        rollup = TelemetryRollup.objects.filter(resolution=resolution, bucket=bucket)
+        if rollup.update(**increment_expressions(agg)):
+            continue
+        try:
+            with transaction.atomic():
+                TelemetryRollup.objects.create(resolution=resolution, bucket=bucket, **agg)
+        except IntegrityError:
+            # Outro processo criou o bucket entre o UPDATE e o INSERT
+            rollup.update(**increment_expressions(agg))
+
+
+def write_samples(samples):
+    with transaction.atomic():
+        TelemetrySample.objects.bulk_create(samples)
+        update_rollups(samples)
+
+
+def rebuild_rollups(start, end):
+    """
+    Refaz os agregados das horas entre `start` e `end` a partir das amostras
+    brutas (ex.: depois de apagar amostras, que já tinham sido somadas).
+    """
+    start = BUCKETS[TelemetryRollup.HOUR](start)
+    end = BUCKETS[TelemetryRollup.HOUR](end) + timedelta(hours=1)
+    with transaction.atomic():
+        TelemetryRollup.objects.filter(bucket__gte=start, bucket__lt=end).delete()
+        update_rollups(TelemetrySample.objects.filter(timestamp__gte=start, timestamp__lt=end).iterator())
+
+
+writer = BufferedWriter(
+    write_samples,
+    max_batch=settings.TELEMETRY_BATCH_SIZE,
+    interval=settings.TELEMETRY_FLUSH_INTERVAL,
+    name="telemetry-writer",
+)
+
+
+def record(people_count=None, temperature=None, humidity=None, source="", timestamp=None):
+    """ Enfileira uma amostra; não bloqueia no banco """
+    if people_count is None and temperature is None and humidity is None:
+        return
+    writer.append(TelemetrySample(
+        timestamp=timestamp or timezone.now(),
+        source=source,
+        people_count=people_count,
+        temperature=temperature,
+        humidity=humidity,
+    ))
+
+
+def choose_resolution(start, end):
+    window = end - start
+    if window <= RAW_MAX_WINDOW:
+        return "raw"
+    if window <= MINUTE_MAX_WINDOW:
+        return TelemetryRollup.MINUTE
+    return TelemetryRollup.HOUR
+
+
+def metric_point(count, total, low, high):
+    if not count:
+        return None
+    return {"min": low, "max": high, "avg": round(total / count, 3)}
+
+
+def query(start, end, resolution="auto"):
+    """ Série entre start e end na resolução pedida (ou a adequada à janela) """
+    if resolution == "auto":
+        resolution = choose_resolution(start, end)
+
+    if resolution == "raw":
+        rows = (TelemetrySample.objects
+                .filter(timestamp__gte=start, timestamp__lt=end)
+                .order_by("timestamp")
+                .values_list("timestamp", *METRICS.values())[:RAW_MAX_ROWS])
+        points = [
+            {
+                "time": ts,
+                "samples": 1,
+                **{prefix: metric_point(1, value, value, value) if value is not None else None
+                   for prefix, value in zip(METRICS, values)},
+            }
+            for ts, *values in rows
+        ]
+        return resolution, points
+
+    # O primeiro bucket pode começar antes de `start`
+    truncate = BUCKETS[resolution]
+    rollups = (TelemetryRollup.objects
+               .filter(resolution=resolution, bucket__gte=truncate(start), bucket__lt=end)
+               .order_by("bucket"))
+    points = [
+        {
+            "time": r.bucket,
+            "samples": r.samples,
+            **{prefix: metric_point(getattr(r, f"{prefix}_count"), getattr(r, f"{prefix}_sum"),
+                                    getattr(r, f"{prefix}_min"), getattr(r, f"{prefix}_max"))
+               for prefix in METRICS},
+        }
+        for r in rollups
+    ]
+    return resolution, points
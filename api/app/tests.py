@@ -1,3 +1,1908 @@
-from django.test import TestCase
+import asyncio
+import base64
+import gzip
+import importlib.util
+import json
+import os
+import queue
+import runpy
+import shutil
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import cv2
+import numpy as np
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.utils import ConnectionHandler
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from . import event_log, telemetry, yolo_processor
+from .access_decision import AccessDecisionEngine
+from .allowlist import AllowlistCache, allowlist
+from .backends import load_detector
+from .capture import FrameGrabber
+from .management.commands import bench_postprocess
+from .management.commands.esp32_stub import StubESP32Server
+from .management.commands.replay_motion import compare_counts
+from .env_cache import CAMERA_COUNTS, LOCK_KEY, EnvironmentStateCache, SharedLock, environment_state, load_environment
+from .esp32 import CircuitBreaker, ESP32Client, ESP32Unavailable
+from .face_align import align_face
+from .inference import InferenceEngine
+from .models import Environment, Log, TelemetryRollup, TelemetrySample, User
+from .motion import MotionGate
+from .postprocess import box_tuples, empty_boxes, extract_boxes
+from .preview import PreviewSink
+from .publisher import PresencePublisher
+from .recognition import FaceMatcher, HotReloadingRecognizer
+from .serializers import (EnvironmentSerializer, FastReadSerializer, LogSerializer, UserSerializer, environment_fast,
+                          log_fast, render_json, validate_occupancy_events)
+from .streaming import StatusBroadcaster, broadcaster
+from .tracking import OccupancyCounter, SortTracker, Zone, combine_camera_counts, parse_camera_areas
+from .views import status_stream
+from .vision_worker import VisionClient, VisionTCPServer, VisionWorker, VisionWorkerUnavailable, make_server
+
+# Rodar da pasta api/:  python manage.py test app
+
+CACHE_DIR = tempfile.mkdtemp(prefix="django_yolo_tests_")
+TEST_CACHES = {"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": CACHE_DIR}}
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def reset_environment_state():
+    """ Cada teste começa sem estado compartilhado nem pendências do singleton """
+    cache.clear()
+    environment_state._state, environment_state._version = None, None
+    environment_state._dirty = {}
+
+
+def tearDownModule():
+    # O que ficou na fila não pode ir para o banco de verdade no atexit,
+    # depois que o banco de teste foi destruído
+    environment_state._dirty = {}
+    for writer in (telemetry.writer, event_log.writer):
+        with writer._lock:
+            writer._items.clear()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class EnvironmentStateCacheTests(TestCase):
+    def setUp(self):
+        reset_environment_state()
+        self.env = load_environment()
+
+    def test_direct_save_keeps_pending_fields_of_other_columns(self):
+        environment_state.update(people_count=5)
+        env = Environment.objects.get(pk=self.env.pk)
+        env.temperature = 30.0
+        env.save(update_fields=["temperature"])
+
+        state = environment_state.get_state()
+        self.assertEqual(state["people_count"], 5)
+        self.assertEqual(state["temperature"], 30.0)
+
+        environment_state.flush()
+        env.refresh_from_db()
+        self.assertEqual((env.people_count, env.temperature), (5, 30.0))
+
+    def test_full_save_wins_over_pending_value(self):
+        environment_state.update(people_count=5)
+        env = Environment.objects.get(pk=self.env.pk)
+        env.people_count = 2
+        env.save()
+
+        self.assertEqual(environment_state.get_state()["people_count"], 2)
+        self.assertFalse(environment_state.flush())
+        env.refresh_from_db()
+        self.assertEqual(env.people_count, 2)
+
+    def test_lost_shared_state_keeps_pending_values(self):
+        environment_state.update(people_count=7)
+        cache.clear()
+        self.assertEqual(environment_state.get_state()["people_count"], 7)
+        environment_state.flush()
+        self.assertEqual(Environment.objects.get(pk=self.env.pk).people_count, 7)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class EnvironmentStateCrossWorkerTests(TransactionTestCase):
+    """ Vários workers = várias instâncias, cada uma com sua cópia local e seu lock """
+
+    def setUp(self):
+        reset_environment_state()
+        self.env = load_environment()
+
+    def test_concurrent_updates_from_several_workers_are_not_lost(self):
+        workers = [EnvironmentStateCache(flush_interval=3600, lock_mode="file") for _ in range(4)]
+        per_worker = 50
+
+        def increment(worker):
+            for _ in range(per_worker):
+                worker.update_with(lambda state: state.update(people_count=state["people_count"] + 1))
+
+        threads = [threading.Thread(target=increment, args=(w,)) for w in workers]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        expected = len(workers) * per_worker
+        for worker in workers:
+            self.assertEqual(worker.get_state()["people_count"], expected)
+            worker.flush()
+        self.assertEqual(Environment.objects.get(pk=self.env.pk).people_count, expected)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SharedLockTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_token_lock_is_exclusive(self):
+        lock = SharedLock(LOCK_KEY, timeout=5, mode="token")
+        other = SharedLock(LOCK_KEY, timeout=0.05, mode="token")
+        with lock.hold():
+            with self.assertRaises(TimeoutError):
+                with other.hold():
+                    pass
+
+    def test_expired_owner_does_not_release_the_new_owner(self):
+        first = SharedLock(LOCK_KEY, timeout=0.05, mode="token")
+        second = SharedLock(LOCK_KEY, timeout=5, mode="token")
+        token_a = first._acquire_token()
+        time.sleep(0.1)
+        token_b = second._acquire_token()
+        first._release_token(token_a)
+        self.assertEqual(cache.get(LOCK_KEY), token_b)
+        self.assertEqual(first.expired, 1)
+        second._release_token(token_b)
+        self.assertIsNone(cache.get(LOCK_KEY))
+
+    def test_lock_is_reentrant_in_the_same_thread(self):
+        lock = SharedLock(LOCK_KEY, timeout=0.05, mode="token")
+        with lock.hold():
+            with lock.hold():
+                pass
+            self.assertIsNotNone(cache.get(LOCK_KEY))
+        self.assertIsNone(cache.get(LOCK_KEY))
+
+
+class FakeCascade:
+    """ Um rosto no canto de todo recorte """
+
+    def detectMultiScale(self, gray, *args):
+        return [(0, 0, 10, 10)]
+
+
+class FakeRecognizer:
+    """ Devolve as predições da lista em ordem e conta as chamadas """
+
+    def __init__(self, predictions):
+        self.predictions = list(predictions)
+        self.calls = 0
+
+    def predict(self, face_roi):
+        self.calls += 1
+        return self.predictions[min(self.calls, len(self.predictions)) - 1]
+
+
+class AccessDecisionTests(TestCase):
+    BOX = [(0, 0, 40, 40)]
+
+    def engine(self, predictions, **kwargs):
+        recognizer = FakeRecognizer(predictions)
+        matcher = FaceMatcher(recognizer, FakeCascade(), cache_ttl=60)
+        frame = np.zeros((50, 50, 3), dtype=np.uint8)
+        engine = AccessDecisionEngine(matcher, lambda timeout: frame, lambda frame: self.BOX,
+                                      max_seconds=60, **kwargs)
+        return engine, recognizer
+
+    def test_each_frame_is_recognized_again(self):
+        # Um só acerto seguido de rostos de outra pessoa não pode virar acesso
+        engine, recognizer = self.engine([(1, 10.0)] + [(2, 10.0)] * 20)
+        result = engine.decide(face_id=1)
+        self.assertFalse(result["granted"])
+        self.assertEqual(result["reason"], "rejected")
+        self.assertEqual(recognizer.calls, result["frames"])
+
+    def test_consistent_matches_are_accepted_before_the_budget(self):
+        engine, recognizer = self.engine([(1, 40.0)])
+        result = engine.decide(face_id=1)
+        self.assertTrue(result["granted"])
+        self.assertLess(result["frames"], engine.max_frames)
+        self.assertEqual(result["votes"], result["frames"])
+
+    def test_frames_without_face_do_not_vote(self):
+        engine, _ = self.engine([(1, 40.0)], max_frames=5)
+        engine.matcher.face_cascade = type("NoFace", (), {"detectMultiScale": lambda self, *a: []})()
+        result = engine.decide(face_id=1)
+        self.assertEqual((result["reason"], result["votes"], result["frames"]), ("budget", 0, 5))
+
+    def test_cache_is_still_used_outside_the_vote(self):
+        recognizer = FakeRecognizer([(1, 10.0)])
+        matcher = FaceMatcher(recognizer, FakeCascade(), cache_ttl=60)
+        frame = np.zeros((50, 50, 3), dtype=np.uint8)
+        for i in range(3):
+            matcher.identify(frame, self.BOX, now=i)
+        self.assertEqual(recognizer.calls, 1)
+        matcher.identify(frame, self.BOX, now=3, fresh=True)
+        self.assertEqual(recognizer.calls, 2)
+
+    def test_cached_identity_is_dropped_when_the_face_changes(self):
+        recognizer = FakeRecognizer([(1, 10.0), (2, 10.0)])
+        matcher = FaceMatcher(recognizer, FakeCascade(), cache_ttl=60)
+        frame = cv2.cvtColor(textured_face(0, (50, 50)), cv2.COLOR_GRAY2BGR)
+        matcher.identify(frame, self.BOX, now=0)
+        # Mudança de luz continua sendo o mesmo rosto
+        brighter = cv2.convertScaleAbs(frame, alpha=0.8, beta=30)
+        self.assertEqual(matcher.identify(brighter, self.BOX, now=1)[0][1], 1)
+        self.assertEqual(recognizer.calls, 1)
+        # Outra pessoa na mesma trilha (mesma caixa): reconhece de novo
+        other = cv2.cvtColor(textured_face(1, (50, 50)), cv2.COLOR_GRAY2BGR)
+        self.assertEqual(matcher.identify(other, self.BOX, now=2)[0][1], 2)
+        self.assertEqual(recognizer.calls, 2)
+        self.assertEqual(matcher.stats()["changed"], 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class DetectionBatchTests(TestCase):
+    URL = "/api/people-detection/batch/"
+
+    def setUp(self):
+        reset_environment_state()
+        load_environment()
+
+    def post(self, readings):
+        response = self.client.post(self.URL, {"readings": readings}, content_type="application/json")
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def test_overlapping_cameras_count_once(self):
+        # Sem CAMERA_AREAS todas as câmeras olham a mesma sala: vale a maior
+        self.post([{"camera": "a", "people_count": 2}])
+        self.post([{"camera": "b", "people_count": 1}])
+        self.assertEqual(environment_state.get_state()["vision_count"], 2)
+        self.post([{"camera": "a", "people_count": 0}])
+        state = environment_state.get_state()
+        self.assertEqual((state["vision_count"], state["has_presence"]), (1, True))
+
+    @override_settings(CAMERA_AREAS="a:sala,b:corredor")
+    def test_cameras_in_different_areas_are_summed(self):
+        self.post([{"camera": "a", "people_count": 2}, {"camera": "b", "people_count": 1}])
+        self.assertEqual(environment_state.get_state()["vision_count"], 3)
+
+    def test_impossible_dates_and_non_finite_numbers_are_rejected(self):
+        readings = [
+            {"timestamp": "2024-13-45T00:00:00", "people_count": 1},
+            {"temperatura": "nan"},
+            {"temperatura": 20.0, "umidade": "inf"},
+            {"temperatura": "abc"},
+            {"temperatura": True},
+        ]
+        before = environment_state.get_state()
+        response = self.client.post(self.URL, {"readings": readings}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(response.json()["errors"]), ["0", "1", "2", "3", "4"])
+        self.assertEqual(environment_state.get_state(), before)
+        self.assertEqual(TelemetrySample.objects.count(), 0)
+
+    def test_older_reading_does_not_replace_newer_one(self):
+        self.post([{"camera": "a", "people_count": 2, "timestamp": "2026-01-01T10:00:05Z"}])
+        self.post([{"camera": "a", "people_count": 5, "timestamp": "2026-01-01T10:00:00Z"}])
+        self.assertEqual(environment_state.get_state()["vision_count"], 2)
+
+    def test_silent_camera_leaves_the_count(self):
+        self.post([{"camera": "a", "people_count": 2}])
+        with override_settings(CAMERA_COUNT_TTL=0):
+            self.post([{"camera": "b", "people_count": 1}])
+        self.assertEqual(environment_state.get_state()["vision_count"], 1)
+
+
+ROLLUP_FIELDS = ["resolution", "bucket", "samples", "occupancy_count", "occupancy_sum", "temperature_count"]
+
+
+@override_settings(CACHES=TEST_CACHES, ALLOWED_HOSTS=["localhost"])
+class LoadtestIngestTests(TransactionTestCase):
+    def setUp(self):
+        reset_environment_state()
+        load_environment()
+        # Amostras que outros testes deixaram na fila não entram na conta
+        telemetry.writer.flush()
+
+    def test_environment_and_samples_are_restored(self):
+        environment_state.update(people_count=4, vision_count=2, has_presence=True, last_rfid="ABC", temperature=21.5)
+        environment_state.flush()
+        before = environment_state.get_state()
+        telemetry.write_samples([TelemetrySample(timestamp=timezone.now(), source="vision", people_count=3)])
+        samples = TelemetrySample.objects.count()
+        rollups = list(TelemetryRollup.objects.order_by("resolution").values(*ROLLUP_FIELDS))
+
+        call_command("loadtest_ingest", readings=20, batch_sizes="5", cameras=2, stdout=open(os.devnull, "w"))
+
+        after = environment_state.get_state()
+        for name in [*Environment.PRESENCE_FIELDS, "vision_count"]:
+            self.assertEqual(after[name], before[name], name)
+        self.assertEqual(after.get(CAMERA_COUNTS, {}), {})
+        self.assertEqual(TelemetrySample.objects.count(), samples)
+        self.assertEqual(list(TelemetryRollup.objects.order_by("resolution").values(*ROLLUP_FIELDS)), rollups)
+        env = Environment.objects.get(pk=before["id"])
+        self.assertEqual((env.people_count, env.last_rfid, env.temperature), (4, "ABC", 21.5))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PresenceTests(TestCase):
+    def setUp(self):
+        reset_environment_state()
+        self.env = load_environment()
+
+    def rfid(self, rfid, presence):
+        response = self.client.post("/api/people-detection/", {
+            "temperatura": 22.0, "umidade": 50.0, "ultimo_rfid": rfid, "tem_presenca": presence,
+        }, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def vision(self, count):
+        response = self.client.patch("/api/status/", {"people_count": count}, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_repeated_entry_and_exit_change_the_count_once(self):
+        self.rfid("A", True)
+        self.rfid("A", True)
+        self.assertEqual(self.rfid("B", True)["people_count"], 2)
+        self.rfid("A", False)
+        data = self.rfid("A", False)
+        self.assertEqual((data["people_count"], data["has_presence"]), (1, True))
+        self.assertEqual(Environment.objects.get(pk=self.env.pk).people_count, 1)
+
+    def test_vision_does_not_overwrite_rfid_occupancy(self):
+        self.rfid("A", True)
+        data = self.vision(0)
+        self.assertEqual((data["people_count"], data["vision_count"], data["has_presence"]), (1, 0, True))
+        self.rfid("B", True)
+        self.vision(5)
+        data = self.rfid("B", False)
+        self.assertEqual((data["people_count"], data["vision_count"]), (1, 5))
+
+    def test_presence_stays_while_either_source_sees_someone(self):
+        self.vision(2)
+        self.rfid("A", True)
+        self.assertTrue(self.rfid("A", False)["has_presence"])
+        self.assertFalse(self.vision(0)["has_presence"])
+
+    def test_presence_flags_parse_text(self):
+        self.rfid("A", "true")
+        data = self.rfid("A", "false")
+        self.assertEqual((data["people_count"], data["has_presence"]), (0, False))
+        response = self.client.patch("/api/status/", {"people_count": 0, "has_presence": "false"},
+                                     content_type="application/json")
+        self.assertFalse(response.json()["has_presence"])
+
+    def test_bad_input_is_rejected_without_changes(self):
+        self.rfid("A", True)
+        for body in ({"temperatura": "abc", "umidade": 50.0, "ultimo_rfid": "B", "tem_presenca": True},
+                     {"temperatura": 22.0, "umidade": "NaN", "ultimo_rfid": "B", "tem_presenca": True},
+                     {"temperatura": "inf", "umidade": 50.0, "ultimo_rfid": "B", "tem_presenca": True},
+                     {"temperatura": 22.0, "umidade": 50.0, "ultimo_rfid": "A", "tem_presenca": "talvez"}):
+            response = self.client.post("/api/people-detection/", body, content_type="application/json")
+            self.assertEqual(response.status_code, 400, body)
+        response = self.client.patch("/api/status/", {"people_count": 1, "has_presence": "nao"},
+                                     content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        env = Environment.objects.get(pk=self.env.pk)
+        self.assertEqual((env.people_count, env.temperature, env.last_rfid), (1, 22.0, "A"))
+        self.assertEqual(list(env.occupants.values_list("rfid", flat=True)), ["A"])
+
+    def test_stale_instances_do_not_lose_entries(self):
+        # Duas requisições que carregaram o Environment antes da outra gravar
+        first = Environment.objects.get(pk=self.env.pk)
+        second = Environment.objects.get(pk=self.env.pk)
+        first.update_presence("A", 20.0, 50.0, True)
+        second.update_presence("B", 20.0, 50.0, True)
+        self.assertEqual(second.people_count, 2)
+        first.update_presence("B", 20.0, 50.0, False)
+        self.assertEqual((first.people_count, first.has_presence), (1, True))
+        self.assertEqual(list(first.occupants.values_list("rfid", flat=True)), ["A"])
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.text = ""
+
+
+class FakeSession:
+    """ Guarda os payloads enviados; as primeiras `failures` chamadas respondem 503 """
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.payloads = []
+        self.sent = threading.Event()
+
+    def request(self, url, json=None, timeout=None):
+        if self.failures:
+            self.failures -= 1
+            return FakeResponse(503)
+        self.payloads.append(json)
+        self.sent.set()
+        return FakeResponse(200)
+
+    patch = post = request
+
+    def close(self):
+        pass
+
+
+class CountingEvent(threading.Event):
+    def __init__(self):
+        super().__init__()
+        self.waits = 0
+
+    def wait(self, timeout=None):
+        self.waits += 1
+        return super().wait(timeout)
+
+
+class PresencePublisherTests(TestCase):
+    def publisher(self, session=None, **kwargs):
+        publisher = PresencePublisher("http://django/api/status/", heartbeat=60, min_backoff=0.01, **kwargs)
+        publisher.session = session or FakeSession()
+        return publisher
+
+    def test_idle_worker_does_not_spin(self):
+        publisher = self.publisher()
+        publisher._wakeup = CountingEvent()
+        publisher.start()
+        time.sleep(0.3)
+        publisher.stop()
+        self.assertLessEqual(publisher._wakeup.waits, 2)
+        self.assertEqual(publisher.session.payloads, [])
+
+    def test_only_the_latest_value_is_sent(self):
+        publisher = self.publisher()
+        for value in (1, 2, 3):
+            publisher.publish(value)
+        publisher.start()
+        self.assertTrue(publisher.session.sent.wait(2))
+        publisher.stop()
+        self.assertEqual(publisher.session.payloads, [{"people_count": 3, "has_presence": True}])
+        self.assertEqual(publisher.coalesced, 2)
+
+    def test_stop_sends_the_pending_value(self):
+        publisher = self.publisher()
+        publisher.publish(0)
+        publisher.stop()
+        self.assertEqual(publisher.session.payloads, [{"people_count": 0, "has_presence": False}])
+
+    def test_failed_send_is_retried(self):
+        publisher = self.publisher(FakeSession(failures=2))
+        publisher.start()
+        publisher.publish(4)
+        self.assertTrue(publisher.session.sent.wait(2))
+        publisher.stop()
+        self.assertEqual(publisher.failures, 2)
+        self.assertEqual(publisher.session.payloads[-1]["people_count"], 4)
+
+    def test_events_leave_the_queue_only_after_delivery(self):
+        publisher = self.publisher(FakeSession(failures=1), events_url="http://django/api/occupancy/events/")
+        event = {"type": "entry", "zone": "porta", "track_id": 1, "at": 0.0}
+        publisher.publish(1, [event])
+        self.assertFalse(publisher.flush())
+        self.assertEqual(publisher.stats()["events_pending"], 1)
+        self.assertTrue(publisher.flush())
+        self.assertEqual(publisher.session.payloads[0]["events"], [event])
+        self.assertEqual(publisher.stats()["events_pending"], 0)
+
+
+class LogPaginationTests(TestCase):
+    URL = "/api/logs/"
+
+    def setUp(self):
+        now = timezone.now()
+        # Vários com o mesmo created_at: o id desempata
+        Log.objects.bulk_create(
+            [Log(event=f"evento {i}", created_at=now - timedelta(seconds=i // 3)) for i in range(10)]
+        )
+
+    def test_pages_cover_every_row_once_in_order(self):
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(self.URL, {"limit": 3, **({"cursor": cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            seen.extend(row["id"] for row in data["results"])
+            cursor = data["next"]
+            if cursor is None:
+                break
+        expected = list(Log.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor_is_a_bad_request(self):
+        for raw in ([None, 5], ["", 5], ["2026-01-01T00:00:00Z"], ["ontem", 5], ["2026-01-01T00:00:00Z", "x"], {}):
+            cursor = base64.urlsafe_b64encode(json.dumps(raw).encode()).decode().rstrip("=")
+            response = self.client.get(self.URL, {"cursor": cursor})
+            self.assertEqual(response.status_code, 400, raw)
+        self.assertEqual(self.client.get(self.URL, {"cursor": "%%%"}).status_code, 400)
+
+
+class LogArchiveTests(TestCase):
+    def test_archive_is_complete_before_rows_are_deleted(self):
+        now = timezone.now()
+        Log.objects.bulk_create([Log(event=f"velho {i}", created_at=now - timedelta(days=40, seconds=i))
+                                 for i in range(7)])
+        recent = Log.objects.create(event="novo", created_at=now)
+
+        directory = tempfile.mkdtemp(prefix="django_yolo_archive_")
+        rows, path = event_log.archive_before(now - timedelta(days=30), directory, batch_size=3)
+
+        self.assertEqual(rows, 7)
+        self.assertEqual(os.listdir(directory), [os.path.basename(path)])
+        # gzip confere o CRC e o tamanho do trailer na leitura
+        with gzip.open(path, "rb") as f:
+            archived = [json.loads(line) for line in f]
+        self.assertEqual(sorted(row["event"] for row in archived), sorted(f"velho {i}" for i in range(7)))
+        self.assertEqual(list(Log.objects.values_list("id", flat=True)), [recent.pk])
+
+    def test_nothing_to_archive_leaves_no_file(self):
+        directory = tempfile.mkdtemp(prefix="django_yolo_archive_")
+        self.assertEqual(event_log.archive_before(timezone.now(), directory), (0, None))
+        self.assertEqual(os.listdir(directory), [])
+
+
+class ESP32ClientTests(TestCase):
+    """ Cliente contra o ESP32 simulado (python manage.py esp32_stub) rodando numa thread """
+
+    RESET = 0.2
+
+    def setUp(self):
+        self.server = StubESP32Server(("127.0.0.1", 0), rfid="6C3ACB33")
+        # Resposta atrasada cai num socket que o cliente já fechou por timeout
+        self.server.handle_error = lambda request, client_address: None
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        host, port = self.server.server_address
+        self.client = ESP32Client(f"http://{host}:{port}", read_timeout=0.2, status_ttl=0,
+                                  failure_threshold=2, reset_timeout=self.RESET)
+        self.addCleanup(self.client.session.close)
+
+    def fail(self, times, path="/status_rfid"):
+        for _ in range(times):
+            with self.assertRaises(ESP32Unavailable):
+                self.client.get_json(path)
+
+    def test_breaker_opens_after_consecutive_failures(self):
+        self.server.fail_rate = 1.0
+        self.fail(2)
+        self.assertEqual(self.client.breaker("/status_rfid").state, CircuitBreaker.OPEN)
+        served = self.server.requests
+        self.fail(1)
+        self.assertEqual(self.server.requests, served)
+        self.assertEqual(self.client.rejected, 1)
+
+    def test_half_open_trial_closes_or_reopens_the_breaker(self):
+        self.server.fail_rate = 1.0
+        self.fail(2)
+        time.sleep(self.RESET)
+        breaker = self.client.breaker("/status_rfid")
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        # A tentativa do meio-aberto falhou: abre de novo, sem esperar N falhas
+        self.fail(1)
+        self.assertEqual((breaker.state, breaker.opened), (CircuitBreaker.OPEN, 2))
+
+        time.sleep(self.RESET)
+        self.server.fail_rate = 0.0
+        self.assertEqual(self.client.status_rfid(), {"ultimo_rfid": "6C3ACB33"})
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_slow_board_times_out_and_counts_as_failure(self):
+        self.server.delay = 0.4
+        start = time.monotonic()
+        self.fail(1)
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual(self.client.failures, 1)
+
+    def test_open_breaker_serves_the_last_status_as_stale(self):
+        data, stale = self.client.status()
+        self.assertFalse(stale)
+        self.server.fail_rate = 1.0
+        self.fail(2, "/status")
+        self.assertEqual(self.client.status(max_age=0), (data, True))
+
+    def test_failing_polls_do_not_block_access_results(self):
+        self.server.fail_rate = 1.0
+        self.fail(2, "/status")
+        self.fail(2, "/status_rfid")
+        self.server.fail_rate = 0.0
+        self.client.send_rfid_result("LIBERADO_Israel")
+        self.assertEqual(self.server.results, ["LIBERADO_Israel"])
+        self.assertEqual(self.client.stats()["breakers"]["/rfid_result"], CircuitBreaker.CLOSED)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AllowlistTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(name="Israel", rfid="6C3ACB33", face_label=1, is_authorized=True)
+        self.assertEqual(allowlist.lookup("6C3ACB33")["face_label"], 1)
+
+    def test_save_and_delete_are_seen_on_the_next_lookup(self):
+        self.user.face_label = 2
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(allowlist.lookup("6C3ACB33")["face_label"], 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertIsNone(allowlist.lookup("6C3ACB33"))
+
+    def test_bulk_revocation_is_seen_on_the_next_lookup(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(rfid="6C3ACB33").update(is_authorized=False)
+        self.assertIsNone(allowlist.lookup("6C3ACB33"))
+
+        self.user.is_authorized = True
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.bulk_update([self.user], ["is_authorized"])
+        self.assertIsNotNone(allowlist.lookup("6C3ACB33"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.bulk_create([User(name="Maria", rfid="AA", is_authorized=True)])
+        self.assertIsNotNone(allowlist.lookup("AA"))
+
+    def test_invalidation_waits_for_the_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            User.objects.filter(rfid="6C3ACB33").update(is_authorized=False)
+            # Ainda dentro da transação: a versão não mudou, vale o que estava em cache
+            self.assertIsNotNone(allowlist.lookup("6C3ACB33"))
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertIsNone(allowlist.lookup("6C3ACB33"))
+
+    def test_change_outside_the_orm_expires_with_max_age(self):
+        cache.clear()
+        local = AllowlistCache(max_age=0.1)
+        self.assertIsNotNone(local.lookup("6C3ACB33"))
+        with connection.cursor() as cursor:
+            cursor.execute(f"UPDATE {User._meta.db_table} SET is_authorized = %s", [False])
+        self.assertIsNotNone(local.lookup("6C3ACB33"))
+        time.sleep(0.15)
+        self.assertIsNone(local.lookup("6C3ACB33"))
+
+
+class LoadDetectorTests(TestCase):
+    """ O ultralytics é trocado por um YOLO que só registra o caminho pedido """
+
+    def setUp(self):
+        self.loaded = []
+        fake = SimpleNamespace(YOLO=lambda path, **kwargs: self.loaded.append(path) or path)
+        patcher = mock.patch.dict("sys.modules", {"ultralytics": fake})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pt_path = os.path.join(tempfile.mkdtemp(prefix="django_yolo_models_"), "yolov8n.pt")
+
+    def test_missing_torch_weights_are_left_to_yolo(self):
+        detector = load_detector(self.pt_path, "torch")
+        self.assertEqual(self.loaded, [self.pt_path])
+        self.assertEqual(detector.path, self.pt_path)
+
+    def test_exported_backends_must_exist(self):
+        for backend in ("onnx", "openvino", "int8"):
+            with self.assertRaises(FileNotFoundError):
+                load_detector(self.pt_path, backend)
+        self.assertEqual(self.loaded, [])
+
+
+def load_training_module(name):
+    """ Módulo de yolo_training/ (roda fora do Django, sem pacote) carregado pelo caminho """
+    folder = os.path.join(settings.BASE_DIR.parent, "yolo_training")
+    spec = importlib.util.spec_from_file_location(f"yolo_training_{name}", os.path.join(folder, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    # Registrado para o pickle achar as funções mandadas ao ProcessPoolExecutor
+    sys.modules[spec.name] = module
+    # Os scripts importam uns aos outros pelo nome (from faces import ...), como rodando da pasta
+    with mock.patch.object(sys, "path", [folder, *sys.path]):
+        spec.loader.exec_module(module)
+    return module
+
+
+class FakeEyeCascade:
+    """ Dois olhos em alturas diferentes (cabeça inclinada), em coordenadas do recorte do rosto """
+
+    def detectMultiScale(self, roi, *args, **kwargs):
+        return [(40, 40, 30, 30), (130, 60, 30, 30)]
+
+
+def textured_face(seed=0, shape=(300, 300)):
+    rng = np.random.default_rng(seed)
+    return cv2.GaussianBlur(rng.integers(0, 256, shape, dtype=np.uint8), (7, 7), 0)
+
+
+class AlignmentTests(TestCase):
+    BOX = (50, 50, 200, 200)
+
+    def setUp(self):
+        self.faces = load_training_module("faces")
+        # O treino carrega os cascades do OpenCV; aqui vão os falsos
+        self.faces._face_cascade, self.faces._eye_cascade = object(), FakeEyeCascade()
+
+    def test_inference_crop_is_the_same_as_the_training_crop(self):
+        gray = textured_face()
+        eyes = self.faces.detect_eyes(gray, self.BOX)
+        self.assertIsNotNone(eyes)
+        self.assertNotEqual(self.faces.eye_angle(eyes), 0)
+        expected = self.faces.align_face(gray, self.BOX, 100)
+        np.testing.assert_array_equal(align_face(gray, self.BOX, 100, FakeEyeCascade()), expected)
+        # Sem nivelar os olhos o recorte é outro
+        self.assertFalse(np.array_equal(align_face(gray, self.BOX, 100), expected))
+
+
+class TrainingCacheTests(TestCase):
+    SIZE = 50
+
+    def setUp(self):
+        self.training = load_training_module("training")
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dataset = os.path.join(tmp.name, "dataset")
+        self.cache_dir = os.path.join(tmp.name, "cache")
+
+    def photo(self, rel, seed, mtime=None):
+        """ Recorte já alinhado (.face.png), que não passa pelo Haar; sem seed, um arquivo ilegível (sem rosto) """
+        path = os.path.join(self.dataset, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if seed is None:
+            with open(path, "wb") as f:
+                f.write(b"corrompida")
+        else:
+            cv2.imwrite(path, textured_face(seed, (80, 80)))
+        if mtime is not None:
+            os.utime(path, ns=(mtime, mtime))
+        return path
+
+    def update(self):
+        return self.training.update_cache(self.dataset, self.cache_dir, self.SIZE, workers=2)
+
+    def cached(self, person):
+        return np.load(os.path.join(self.cache_dir, f"{person}.npy"))
+
+    def test_only_new_and_changed_photos_are_processed(self):
+        self.photo("Ana/0001.face.png", 1)
+        ana = self.photo("Ana/0002.face.png", 2)
+        self.photo("Bruno/0001.face.png", 3)
+        self.photo("Bruno/corrompida.jpg", None)
+        index, labels, stats = self.update()
+        self.assertEqual(labels, {"Ana": 1, "Bruno": 2})
+        self.assertEqual((stats["processed"], stats["no_face"]), (4, 1))
+        self.assertEqual(sorted(stats["rewritten"]), ["Ana", "Bruno"])
+        self.assertEqual({p: len(c) for p, c in stats["added"].items()}, {"Ana": 2, "Bruno": 1})
+        self.assertEqual(self.cached("Ana").shape, (2, self.SIZE, self.SIZE))
+        self.assertIsNone(index["people"]["Bruno"]["Bruno/corrompida.jpg"]["row"])
+
+        # Nada mudou: tudo sai do cache e nenhum .npy é regravado
+        _, _, stats = self.update()
+        self.assertEqual((stats["processed"], stats["reused"], stats["rewritten"]), (0, 4, []))
+
+        # Foto trocada, foto apagada e pessoa nova
+        mtime = os.stat(ana).st_mtime_ns + 10 ** 9
+        ana = self.photo("Ana/0002.face.png", 20, mtime=mtime)
+        os.remove(os.path.join(self.dataset, "Bruno/0001.face.png"))
+        self.photo("Carla/0001.face.png", 4)
+        index, labels, stats = self.update()
+        self.assertEqual(labels, {"Ana": 1, "Bruno": 2, "Carla": 3})
+        self.assertEqual((stats["processed"], stats["modified"], stats["removed"]), (2, 1, 1))
+        self.assertEqual(stats["added"].keys(), {"Carla"})
+        np.testing.assert_array_equal(self.cached("Ana")[1], self.training.load_face(ana, self.SIZE))
+        # Bruno só tem a foto sem rosto: o .npy some, a entrada fica
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, "Bruno.npy")))
+        self.assertEqual(list(index["people"]["Bruno"]), ["Bruno/corrompida.jpg"])
+
+        faces, ids = self.training.load_training_set(self.cache_dir, index, labels)
+        self.assertEqual(ids.tolist(), [1, 1, 3])
+
+    def test_labels_survive_removed_people_and_new_face_size(self):
+        self.photo("Ana/0001.face.png", 1)
+        self.photo("Bruno/0001.face.png", 2)
+        self.update()
+        shutil.rmtree(os.path.join(self.dataset, "Ana"))
+        self.photo("Davi/0001.face.png", 3)
+        index, labels, stats = self.update()
+        # O label da Ana fica reservado; ninguém herda o número dela
+        self.assertEqual(labels, {"Ana": 1, "Bruno": 2, "Davi": 3})
+        self.assertEqual(set(index["people"]), {"Bruno", "Davi"})
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, "Ana.npy")))
+        self.assertEqual(self.training.trained_labels(labels, index), {"Bruno": 2, "Davi": 3})
+
+        # Outro tamanho de recorte reprocessa tudo, mas mantém os labels
+        index, labels, stats = self.training.update_cache(self.dataset, self.cache_dir, 40, workers=2)
+        self.assertEqual((stats["processed"], labels["Davi"]), (2, 3))
+        self.assertEqual(self.cached("Bruno").shape, (1, 40, 40))
+
+
+class FrameList:
+    """ VideoCapture falso que entrega os frames dados e depois falha """
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+
+    def read(self):
+        if not self.frames:
+            return False, None
+        return True, self.frames.pop(0)
+
+
+class AutoCaptureTests(TestCase):
+    BOX = (50, 50, 200, 200)
+    LEVEL_EYES = ((110.0, 100.0), (190.0, 100.0))
+
+    def setUp(self):
+        self.trainer = load_training_module("trainer")
+        self.args = SimpleNamespace(face_size=100, min_face=120, min_sharpness=60.0, max_roll=15.0, max_yaw=0.1,
+                                    min_distance=6, interval=0.0, samples=5)
+        # Sem Haar: qualquer frame com textura tem um rosto em BOX; os olhos vêm de self.eyes
+        self.eyes = self.LEVEL_EYES
+        for name, fake in (("detect_largest_face", lambda gray: self.BOX if gray.std() > 0 else None),
+                           ("detect_eyes", lambda gray, box: self.eyes)):
+            patch = mock.patch.object(self.trainer, name, side_effect=fake)
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def reason(self, gray):
+        return self.trainer.evaluate(gray, self.args)[2]
+
+    def test_quality_gate(self):
+        face = textured_face(1)
+        box, crop, reason = self.trainer.evaluate(face, self.args)
+        self.assertEqual((box, reason, crop.shape), (self.BOX, None, (100, 100)))
+        self.assertEqual(self.reason(np.full((300, 300), 128, dtype=np.uint8)), "sem rosto")
+        self.assertEqual(self.reason(cv2.GaussianBlur(face, (41, 41), 0)), "borrado")
+        self.args.min_face = 250
+        self.assertEqual(self.reason(face), "rosto pequeno")
+        self.args.min_face = 120
+        for eyes, expected in ((None, "olhos não encontrados"),
+                               (((110.0, 100.0), (190.0, 140.0)), "cabeça inclinada"),
+                               (((150.0, 100.0), (230.0, 100.0)), "rosto de lado")):
+            self.eyes = eyes
+            self.assertEqual(self.reason(face), expected)
+
+    def test_near_duplicates_are_not_saved(self):
+        a, b = textured_face(1), textured_face(2)
+        noisy = np.clip(a.astype(int) + np.random.default_rng(9).integers(-3, 4, a.shape), 0, 255).astype(np.uint8)
+        index = self.trainer.HashIndex(self.args.min_distance)
+        index.add(self.trainer.dhash(self.trainer.evaluate(a, self.args)[1]))
+        self.assertTrue(index.is_duplicate(self.trainer.dhash(self.trainer.evaluate(noisy, self.args)[1])))
+        self.assertFalse(index.is_duplicate(self.trainer.dhash(self.trainer.evaluate(b, self.args)[1])))
+
+    def test_capture_resumes_numbering_and_skips_saved_faces(self):
+        with tempfile.TemporaryDirectory() as folder:
+            a, b = textured_face(1), textured_face(2)
+            cv2.imwrite(os.path.join(folder, "0007.face.png"), self.trainer.evaluate(a, self.args)[1])
+            frames = [cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+                      for gray in (a, np.full((300, 300), 128, dtype=np.uint8), b, b, a)]
+            with mock.patch.object(cv2, "imshow"), mock.patch.object(cv2, "waitKey", return_value=-1):
+                count = self.trainer.capture_auto(FrameList(frames), folder, self.args)
+            # Só o rosto B é novo: entra como 0008, uma vez só
+            self.assertEqual(count, 2)
+            self.assertEqual(sorted(os.listdir(folder)), ["0007.face.png", "0008.face.png"])
+            saved = cv2.imread(os.path.join(folder, "0008.face.png"), cv2.IMREAD_GRAYSCALE)
+            np.testing.assert_array_equal(saved, self.trainer.evaluate(b, self.args)[1])
+
+
+class HotReloadTests(TestCase):
+    FACE_SIZE = 64
+
+    def setUp(self):
+        self.store = load_training_module("model_store")
+        self.directory = tempfile.mkdtemp(prefix="django_yolo_face_models_")
+
+    def publish(self, people):
+        """ Uma versão nova com `people` pessoas (rostos sintéticos, 3 por pessoa) """
+        faces, ids = [], []
+        for label in range(1, people + 1):
+            for sample in range(3):
+                faces.append(textured_face(label * 10 + sample, (self.FACE_SIZE, self.FACE_SIZE)))
+                ids.append(label)
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer.train(faces, np.array(ids, dtype=np.int32))
+        labels = {f"pessoa{label}": label for label in range(1, people + 1)}
+        manifest = self.store.publish(recognizer, self.directory, labels, self.FACE_SIZE, len(faces), mode="train")
+        # O mtime do manifest é a assinatura: garante que mudou mesmo em sistemas de arquivos com 1s de resolução
+        path = os.path.join(self.directory, self.store.MANIFEST)
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + manifest["version"] * 10**9))
+        return manifest
+
+    def test_new_version_is_swapped_in_and_clears_the_cache(self):
+        self.publish(1)
+        recognizer = HotReloadingRecognizer(self.directory, check_interval=0).load()
+        matcher = FaceMatcher(recognizer, FakeCascade(), cache_ttl=60)
+        matcher.cache.put(1, 1, 10.0)
+        self.assertEqual(recognizer.version, 1)
+        self.assertFalse(recognizer.check())
+
+        self.publish(2)
+        self.assertTrue(recognizer.check())
+        self.assertEqual(recognizer.version, 2)
+        label, _ = recognizer.predict(recognizer.prepare(textured_face(20, (self.FACE_SIZE, self.FACE_SIZE)),
+                                                         (0, 0, self.FACE_SIZE, self.FACE_SIZE)))
+        self.assertEqual(label, 2)
+        frame = np.zeros((50, 50, 3), dtype=np.uint8)
+        matcher.identify(frame, [(0, 0, 40, 40)], now=0)
+        self.assertEqual(matcher.cache.stats()["entries"], 0)
+
+    def test_prepare_uses_the_manifest_face_size(self):
+        self.publish(1)
+        recognizer = HotReloadingRecognizer(self.directory, check_interval=0).load()
+        face = recognizer.prepare(textured_face(), AlignmentTests.BOX, FakeEyeCascade())
+        self.assertEqual(face.shape, (self.FACE_SIZE, self.FACE_SIZE))
+
+    def test_broken_version_keeps_the_previous_model(self):
+        self.publish(1)
+        recognizer = HotReloadingRecognizer(self.directory, check_interval=0).load()
+        manifest = self.publish(2)
+        os.remove(os.path.join(self.directory, manifest["file"]))
+        self.assertFalse(recognizer.check())
+        self.assertEqual((recognizer.version, recognizer.failures), (1, 1))
+
+    def test_stale_mark_is_reported(self):
+        self.publish(1)
+        recognizer = HotReloadingRecognizer(self.directory, check_interval=0).load()
+        self.store.mark_stale(self.directory, modified=2, removed=1)
+        os.utime(os.path.join(self.directory, self.store.MANIFEST), ns=(time.time_ns(), time.time_ns() + 5 * 10**9))
+        recognizer.check()
+        self.assertEqual(recognizer.stats()["stale"]["modified"], 2)
+        self.assertEqual(recognizer.version, 1)
+
+
+class TrackingTests(TestCase):
+    def test_cameras_of_the_same_area_count_the_largest(self):
+        self.assertEqual(combine_camera_counts({0: 2, 1: 3}), 3)
+        self.assertEqual(combine_camera_counts({}), 0)
+
+    def test_areas_are_summed(self):
+        areas = parse_camera_areas("0:sala, 1:sala, 2:corredor")
+        self.assertEqual(areas, {"0": "sala", "1": "sala", "2": "corredor"})
+        self.assertEqual(combine_camera_counts({0: 2, 1: 3, 2: 1}, areas), 4)
+        # Câmera sem área fica na área comum, que é somada às outras
+        self.assertEqual(combine_camera_counts({0: 2, 3: 1}, {"0": "sala"}), 3)
+
+    def test_points_on_the_zone_border_are_inside(self):
+        zone = Zone("a", [[0, 0], [10, 0], [10, 10], [0, 10]])
+        points = [[5, 10], [0, 5], [10, 10], [5, 5], [5, 10.6], [11, 5], [-1, -1]]
+        self.assertEqual(zone.contains(points).tolist(), [True, True, True, True, False, False, False])
+
+    def run_counter(self, counter, frames):
+        """ frames: [(instante, caixas)]; devolve [(instante, evento)] """
+        return [(now, event) for now, boxes in frames for event in counter.update(boxes, now=now)]
+
+    def test_full_frame_zone_counts_box_touching_the_bottom(self):
+        counter = OccupancyCounter([Zone("sala", [[0, 0], [640, 0], [640, 480], [0, 480]])], enter_after=0)
+        events = self.run_counter(counter, [(i * 0.1, [(100, 300, 200, 480)]) for i in range(5)])
+        self.assertEqual([e["type"] for _, e in events], ["entry"])
+        self.assertEqual(counter.count, 1)
+
+    def test_entry_waits_for_the_debounce(self):
+        counter = OccupancyCounter(enter_after=1.0, exit_after=3.0)
+        box = [(100, 100, 140, 200)]
+        events = self.run_counter(counter, [(i / 10, box) for i in range(30)])
+        # Trilha confirmada no 3º frame (0.2s) + 1s dentro da zona
+        self.assertEqual(len(events), 1)
+        self.assertAlmostEqual(events[0][0], 1.2)
+        self.assertEqual(counter.count, 1)
+
+    def test_missed_detections_do_not_cause_an_exit(self):
+        counter = OccupancyCounter(enter_after=0.5, exit_after=3.0)
+        box = [(100, 100, 140, 200)]
+        # Vista por 2s, perdida por 1s (menos que o max_age do tracker), vista de novo
+        frames = [(i / 10, box if not 20 <= i < 30 else []) for i in range(40)]
+        events = self.run_counter(counter, frames)
+        self.assertEqual([e["type"] for _, e in events], ["entry"])
+        self.assertEqual(counter.count, 1)
+        # Sumiu de vez: a trilha morre depois de max_age (1.5s) e a saída vem exit_after depois
+        events = self.run_counter(counter, [(i / 10, []) for i in range(40, 100)])
+        self.assertEqual([e["type"] for _, e in events], ["exit"])
+        self.assertGreaterEqual(events[0][0], 3.9 + 1.5 + 3.0)
+        self.assertLess(events[0][0], 3.9 + 1.5 + 3.0 + 0.2)
+        self.assertEqual(counter.count, 0)
+
+    def test_short_step_out_of_the_zone_is_ignored(self):
+        zone = Zone("porta", [[0, 0], [200, 0], [200, 300], [0, 300]])
+        counter = OccupancyCounter([zone], enter_after=0.5, exit_after=1.0)
+        inside, outside = [(100, 100, 140, 200)], [(100, 250, 140, 350)]
+        frames = [(i / 10, outside if 20 <= i < 25 else inside) for i in range(40)]
+        events = self.run_counter(counter, frames)
+        self.assertEqual([e["type"] for _, e in events], ["entry"])
+        self.assertEqual(counter.counts(), {"porta": 1})
+
+    def test_tracker_follows_a_moving_box_through_missed_frames(self):
+        tracker = SortTracker(min_hits=1)
+        ids = set()
+        # 100 px/s; caixa de 40 px some por 0.3s e volta 40 px à frente da última vista
+        for i in [0, 1, 2, 3, 4, 5, 9]:
+            x = 10 * i
+            found, _ = tracker.update([(x, 0, x + 40, 100)], now=i / 10)
+            ids.update(found.tolist())
+        self.assertEqual(len(ids), 1)
+
+    def test_unconfirmed_track_is_not_reported(self):
+        tracker = SortTracker(min_hits=3)
+        box = [(0, 0, 40, 100)]
+        self.assertEqual(len(tracker.update(box, now=0)[0]), 0)
+        self.assertEqual(len(tracker.update(box, now=0.1)[0]), 0)
+        self.assertEqual(len(tracker.update(box, now=0.2)[0]), 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class OccupancyEventTests(TestCase):
+    URL = "/api/occupancy/events/"
+
+    def setUp(self):
+        reset_environment_state()
+        load_environment()
+
+    def test_valid_payload_is_normalized(self):
+        data, errors = validate_occupancy_events({
+            "people_count": 2,
+            "events": [
+                {"type": "entry", "zone": "porta", "track_id": 7, "at": 0},
+                {"type": "exit", "zone": "porta", "track_id": 8, "camera": 1, "at": "2026-01-01T10:00:00"},
+            ],
+        })
+        self.assertEqual(errors, {})
+        self.assertIsNone(data["has_presence"])
+        first, second = data["events"]
+        self.assertEqual((first["camera"], first["at"].timestamp()), ("", 0))
+        self.assertEqual(second["camera"], "1")
+        self.assertTrue(timezone.is_aware(second["at"]))
+
+    def test_invalid_payload_reports_each_field(self):
+        _, errors = validate_occupancy_events({
+            "people_count": True,
+            "has_presence": "sim",
+            "events": ["x", {"type": "walk", "track_id": False}, {"type": "entry", "track_id": 1, "at": "ontem"}],
+        })
+        self.assertEqual(set(errors), {"people_count", "has_presence", "events[0]", "events[1]", "events[2]"})
+        self.assertEqual(len(errors["events[1]"]), 2)
+        for at in [1e20, float("nan"), "2024-02-30T00:00:00"]:
+            with self.subTest(at=at):
+                _, errors = validate_occupancy_events({"people_count": 0, "events": [
+                    {"type": "entry", "track_id": 1, "at": at},
+                ]})
+                self.assertEqual(errors, {"events[0]": ["at inválido"]})
+        self.assertEqual(validate_occupancy_events({"people_count": -1})[1].keys(), {"people_count"})
+        self.assertEqual(validate_occupancy_events([])[1].keys(), {"non_field_errors"})
+        _, errors = validate_occupancy_events({"people_count": 0, "events": [{}, {}]}, max_events=1)
+        self.assertEqual(errors.keys(), {"events"})
+
+    def test_events_are_logged_and_count_applied(self):
+        response = self.client.post(self.URL, {
+            "people_count": 1,
+            "events": [{"type": "entry", "zone": "porta", "track_id": 3, "camera": "0"}],
+        }, content_type="application/json")
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json(), {"accepted": 1, "vision_count": 1})
+        state = environment_state.get_state()
+        self.assertEqual((state["vision_count"], state["has_presence"]), (1, True))
+        event_log.writer.flush()
+        log = Log.objects.get(event_type=Log.VISION)
+        self.assertEqual(log.event, "Entrada na zona porta (trilha 3, câmera 0)")
+
+    def test_impossible_date_is_a_400(self):
+        response = self.client.post(self.URL, {
+            "people_count": 1, "events": [{"type": "entry", "track_id": 1, "at": "2024-02-30T00:00:00"}],
+        }, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"], {"events[0]": ["at inválido"]})
+
+    def test_invalid_payload_is_rejected(self):
+        response = self.client.post(self.URL, {"people_count": -1, "events": []}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("people_count", response.json()["errors"])
+        self.assertEqual(environment_state.get_state()["vision_count"], 0)
+
+
+class MotionGateReplayTests(TestCase):
+    """ Cena sintética: o "detector" conta as caixas desenhadas, o portão decide quando ele roda """
+    WIDTH, HEIGHT, FPS = 320, 240, 15.0
+
+    def people_at(self, i):
+        boxes = []
+        # A entra pela esquerda, fica parada no meio e sai pela direita
+        if 30 <= i < 90:
+            x = -40 + (i - 30) * 2.5
+        elif 90 <= i < 200:
+            x = 110
+        elif 200 <= i < 260:
+            x = 110 + (i - 200) * 4
+        else:
+            x = None
+        if x is not None and -40 < x < self.WIDTH:
+            boxes.append((int(x), 80, int(x) + 40, 200))
+        # B atravessa da direita para a esquerda enquanto A está parada
+        if 120 <= i < 180:
+            x = self.WIDTH - (i - 120) * 6
+            if -40 < x < self.WIDTH:
+                boxes.append((int(x), 60, int(x) + 40, 180))
+        return boxes
+
+    def replay(self, gate, frames=300, people_at=None):
+        people_at = people_at or self.people_at
+        rng = np.random.default_rng(0)
+        background = cv2.GaussianBlur(rng.integers(60, 200, (self.HEIGHT, self.WIDTH, 3), dtype=np.uint8), (9, 9), 0)
+        full, gated, count = [], [], None
+        for i in range(frames):
+            frame = background.copy()
+            for x1, y1, x2, y2 in people_at(i):
+                cv2.rectangle(frame, (max(x1, 0), y1), (min(x2, self.WIDTH - 1), y2), (30, 30, 30), -1)
+            # Ruído do sensor e luz subindo devagar
+            frame = cv2.add(frame, rng.integers(0, 6, frame.shape, dtype=np.uint8))
+            frame = cv2.convertScaleAbs(frame, alpha=1, beta=i * 0.05)
+            if gate.should_infer(frame, now=i / self.FPS):
+                count = len(people_at(i))
+            full.append(len(people_at(i)))
+            gated.append(count)
+        return compare_counts(full, gated)
+
+    def test_counts_agree_and_staleness_is_bounded_by_min_refresh(self):
+        gate = MotionGate(min_refresh=2.0)
+        agreement, mean_error, longest = self.replay(gate)
+        self.assertGreaterEqual(agreement, 0.85)
+        self.assertLess(mean_error, 0.15)
+        # A contagem nunca fica velha por mais que o refresh forçado
+        self.assertLessEqual(longest, gate.min_refresh * self.FPS + 1)
+        stats = gate.stats()
+        self.assertGreater(stats["skip_ratio"], 0.3)
+        self.assertGreater(stats["refreshes"], 0)
+
+    def test_person_appearing_or_leaving_is_counted_on_the_same_frame(self):
+        gate = MotionGate(min_refresh=2.0)
+        agreement, _, longest = self.replay(gate, frames=150,
+                                            people_at=lambda i: [(100, 60, 160, 200)] if 50 <= i < 100 else [])
+        self.assertEqual((agreement, longest), (1.0, 0))
+
+    def test_static_scene_only_runs_on_refresh(self):
+        gate = MotionGate(min_refresh=2.0)
+        self.replay(gate, frames=150, people_at=lambda i: [])
+        stats = gate.stats()
+        # Primeiro frame + um refresh a cada 2s de 10s de vídeo
+        self.assertEqual((stats["inferred"], stats["refreshes"]), (5, 4))
+
+
+def reply_once(reply):
+    """ Servidor TCP que lê um pedido, responde `reply` (bytes crus) e fecha; devolve o endereço """
+    listener = socket.create_server(("127.0.0.1", 0))
+
+    def serve():
+        with listener:
+            conn, _ = listener.accept()
+            with conn:
+                conn.makefile("rb").readline()
+                conn.sendall(reply)
+
+    threading.Thread(target=serve, daemon=True).start()
+    return f"tcp://127.0.0.1:{listener.getsockname()[1]}"
+
+
+class VisionWorkerTests(TestCase):
+    """ Protocolo do worker de visão, sem câmera nem modelos (worker não carregado) """
+
+    def serve(self, address="tcp://127.0.0.1:0"):
+        self.worker = VisionWorker("yolo.pt", "modelo.yml")
+        server = make_server(self.worker, address)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        if isinstance(server, VisionTCPServer):
+            host, port = server.server_address
+            address = f"tcp://{host}:{port}"
+        return VisionClient(address, timeout=2.0)
+
+    def test_ping_answers_before_the_models_load(self):
+        client = self.serve()
+        self.assertEqual(client.ping()["ready"], False)
+        self.assertFalse(client.is_ready())
+        with self.assertRaisesRegex(VisionWorkerUnavailable, "não está pronto"):
+            client.match_face(1)
+        with self.assertRaisesRegex(VisionWorkerUnavailable, "desconhecido"):
+            client.call("reboot")
+        self.worker.ready = True
+        self.assertTrue(client.is_ready())
+        # O próprio stats já entra na conta
+        self.assertEqual(client.stats()["requests"], 6)
+
+    @skipUnless(hasattr(socket, "AF_UNIX"), "sem Unix socket")
+    def test_unix_socket_replaces_a_stale_file(self):
+        path = os.path.join(tempfile.mkdtemp(prefix="django_yolo_vision_"), "vision.sock")
+        open(path, "w").close()
+        self.assertEqual(self.serve(path).ping()["ok"], True)
+
+    def test_server_options_do_not_leak_into_socketserver(self):
+        self.serve()
+        self.assertTrue(VisionTCPServer.allow_reuse_address)
+        self.assertFalse(socketserver.ThreadingTCPServer.allow_reuse_address)
+        self.assertFalse(socketserver.ThreadingTCPServer.daemon_threads)
+
+    def test_invalid_request_gets_an_error_line(self):
+        client = self.serve()
+        host, port = client.address[len("tcp://"):].rsplit(":", 1)
+        with socket.create_connection((host, int(port)), timeout=2) as sock:
+            sock.sendall(b"nada\n[]\n")
+            reader = sock.makefile("rb")
+            for _ in range(2):
+                self.assertEqual(json.loads(reader.readline())["error"], "JSON inválido")
+
+    def test_truncated_or_invalid_reply_is_unavailable(self):
+        for reply in [b'{"ok": true, "rea', b'{"ok": true}', b"nada\n", b"[1]\n", b""]:
+            with self.subTest(reply=reply):
+                with self.assertRaises(VisionWorkerUnavailable):
+                    VisionClient(reply_once(reply), timeout=2.0).ping()
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condição não foi atingida a tempo")
+        time.sleep(0.005)
+
+
+class FakeCapture:
+    """
+    cv2.VideoCapture falso: read() espera pelo próximo frame que o teste põe
+    na fila (None é uma leitura com erro) e só desiste depois de `closing`
+    """
+
+    frames = None
+    closing = None
+
+    def __init__(self, source):
+        self.released = False
+
+    def isOpened(self):
+        return True
+
+    def set(self, prop, value):
+        return True
+
+    def read(self):
+        while not self.closing.is_set():
+            try:
+                frame = self.frames.get(timeout=0.01)
+            except queue.Empty:
+                continue
+            return frame is not None, frame
+        return False, None
+
+    def release(self):
+        self.released = True
+
+
+class FrameGrabberTests(TestCase):
+    def setUp(self):
+        FakeCapture.frames, FakeCapture.closing = queue.Queue(), threading.Event()
+        patcher = mock.patch("app.capture.cv2.VideoCapture", FakeCapture)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.grabber = FrameGrabber(0, buffer_size=2).start()
+        self.addCleanup(self.grabber.stop)
+        self.addCleanup(FakeCapture.closing.set)
+
+    def feed(self, *values):
+        total = self.grabber.frames_read + len(values)
+        for value in values:
+            FakeCapture.frames.put(np.full((4, 4, 3), value, dtype=np.uint8))
+        wait_until(lambda: self.grabber.frames_read == total)
+
+    def test_read_returns_the_newest_frame_and_counts_the_dropped_ones(self):
+        self.feed(1, 2, 3, 4, 5)
+        frame, _ = self.grabber.read(timeout=1)
+        self.assertEqual(frame[0, 0, 0], 5)
+        # 1 a 3 saíram do buffer circular, 4 foi pulado na leitura
+        self.assertEqual(self.grabber.stats()["dropped_frames"], 4)
+
+    def test_a_frame_is_consumed_only_once(self):
+        self.feed(1)
+        self.assertEqual(self.grabber.read(timeout=1)[0][0, 0, 0], 1)
+        self.assertEqual(self.grabber.read(timeout=0.05), (None, None))
+        self.feed(2)
+        self.assertEqual(self.grabber.read(timeout=1)[0][0, 0, 0], 2)
+        self.assertEqual(self.grabber.dropped_frames, 0)
+
+    def test_failed_reads_are_counted(self):
+        FakeCapture.frames.put(None)
+        wait_until(lambda: self.grabber.read_errors == 1)
+        self.feed(7)
+        self.assertEqual(self.grabber.read(timeout=1)[0][0, 0, 0], 7)
+        self.assertEqual(self.grabber.stats()["read_errors"], 1)
+
+    def test_stop_releases_the_camera_and_unblocks_readers(self):
+        cap = self.grabber._cap
+        FakeCapture.closing.set()
+        self.grabber.stop()
+        self.assertTrue(cap.released)
+        start = time.monotonic()
+        self.assertEqual(self.grabber.read(timeout=1), (None, None))
+        self.assertLess(time.monotonic() - start, 0.5)
+
+
+class FakeTensor(np.ndarray):
+    """ Array NumPy com a interface de tensor que o código usa (.cpu().numpy()) """
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return np.asarray(self)
+
+
+class FakeBoxes:
+    """ Boxes do ultralytics: .data (N x 6) e, iterando, uma caixa por vez com cls/conf/xyxy """
+
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        data = np.asarray(self.data, dtype=np.float32).view(FakeTensor)
+        for row in data:
+            yield SimpleNamespace(xyxy=row[None, :4], conf=row[-2:-1], cls=row[-1:])
+
+
+class FakeDetector:
+    """ YOLO falso: um frame de valor n tem n pessoas; guarda os valores de cada lote """
+
+    def __init__(self, hold=False):
+        self.batches = []
+        self.started = threading.Event()
+        # Segura o primeiro lote até release.set(), para acumular pedidos atrás dele
+        self.release = threading.Event()
+        if not hold:
+            self.release.set()
+
+    def __call__(self, frames, **kwargs):
+        values = [int(frame[0, 0, 0]) for frame in frames]
+        self.batches.append(values)
+        self.started.set()
+        self.release.wait(2)
+        # Mais uma caixa de baixa confiança por frame, que o filtro tem que descartar
+        return [SimpleNamespace(boxes=FakeBoxes(np.array([[0, 0, 10, 10, 0.9, 0]] * n + [[0, 0, 5, 5, 0.1, 0]],
+                                                         dtype=np.float32)))
+                for n in values]
+
+
+def frame_with(value):
+    return np.full((4, 4, 3), value, dtype=np.uint8)
+
+
+class InferenceEngineTests(TestCase):
+    def engine(self, model, **kwargs):
+        engine = InferenceEngine(model=model, **kwargs).start()
+        self.addCleanup(engine.stop)
+        return engine
+
+    def test_full_batch_runs_without_waiting_for_the_deadline(self):
+        model = FakeDetector()
+        engine = self.engine(model, max_batch=3, max_latency=5.0)
+        start = time.monotonic()
+        results = engine.infer({"a": frame_with(1), "b": frame_with(2), "c": frame_with(0)}, timeout=2)
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual(model.batches, [[1, 2, 0]])
+        self.assertEqual({camera: r["people_count"] for camera, r in results.items()}, {"a": 1, "b": 2, "c": 0})
+
+    def test_partial_batch_waits_for_max_latency(self):
+        model = FakeDetector()
+        engine = self.engine(model, max_batch=8, max_latency=0.1)
+        start = time.monotonic()
+        result = engine.submit("a", frame_with(1)).result(2)
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+        self.assertGreaterEqual(result["latency"], 0.09)
+        self.assertEqual(model.batches, [[1]])
+
+    def test_concurrent_submits_on_different_frames_get_their_own_boxes(self):
+        model = FakeDetector(hold=True)
+        engine = self.engine(model, max_batch=2, max_latency=0)
+        engine.submit("a", frame_with(1))
+        self.assertTrue(model.started.wait(2))
+        # Enquanto o primeiro lote roda: dois pedidos da mesma câmera com frames diferentes
+        # (duas verificações de acesso em paralelo no worker de visão) e um de c
+        results = {}
+
+        def check(name, value):
+            results[name] = engine.submit("b", frame_with(value)).result(2)["people_count"]
+
+        threads = [threading.Thread(target=check, args=(name, value)) for name, value in [("x", 2), ("y", 3)]]
+        for thread in threads:
+            thread.start()
+        wait_until(lambda: len(engine._pending) == 2)
+        c = engine.submit("c", frame_with(4))
+        model.release.set()
+        for thread in threads:
+            thread.join(2)
+        self.assertEqual(results, {"x": 2, "y": 3})
+        self.assertEqual(c.result(2)["people_count"], 4)
+        # Os mais antigos primeiro, no máximo max_batch por vez
+        self.assertEqual(model.batches[0], [1])
+        self.assertEqual(sorted(model.batches[1]), [2, 3])
+        self.assertEqual(model.batches[2], [4])
+        self.assertEqual(engine.stats()["coalesced"], 0)
+
+    def test_same_frame_is_inferred_once(self):
+        model = FakeDetector(hold=True)
+        engine = self.engine(model, max_latency=0)
+        engine.submit("a", frame_with(1))
+        self.assertTrue(model.started.wait(2))
+        frame = frame_with(2)
+        first, second = engine.submit("b", frame), engine.submit("b", frame)
+        model.release.set()
+        self.assertIs(first.result(2), second.result(2))
+        self.assertEqual(model.batches, [[1], [2]])
+        self.assertEqual(engine.stats()["coalesced"], 1)
+
+    def test_model_error_reaches_every_future(self):
+        def broken(frames, **kwargs):
+            raise RuntimeError("sem GPU")
+
+        engine = self.engine(broken, max_latency=0)
+        with self.assertRaisesRegex(RuntimeError, "sem GPU"):
+            engine.infer({"a": frame_with(1)}, timeout=2)
+
+    def test_stop_cancels_pending_requests(self):
+        engine = self.engine(FakeDetector(), max_batch=8, max_latency=10.0)
+        future = engine.submit("a", frame_with(1))
+        engine.stop()
+        self.assertTrue(future.cancelled())
+        with self.assertRaises(RuntimeError):
+            engine.submit("a", frame_with(1))
+
+
+class FakeGrabber:
+    """ Câmera do loop principal: entrega os frames dados e depois simula o Ctrl+C """
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+        self.stopped = False
+
+    def start(self):
+        return self
+
+    def read(self, timeout=None):
+        if not self.frames:
+            raise KeyboardInterrupt
+        return self.frames.pop(0), time.monotonic()
+
+    def stop(self):
+        self.stopped = True
+
+    def stats(self):
+        return {}
+
+
+class FakePublisher:
+    def __init__(self, *args, **kwargs):
+        self.published = []
+        self.stopped = False
+
+    def start(self):
+        return self
+
+    def publish(self, count, events=()):
+        self.published.append(count)
+
+    def stop(self):
+        self.stopped = True
+
+    def stats(self):
+        return {}
+
+
+class BlockingPreview(PreviewSink):
+    """ Saída de preview travada até release.set(), como um cliente MJPEG lento """
+
+    def __init__(self, fps=100.0):
+        super().__init__(fps)
+        self.release = threading.Event()
+        self.entered = threading.Event()
+        self.frames = []
+
+    def emit(self, frame):
+        self.entered.set()
+        self.release.wait(5)
+        self.frames.append(frame)
+
+
+class PreviewTests(TestCase):
+    def run_main(self, frames):
+        grabber = FakeGrabber(frames)
+        publisher = FakePublisher()
+        patches = [
+            mock.patch.object(yolo_processor, "CAMERA_SOURCES", "0"),
+            mock.patch.object(yolo_processor, "HEADLESS", True),
+            mock.patch.object(yolo_processor, "PREVIEW", ""),
+            mock.patch.object(yolo_processor, "load_model", return_value=FakeDetector()),
+            mock.patch.object(yolo_processor, "FrameGrabber", return_value=grabber),
+            mock.patch.object(yolo_processor, "PresencePublisher", return_value=publisher),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        with mock.patch.object(cv2, "imshow") as imshow, mock.patch.object(cv2, "waitKey") as wait_key, \
+                mock.patch.object(cv2, "destroyAllWindows") as destroy:
+            yolo_processor.main()
+        return grabber, publisher, [imshow, wait_key, destroy]
+
+    def test_headless_main_never_touches_highgui(self):
+        grabber, publisher, highgui = self.run_main([frame_with(2), frame_with(2), frame_with(3)])
+        for call in highgui:
+            call.assert_not_called()
+        self.assertEqual(len(publisher.published), 3)
+        self.assertTrue(grabber.stopped)
+        self.assertTrue(publisher.stopped)
+
+    def test_slow_preview_drops_frames_instead_of_blocking(self):
+        preview = BlockingPreview().start()
+        self.addCleanup(preview.stop)
+        self.addCleanup(preview.release.set)
+        preview.offer(np.full((60, 80, 3), 0, dtype=np.uint8), [], 0)
+        self.assertTrue(preview.entered.wait(2))
+
+        # Com o emit() travado, o loop de captura continua oferecendo sem esperar
+        start = time.monotonic()
+        for value in range(1, 201):
+            preview.offer(np.full((60, 80, 3), value, dtype=np.uint8), [], value)
+        self.assertLess(time.monotonic() - start, 0.5)
+
+        preview.release.set()
+        wait_until(lambda: len(preview.frames) >= 2)
+        time.sleep(0.1)
+        # Só o primeiro e o mais recente saem; os intermediários foram descartados
+        self.assertEqual(len(preview.frames), 2)
+        self.assertEqual(preview.frames[-1][-1, -1, 0], 200)
+
+
+class DatabaseProfileTests(TestCase):
+    """ DB_PROFILE lido de novo a cada teste: o settings.py roda num namespace à parte """
+
+    def load_settings(self, **env):
+        self.path = os.path.join(tempfile.mkdtemp(prefix="django_yolo_db_"), "db.sqlite3")
+        env = {"SQLITE_PATH": self.path, **env}
+        with mock.patch.dict(os.environ, env):
+            if "DB_PROFILE" not in env:
+                os.environ.pop("DB_PROFILE", None)
+            return runpy.run_path(os.path.join(settings.BASE_DIR, "api", "settings.py"))
+
+    def journal_mode(self, database):
+        handler = ConnectionHandler({"default": dict(database)})
+        try:
+            with handler["default"].cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode")
+                return cursor.fetchone()[0]
+        finally:
+            handler.close_all()
+
+    def test_default_keeps_the_rollback_journal(self):
+        values = self.load_settings()
+        self.assertEqual(values["DB_PROFILE"], "sqlite")
+        self.assertEqual(self.journal_mode(values["DATABASES"]["default"]), "delete")
+        self.assertFalse(os.path.exists(self.path + "-wal"))
+
+    def test_wal_is_opt_in(self):
+        values = self.load_settings(DB_PROFILE="sqlite-wal")
+        self.assertEqual(self.journal_mode(values["DATABASES"]["default"]), "wal")
+
+    def test_postgres_profiles(self):
+        database = self.load_settings(DB_PROFILE="postgres", CONN_MAX_AGE="30")["DATABASES"]["default"]
+        self.assertEqual((database["ENGINE"], database["CONN_MAX_AGE"]), ("django.db.backends.postgresql", 30))
+        database = self.load_settings(DB_PROFILE="postgres-pool")["DATABASES"]["default"]
+        self.assertEqual(database["CONN_MAX_AGE"], 0)
+        self.assertIn("pool", database["OPTIONS"])
+
+    def test_unknown_profile_is_refused(self):
+        with self.assertRaisesRegex(ImproperlyConfigured, "DB_PROFILE"):
+            self.load_settings(DB_PROFILE="mysql")
+
+
+@override_settings(CACHES=TEST_CACHES)
+class StatusETagTests(TestCase):
+    URL = "/api/status/"
+
+    def setUp(self):
+        reset_environment_state()
+        load_environment()
+
+    def test_matching_etag_is_not_modified(self):
+        first = self.client.get(self.URL)
+        self.assertEqual(first.status_code, 200)
+        etag = first["ETag"]
+        for header in [etag, f"W/{etag}", f'"outro", {etag}', "*"]:
+            with self.subTest(header=header):
+                response = self.client.get(self.URL, HTTP_IF_NONE_MATCH=header)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b"")
+                self.assertEqual(response["ETag"], etag)
+        self.assertEqual(self.client.get(self.URL, HTTP_IF_NONE_MATCH='"outro"').status_code, 200)
+
+    def test_change_in_the_data_changes_the_etag(self):
+        etag = self.client.get(self.URL)["ETag"]
+        self.client.patch(self.URL, {"people_count": 3}, content_type="application/json")
+        response = self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["vision_count"], 3)
+        # Sem mudança, o ETag novo continua valendo
+        self.assertEqual(self.client.get(self.URL, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class FastReadSerializerTests(TestCase):
+    """ Mesmos bytes que o serializer DRF, inclusive nulos e datas """
+
+    def assertSameBytes(self, fast, drf):
+        self.assertEqual(render_json(fast), JSONRenderer().render(drf))
+
+    def test_logs(self):
+        at = timezone.now().replace(microsecond=123456)
+        Log.objects.bulk_create([
+            Log(event="sem latência", created_at=at),
+            Log(event="acesso", created_at=at.replace(microsecond=0), rfid="AB", outcome="granted", latency_ms=12.5),
+        ])
+        rows = list(Log.objects.order_by("id"))
+        self.assertSameBytes(log_fast.to_list(rows), LogSerializer(rows, many=True).data)
+        with override_settings(TIME_ZONE="America/Sao_Paulo"), timezone.override("America/Sao_Paulo"):
+            self.assertSameBytes(log_fast.to_list(rows), LogSerializer(rows, many=True).data)
+
+    def test_environment_and_users(self):
+        reset_environment_state()
+        env = load_environment()
+        env.last_update = timezone.now().replace(microsecond=5)
+        env.save()
+        env = Environment.objects.get(pk=env.pk)
+        self.assertSameBytes(environment_fast.to_dict(env), EnvironmentSerializer(env).data)
+
+        User.objects.create(name="Sem rosto", rfid="AA")
+        User.objects.create(name="Com rosto", rfid="BB", face_label=3, is_authorized=True)
+        users = list(User.objects.order_by("id"))
+        self.assertSameBytes(FastReadSerializer(UserSerializer).to_list(users), UserSerializer(users, many=True).data)
+
+
+def at(hour, minute=0, second=0):
+    return timezone.make_aware(datetime(2026, 1, 1, hour, minute, second))
+
+
+class TelemetryTests(TestCase):
+    def rollup(self, resolution, bucket):
+        return TelemetryRollup.objects.get(resolution=resolution, bucket=bucket)
+
+    def test_minute_and_hour_buckets_accumulate_across_batches(self):
+        telemetry.write_samples([
+            TelemetrySample(timestamp=at(10, 0, 10), people_count=2, temperature=20.0),
+            TelemetrySample(timestamp=at(10, 0, 50), people_count=4),
+        ])
+        telemetry.write_samples([
+            TelemetrySample(timestamp=at(10, 0, 30), people_count=1, temperature=22.0),
+            TelemetrySample(timestamp=at(10, 1, 5), temperature=18.0),
+        ])
+        minute = self.rollup(TelemetryRollup.MINUTE, at(10, 0))
+        self.assertEqual((minute.samples, minute.occupancy_count, minute.occupancy_sum), (3, 3, 7.0))
+        self.assertEqual((minute.occupancy_min, minute.occupancy_max), (1.0, 4.0))
+        self.assertEqual((minute.temperature_count, minute.temperature_min, minute.temperature_max), (2, 20.0, 22.0))
+        self.assertEqual(minute.humidity_count, 0)
+        self.assertIsNone(minute.humidity_min)
+
+        next_minute = self.rollup(TelemetryRollup.MINUTE, at(10, 1))
+        self.assertEqual((next_minute.samples, next_minute.occupancy_count), (1, 0))
+        self.assertIsNone(next_minute.occupancy_min)
+
+        hour = self.rollup(TelemetryRollup.HOUR, at(10))
+        self.assertEqual((hour.samples, hour.occupancy_sum), (4, 7.0))
+        self.assertEqual((hour.temperature_min, hour.temperature_max, hour.temperature_sum), (18.0, 22.0, 60.0))
+
+    def test_rebuild_recomputes_only_the_given_hours(self):
+        telemetry.write_samples([
+            TelemetrySample(timestamp=at(10, 5), people_count=3),
+            TelemetrySample(timestamp=at(10, 6), people_count=5),
+            TelemetrySample(timestamp=at(12, 0), people_count=7),
+        ])
+        TelemetrySample.objects.filter(people_count=5).delete()
+        # Os agregados ainda contam a amostra apagada até o rebuild
+        self.assertEqual(self.rollup(TelemetryRollup.HOUR, at(10)).samples, 2)
+        telemetry.rebuild_rollups(at(10, 30), at(10, 40))
+        hour = self.rollup(TelemetryRollup.HOUR, at(10))
+        self.assertEqual((hour.samples, hour.occupancy_max), (1, 3.0))
+        self.assertFalse(TelemetryRollup.objects.filter(resolution=TelemetryRollup.MINUTE, bucket=at(10, 6)).exists())
+        self.assertEqual(self.rollup(TelemetryRollup.HOUR, at(12)).samples, 1)
+
+    def test_resolution_follows_the_window(self):
+        start = at(10)
+        self.assertEqual(telemetry.choose_resolution(start, start + timedelta(minutes=15)), "raw")
+        self.assertEqual(telemetry.choose_resolution(start, start + timedelta(minutes=16)), TelemetryRollup.MINUTE)
+        self.assertEqual(telemetry.choose_resolution(start, start + timedelta(days=1)), TelemetryRollup.MINUTE)
+        self.assertEqual(telemetry.choose_resolution(start, start + timedelta(days=2)), TelemetryRollup.HOUR)
+
+    def test_view_reads_the_resolution_for_the_range(self):
+        telemetry.write_samples([
+            TelemetrySample(timestamp=at(10) + timedelta(minutes=5 * i), people_count=i % 3) for i in range(24)
+        ])
+
+        def get(start, end, **params):
+            response = self.client.get("/api/telemetry/", {"start": start.isoformat(), "end": end.isoformat(), **params})
+            self.assertEqual(response.status_code, 200, response.content)
+            return response.json()
+
+        data = get(at(10), at(10, 10))
+        self.assertEqual((data["resolution"], len(data["points"])), ("raw", 2))
+        data = get(at(10), at(12))
+        self.assertEqual((data["resolution"], len(data["points"])), ("minute", 24))
+        data = get(at(10), at(12), resolution="hour")
+        self.assertEqual([p["samples"] for p in data["points"]], [12, 12])
+        self.assertEqual(data["points"][0]["occupancy"], {"min": 0.0, "max": 2.0, "avg": 1.0})
+
+    def test_view_rejects_bad_parameters(self):
+        for params in [{"resolution": "day"}, {"start": "ontem"}, {"start": "2026-02-30T00:00:00"},
+                       {"start": at(12).isoformat(), "end": at(10).isoformat()}]:
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get("/api/telemetry/", params).status_code, 400)
+
+
+def parse_sse(chunk):
+    """ (id, evento, dados) de um evento do text/event-stream """
+    lines = dict(line.split(": ", 1) for line in chunk.decode().strip().split("\n"))
+    return int(lines["id"]), lines["event"], json.loads(lines["data"])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class StatusStreamTests(TestCase):
+    def setUp(self):
+        reset_environment_state()
+        load_environment()
+
+    def run_async(self, broadcaster_, test):
+        """ Roda o teste no loop do async_to_sync e para a task de acompanhamento no fim """
+        async def wrapper():
+            try:
+                await test()
+            finally:
+                if broadcaster_._task is not None:
+                    broadcaster_._task.cancel()
+                    await asyncio.gather(broadcaster_._task, return_exceptions=True)
+        async_to_sync(wrapper)()
+
+    async def change(self, broadcaster_, **fields):
+        await sync_to_async(environment_state.update)(**fields)
+        await broadcaster_.refresh()
+
+    def test_each_change_is_sent_once_to_every_subscriber(self):
+        stream = StatusBroadcaster(poll_interval=60, queue_size=8, heartbeat=60)
+
+        async def test():
+            first, second = await stream.subscribe(), await stream.subscribe()
+            for subscriber in (first, second):
+                _, event, data = parse_sse(subscriber.queue.get_nowait())
+                self.assertEqual((event, data["vision_count"]), ("snapshot", 0))
+            await self.change(stream, vision_count=2)
+            chunks = [first.queue.get_nowait(), second.queue.get_nowait()]
+            # Serializado uma vez: os dois recebem os mesmos bytes
+            self.assertIs(chunks[0], chunks[1])
+            _, event, delta = parse_sse(chunks[0])
+            self.assertEqual(event, "delta")
+            self.assertEqual(delta["vision_count"], 2)
+            self.assertNotIn("temperature", delta)
+            # Sem mudança, nada sai
+            await stream.refresh()
+            self.assertTrue(first.queue.empty())
+            self.assertEqual(stream.stats()["subscribers"], 2)
+
+        self.run_async(stream, test)
+
+    def test_slow_subscriber_gets_a_snapshot_instead_of_unbounded_deltas(self):
+        stream = StatusBroadcaster(poll_interval=60, queue_size=2, heartbeat=60)
+
+        async def test():
+            slow = await stream.subscribe()
+            for count in range(1, 6):
+                await self.change(stream, vision_count=count)
+            self.assertLessEqual(slow.queue.qsize(), 2)
+            self.assertGreater(slow.resyncs, 0)
+            # O que ficou na fila reconstrói o estado atual, começando por um snapshot
+            chunks = [slow.queue.get_nowait() for _ in range(slow.queue.qsize())]
+            ids = [parse_sse(chunk)[0] for chunk in chunks]
+            self.assertEqual(ids, sorted(ids))
+            _, event, state = parse_sse(chunks[0])
+            self.assertEqual(event, "snapshot")
+            for chunk in chunks[1:]:
+                state.update(parse_sse(chunk)[2])
+            self.assertEqual(state["vision_count"], 5)
+            stream.unsubscribe(slow)
+            self.assertEqual(stream.stats()["resyncs"], slow.resyncs)
+
+        self.run_async(stream, test)
+
+    def test_stream_format_and_keepalive(self):
+        stream = StatusBroadcaster(poll_interval=60, queue_size=8, heartbeat=0.05)
+
+        async def test():
+            subscriber = await stream.subscribe()
+            body = stream.stream(subscriber)
+            chunk = await body.__anext__()
+            self.assertRegex(chunk.decode(), r"^id: \d+\nevent: snapshot\ndata: \{.*\}\n\n$")
+            # Ocioso por mais que o heartbeat: comentário SSE, ignorado pelo EventSource
+            self.assertEqual(await body.__anext__(), b": ping\n\n")
+            await body.aclose()
+            self.assertEqual(stream.stats()["subscribers"], 0)
+
+        self.run_async(stream, test)
+
+    def test_view_streams_the_snapshot(self):
+        async def test():
+            response = await status_stream(RequestFactory().get("/api/status/stream/"))
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+            self.assertEqual(response["Cache-Control"], "no-cache")
+            content = response.streaming_content
+            _, event, data = parse_sse(await content.__anext__())
+            self.assertEqual(event, "snapshot")
+            self.assertIn("people_count", data)
+            await content.aclose()
+
+        self.run_async(broadcaster, test)
+
+
+class PostprocessTests(TestCase):
+    """ extract_boxes contra o laço antigo, caixa por caixa (bench_postprocess.legacy_people_boxes) """
+
+    def result(self, data):
+        return SimpleNamespace(boxes=FakeBoxes(np.asarray(data, dtype=np.float32).reshape(-1, 6).view(FakeTensor)))
+
+    def test_matches_the_per_box_loop(self):
+        rng = np.random.default_rng(0)
+        for num_boxes in [1, 5, 20, 100]:
+            xy = rng.uniform(0, 600, (num_boxes, 2))
+            data = np.column_stack([xy, xy + rng.uniform(10, 200, (num_boxes, 2)),
+                                    rng.uniform(0.1, 1.0, num_boxes), rng.integers(0, 5, num_boxes)])
+            result = self.result(data)
+            with self.subTest(num_boxes=num_boxes):
+                self.assertEqual(box_tuples(extract_boxes(result)), bench_postprocess.legacy_people_boxes(result))
+
+    def test_class_and_confidence_filters(self):
+        result = self.result([
+            [0, 0, 10, 10, 0.9, 0],
+            [0, 0, 10, 10, 0.5, 0],  # no limiar: fora, como no laço (conf > 0.5)
+            [0, 0, 10, 10, 0.9, 1],  # outra classe
+            [5.7, 6.2, 20.9, 30.1, 0.51, 0],
+        ])
+        boxes = extract_boxes(result)
+        self.assertEqual(box_tuples(boxes), [(0, 0, 10, 10), (5, 6, 20, 30)])
+        self.assertEqual(box_tuples(boxes), bench_postprocess.legacy_people_boxes(result))
+        self.assertEqual(boxes["cls"].tolist(), [0, 0])
+        self.assertEqual(len(extract_boxes(result, classes=None, min_conf=0.0)), 4)
+
+    def test_tracking_column_is_skipped(self):
+        # Com track() o YOLO põe o id antes de conf/cls
+        result = SimpleNamespace(boxes=FakeBoxes(np.array([[0, 0, 10, 10, 7, 0.9, 0]], dtype=np.float32)))
+        self.assertEqual(box_tuples(extract_boxes(result)), [(0, 0, 10, 10)])
+
+    def test_empty_results(self):
+        for result in [self.result([]), SimpleNamespace(boxes=None), SimpleNamespace()]:
+            boxes = extract_boxes(result)
+            self.assertEqual((len(boxes), boxes.dtype), (0, empty_boxes().dtype))
+            self.assertEqual(box_tuples(boxes), [])
+        self.assertEqual(bench_postprocess.legacy_people_boxes(self.result([])), [])
+
+    def test_benchmark_refuses_to_time_diverging_outputs(self):
+        result = self.result([[0, 0, 10, 10, 0.9, 0]])
+        with mock.patch.object(bench_postprocess, "fake_result", return_value=result), \
+                mock.patch.object(bench_postprocess, "legacy_people_boxes", return_value=[]):
+            with self.assertRaisesRegex(CommandError, "discordam"):
+                call_command("bench_postprocess", boxes="1", repeat=1, stdout=open(os.devnull, "w"))
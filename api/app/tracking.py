@@ -0,0 +1,291 @@
+import itertools
+import json
+import time
+
+import numpy as np
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """ IoU entre todas as caixas (x1, y1, x2, y2) de A e de B, em uma operação NumPy """
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    if not len(a) or not len(b):
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+def greedy_assignment(iou, threshold):
+    """
+    Associa linhas e colunas pela maior IoU primeiro. Retorna a lista de pares
+    (linha, coluna) com IoU >= threshold; cada linha/coluna aparece no máximo uma vez.
+    """
+    if iou.size == 0:
+        return []
+    rows, cols = np.nonzero(iou >= threshold)
+    order = np.argsort(-iou[rows, cols], kind="stable")
+    used_rows, used_cols, pairs = set(), set(), []
+    for r, c in zip(rows[order], cols[order]):
+        if r in used_rows or c in used_cols:
+            continue
+        used_rows.add(r)
+        used_cols.add(c)
+        pairs.append((int(r), int(c)))
+    return pairs
+
+
+class IoUTracker:
+    """
+    Rastreador simples: a caixa nova herda o id da caixa anterior com maior IoU.
+    Trilhas que não aparecem por `max_age` segundos são descartadas.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_age=5.0):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self._ids = itertools.count(1)
+        self.tracks = {}  # id -> (caixa, último instante visto)
+
+    def update(self, boxes, now=None):
+        """ Recebe as caixas do frame atual e devolve o id da trilha de cada uma """
+        now = time.monotonic() if now is None else now
+        self.tracks = {tid: t for tid, t in self.tracks.items() if now - t[1] <= self.max_age}
+
+        track_ids = list(self.tracks)
+        previous = [self.tracks[tid][0] for tid in track_ids]
+        pairs = greedy_assignment(iou_matrix(boxes, previous), self.iou_threshold)
+        matched = {row: track_ids[col] for row, col in pairs}
+
+        assigned = []
+        for i, box in enumerate(boxes):
+            tid = matched.get(i)
+            if tid is None:
+                tid = next(self._ids)
+            self.tracks[tid] = (tuple(box), now)
+            assigned.append(tid)
+        return assigned
+
+
+def bottom_centers(boxes):
+    """ Ponto do pé de cada caixa (meio da borda de baixo): é o que decide a zona """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    return np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, boxes[:, 3]], axis=1)
+
+
+class SortTracker:
+    """
+    Rastreador no estilo SORT para a contagem de pessoas.
+
+    Cada trilha tem caixa e velocidade (pixels/s, suavizada). A cada frame as
+    caixas são previstas para o instante atual (velocidade constante, no lugar
+    do filtro de Kalman) e associadas às detecções pela IoU, tudo em arrays
+    NumPy. Uma trilha só é confirmada depois de `min_hits` detecções (um falso
+    positivo isolado não vira pessoa) e continua existindo por `max_age`
+    segundos sem ser vista (uma detecção perdida não tira a pessoa da contagem).
+    """
+
+    def __init__(self, iou_threshold=0.3, max_age=1.5, min_hits=3, smoothing=0.5):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.smoothing = smoothing
+        self._ids = itertools.count(1)
+
+        self.ids = np.empty(0, dtype=np.int64)
+        self.boxes = np.empty((0, 4), dtype=np.float32)
+        self.velocity = np.empty((0, 4), dtype=np.float32)
+        self.hits = np.empty(0, dtype=np.int32)
+        self.last_seen = np.empty(0, dtype=np.float64)
+
+    def predict(self, now):
+        dt = (now - self.last_seen).astype(np.float32)[:, None]
+        return self.boxes + self.velocity * dt
+
+    def update(self, boxes, now=None):
+        """
+        Recebe as caixas (x1, y1, x2, y2) do frame e devolve (ids, caixas) das
+        trilhas confirmadas que ainda estão vivas, vistas agora ou há pouco.
+        """
+        now = time.monotonic() if now is None else now
+        detections = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+
+        alive = now - self.last_seen <= self.max_age
+        self.ids, self.boxes, self.velocity = self.ids[alive], self.boxes[alive], self.velocity[alive]
+        self.hits, self.last_seen = self.hits[alive], self.last_seen[alive]
+
+        pairs = greedy_assignment(iou_matrix(detections, self.predict(now)), self.iou_threshold)
+        if pairs:
+            rows, cols = np.array(pairs).T
+            dt = np.maximum(now - self.last_seen[cols], 1e-3).astype(np.float32)[:, None]
+            measured = (detections[rows] - self.boxes[cols]) / dt
+            self.velocity[cols] = self.smoothing * measured + (1 - self.smoothing) * self.velocity[cols]
+            self.boxes[cols] = detections[rows]
+            self.hits[cols] += 1
+            self.last_seen[cols] = now
+
+        unmatched = np.setdiff1d(np.arange(len(detections)), [r for r, _ in pairs])
+        if len(unmatched):
+            self.ids = np.concatenate([self.ids, [next(self._ids) for _ in unmatched]])
+            self.boxes = np.concatenate([self.boxes, detections[unmatched]])
+            self.velocity = np.concatenate([self.velocity, np.zeros((len(unmatched), 4), np.float32)])
+            self.hits = np.concatenate([self.hits, np.ones(len(unmatched), np.int32)])
+            self.last_seen = np.concatenate([self.last_seen, np.full(len(unmatched), now)])
+
+        confirmed = self.hits >= self.min_hits
+        return self.ids[confirmed], self.boxes[confirmed]
+
+
+class Zone:
+    """
+    Região da imagem (polígono em pixels); sem polígono é o frame inteiro.
+    Pontos na borda (até `edge_tolerance` pixels dela) ficam dentro: o pé de
+    quem encosta na borda de baixo da imagem cai exatamente na aresta de uma
+    zona que cobre o frame todo.
+    """
+
+    def __init__(self, name, polygon=None, edge_tolerance=0.5):
+        self.name = name
+        self.polygon = None if polygon is None else np.asarray(polygon, dtype=np.float32).reshape(-1, 2)
+        self.edge_tolerance = edge_tolerance
+
+    def contains(self, points):
+        """ Máscara booleana dos pontos dentro do polígono ou na borda (ray casting vetorizado) """
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        if self.polygon is None:
+            return np.ones(len(points), dtype=bool)
+        x, y = points[:, 0:1], points[:, 1:2]
+        x1, y1 = self.polygon[:, 0], self.polygon[:, 1]
+        x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+        # Arestas que o raio horizontal à direita do ponto atravessa
+        crosses = (y1 > y) != (y2 > y)
+        at_x = x1 + (y - y1) * (x2 - x1) / np.where(y2 != y1, y2 - y1, 1)
+        inside = np.count_nonzero(crosses & (x < at_x), axis=1) % 2 == 1
+
+        # Na borda: perto da reta da aresta e dentro do retângulo que a aresta ocupa
+        tol = self.edge_tolerance
+        dx, dy = x2 - x1, y2 - y1
+        distance = np.abs((x - x1) * dy - (y - y1) * dx) / np.maximum(np.hypot(dx, dy), 1e-6)
+        within = ((x >= np.minimum(x1, x2) - tol) & (x <= np.maximum(x1, x2) + tol)
+                  & (y >= np.minimum(y1, y2) - tol) & (y <= np.maximum(y1, y2) + tol))
+        on_edge = np.any((distance <= tol) & within, axis=1)
+        return inside | on_edge
+
+
+def parse_zones(value):
+    """ Zonas de um JSON {"nome": [[x, y], ...]}; vazio = uma zona com o frame inteiro """
+    if not value:
+        return [Zone("ambiente")]
+    return [Zone(name, polygon) for name, polygon in json.loads(value).items()]
+
+
+def parse_camera_areas(value):
+    """ Área de cada câmera: "0:sala,1:sala,2:corredor" -> {"0": "sala", ...}; vazio = nenhuma """
+    areas = {}
+    for item in value.split(","):
+        camera, _, area = item.partition(":")
+        if camera.strip():
+            areas[camera.strip()] = area.strip()
+    return areas
+
+
+def combine_camera_counts(counts, areas=None):
+    """
+    Ocupação do ambiente a partir da contagem de cada câmera ({câmera: n}).
+
+    Câmeras da mesma área olham as mesmas pessoas de ângulos diferentes: vale
+    a maior contagem entre elas (somar contaria duas vezes quem aparece em
+    duas imagens). Áreas diferentes não se sobrepõem e são somadas. Câmera
+    sem área em `areas` fica na área comum, então sem configuração nenhuma o
+    resultado é a maior contagem.
+    """
+    areas = areas or {}
+    per_area = {}
+    for camera, count in counts.items():
+        area = areas.get(str(camera), "")
+        per_area[area] = max(per_area.get(area, 0), count)
+    return sum(per_area.values())
+
+
+class OccupancyCounter:
+    """
+    Ocupação estável por zona a partir das trilhas do SortTracker.
+
+    Uma trilha só entra numa zona depois de ficar dentro dela por `enter_after`
+    segundos e só sai depois de ficar fora (ou sumir) por `exit_after`
+    segundos. Cada mudança confirmada vira um evento de entrada/saída; a
+    contagem só muda junto com um evento, então não pisca a cada detecção
+    perdida.
+    """
+
+    def __init__(self, zones=None, tracker=None, enter_after=1.0, exit_after=3.0):
+        self.zones = zones or [Zone("ambiente")]
+        self.tracker = tracker or SortTracker()
+        self.enter_after = enter_after
+        self.exit_after = exit_after
+        # (track_id, zona) -> [dentro (confirmado), instante em que o estado observado passou a ser outro]
+        self._state = {}
+        self.events = 0
+
+    def update(self, boxes, now=None):
+        """ Atualiza com as caixas do frame e devolve os eventos confirmados agora """
+        now = time.monotonic() if now is None else now
+        ids, track_boxes = self.tracker.update(boxes, now)
+        feet = bottom_centers(track_boxes)
+
+        observed = {}
+        for zone in self.zones:
+            for track_id, inside in zip(ids.tolist(), zone.contains(feet).tolist()):
+                observed[(track_id, zone.name)] = inside
+        # Trilhas que sumiram contam como fora da zona
+        for key in self._state:
+            observed.setdefault(key, False)
+
+        events = []
+        for key, inside in observed.items():
+            state = self._state.setdefault(key, [False, None])
+            if inside == state[0]:
+                state[1] = None
+                continue
+            if state[1] is None:
+                state[1] = now
+            if now - state[1] >= (self.enter_after if inside else self.exit_after):
+                state[0], state[1] = inside, None
+                events.append({
+                    "type": "entry" if inside else "exit",
+                    "zone": key[1],
+                    "track_id": key[0],
+                    "at": time.time(),
+                })
+
+        # Esquece quem está fora e sem mudança pendente
+        self._state = {key: s for key, s in self._state.items() if s[0] or s[1] is not None}
+        self.events += len(events)
+        return events
+
+    def counts(self):
+        counts = {zone.name: 0 for zone in self.zones}
+        for (_, zone), (inside, _) in self._state.items():
+            counts[zone] += inside
+        return counts
+
+    @property
+    def count(self):
+        """ Pessoas dentro de alguma zona (quem está em duas zonas conta uma vez) """
+        return len({track_id for (track_id, _), (inside, _) in self._state.items() if inside})
+
+    def stats(self):
+        return {
+            "tracks": int(len(self.tracker.ids)),
+            "count": self.count,
+            "zones": self.counts(),
+            "events": self.events,
+        }
@@ -1,7 +1,13 @@
 from django.urls import path
-from .views import PeopleDetectionView, ESP32StatusProxyView
+from .views import PeopleDetectionView, DetectionBatchView, ESP32StatusProxyView, TelemetryView, status_stream, VisionHealthView, LogListView, OccupancyEventView
 
 urlpatterns = [
     path('people-detection/', PeopleDetectionView.as_view(), name='people_detection'),
+    path('people-detection/batch/', DetectionBatchView.as_view(), name='people_detection_batch'),
     path('status/', ESP32StatusProxyView.as_view(), name='esp32_status'),
+    path('status/stream/', status_stream, name='status_stream'),
+    path('occupancy/events/', OccupancyEventView.as_view(), name='occupancy_events'),
+    path('telemetry/', TelemetryView.as_view(), name='telemetry'),
+    path('logs/', LogListView.as_view(), name='logs'),
+    path('vision/health/', VisionHealthView.as_view(), name='vision_health'),
 ]
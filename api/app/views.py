@@ -1,18 +1,45 @@
-import requests
+import base64
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.renderers import JSONRenderer
 from rest_framework import status
-from .models import Environment
-from .serializers import EnvironmentSerializer
+from . import event_log, telemetry
+from .env_cache import CAMERA_COUNTS, environment_state
+from .models import Environment, Log, TelemetrySample
+from .serializers import (environment_fast, environment_json, log_fast, parse_flag, parse_number,
+                          validate_detection_batch, validate_occupancy_events)
+from .streaming import broadcaster
+from .tracking import combine_camera_counts, parse_camera_areas
+from .vision_worker import VisionClient, VisionWorkerUnavailable
+
+def parse_time(value, default):
+    """ Data ISO de um parâmetro da query; sem fuso, usa o fuso do projeto """
+    if not value:
+        return default
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Data inválida: {value}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
 
 class PeopleDetectionView(APIView):
     renderer_classes = [JSONRenderer]
 
     def post(self, request):
         """ Endpoint para atualizar dados de detecção de pessoas """
-        env = Environment.objects.first() or Environment.objects.create()
+        env = environment_state.get()
 
         # Recebe dados adicionais (temperatura, umidade, RFID) e atualiza o modelo Environment
         temperatura = request.data.get("temperatura")
@@ -21,9 +48,124 @@ class PeopleDetectionView(APIView):
         tem_presenca = request.data.get("tem_presenca", False)
 
         if temperatura is not None and umidade is not None and ultimo_rfid is not None:
-            env = env.update_presence(ultimo_rfid, temperatura, umidade, tem_presenca)
+            try:
+                temperatura = parse_number(temperatura)
+                umidade = parse_number(umidade)
+            except (TypeError, ValueError):
+                return Response({"error": "temperatura e umidade devem ser números finitos"},
+                                status=status.HTTP_400_BAD_REQUEST)
+            try:
+                tem_presenca = parse_flag(tem_presenca)
+            except ValueError:
+                return Response({"error": "tem_presenca deve ser true ou false"}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Grava direto no banco (atômico) e traz o resultado para o cache;
+            # antes, o que este processo ainda tinha pendente vai para o banco
+            environment_state.flush()
+            env.update_presence(ultimo_rfid, temperatura, umidade, tem_presenca)
+            env = environment_state.reload_from_db(Environment.PRESENCE_FIELDS)
+            # O vision_count do banco pode estar atrás do cache (write-behind de outro worker)
+            presence = env.people_count > 0 or env.vision_count > 0
+            if env.has_presence != presence:
+                env = environment_state.update(has_presence=presence)
+            telemetry.record(env.people_count, env.temperature, env.humidity, source="people-detection")
+
+        return Response(environment_fast.to_dict(env))
+
+
+def update_camera_counts(counts, latest):
+    """
+    Junta as leituras mais recentes do lote (`latest`, câmera -> leitura) às
+    contagens guardadas. Leitura mais antiga que a guardada não vale; câmera
+    sem leitura há CAMERA_COUNT_TTL segundos sai da soma.
+    """
+    now = time.time()
+    counts = {
+        camera: entry for camera, entry in (counts or {}).items()
+        if now - entry["received"] < settings.CAMERA_COUNT_TTL
+    }
+    for camera, reading in latest.items():
+        at = reading["timestamp"].timestamp()
+        if camera not in counts or at >= counts[camera]["at"]:
+            counts[camera] = {"count": reading["people_count"], "at": at, "received": now}
+    return counts
+
+
+class DetectionBatchView(APIView):
+    """
+    Recebe várias leituras (de uma ou mais câmeras) numa requisição só e grava
+    tudo numa transação com bulk_create. O vision_count do Environment vem da
+    leitura mais recente de cada câmera (combine_camera_counts).
+    """
+    renderer_classes = [JSONRenderer]
+
+    def post(self, request):
+        readings, errors = validate_detection_batch(request.data)
+        if errors:
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        samples = [
+            TelemetrySample(
+                timestamp=r["timestamp"],
+                source=r["camera"],
+                people_count=r["people_count"],
+                temperature=r["temperature"],
+                humidity=r["humidity"],
+            )
+            for r in readings
+        ]
+        telemetry.write_samples(samples)
 
-        return Response(EnvironmentSerializer(env).data)
+        readings.sort(key=lambda r: r["timestamp"])
+        latest = {r["camera"]: r for r in readings if r["people_count"] is not None}
+        temperature = next((r["temperature"] for r in reversed(readings) if r["temperature"] is not None), None)
+        humidity = next((r["humidity"] for r in reversed(readings) if r["humidity"] is not None), None)
+
+        def apply(state):
+            if latest:
+                # A contagem de cada câmera fica no estado compartilhado: um lote
+                # de uma câmera só não apaga a contagem das outras. Câmeras que
+                # se sobrepõem não contam a mesma pessoa duas vezes
+                state[CAMERA_COUNTS] = update_camera_counts(state.get(CAMERA_COUNTS), latest)
+                state["vision_count"] = combine_camera_counts(
+                    {camera: entry["count"] for camera, entry in state[CAMERA_COUNTS].items()},
+                    parse_camera_areas(settings.CAMERA_AREAS),
+                )
+                state["has_presence"] = state["vision_count"] > 0 or state["people_count"] > 0
+            if temperature is not None:
+                state["temperature"] = temperature
+            if humidity is not None:
+                state["humidity"] = humidity
+            state["last_update"] = timezone.now()
+
+        environment_state.update_with(apply)
+        return Response({"accepted": len(samples)}, status=status.HTTP_201_CREATED)
+
+
+def apply_vision_presence(vision_count, has_presence):
+    """
+    Contagem enviada pelo loop de visão. Vai para vision_count e nunca mexe em
+    people_count, que é a ocupação por RFID (Environment.update_presence); a
+    presença da visão não apaga a de quem entrou por RFID. O estado só é
+    regravado se algo mudou.
+    """
+    if vision_count is None and has_presence is None:
+        return environment_state.get()
+
+    def apply(state):
+        changes = {}
+        if vision_count is not None:
+            changes["vision_count"] = vision_count
+        if has_presence is not None:
+            changes["has_presence"] = bool(has_presence) or state["people_count"] > 0
+        if any(state[name] != value for name, value in changes.items()):
+            state.update(changes)
+            state["last_update"] = timezone.now()
+
+    env = environment_state.update_with(apply)
+    if vision_count is not None:
+        telemetry.record(people_count=env.vision_count, source="vision")
+    return env
 
 
 class ESP32StatusProxyView(APIView):
@@ -33,45 +175,202 @@ class ESP32StatusProxyView(APIView):
     renderer_classes = [JSONRenderer]
 
     def patch(self, request):
-        """ Atualiza apenas people_count e has_presence """
-        env = Environment.objects.first() or Environment.objects.create()
+        """
+        Atualiza a ocupação vista pelo loop de visão: o people_count do corpo
+        vai para vision_count (people_count é a ocupação por RFID) e
+        has_presence. Temperatura, umidade e RFID chegam pelo poller do ESP32
+        (poll_esp32).
+        """
+        people_count = request.data.get("people_count")
+        has_presence = request.data.get("has_presence")
+        if has_presence is not None:
+            try:
+                has_presence = parse_flag(has_presence)
+            except ValueError:
+                return Response({"error": "has_presence deve ser true ou false"}, status=status.HTTP_400_BAD_REQUEST)
+        if people_count is not None:
+            try:
+                people_count = int(people_count)
+            except (TypeError, ValueError):
+                people_count = -1
+            if people_count < 0:
+                return Response({"error": "people_count deve ser inteiro >= 0"}, status=status.HTTP_400_BAD_REQUEST)
+            if has_presence is None:
+                has_presence = people_count > 0
+
+        env = apply_vision_presence(people_count, has_presence)
+        return Response(environment_fast.to_dict(env), status=status.HTTP_200_OK)
+
+    def get(self, request):
+        """
+        Retorna o status atual do Environment. Os bytes ficam prontos por
+        version do estado; com If-None-Match igual ao ETag responde 304.
+        """
+        etag, body = environment_json.get()
+        # Comparação fraca (RFC 9110): proxies com gzip trocam o ETag por W/"..."
+        client_etags = {e.removeprefix("W/") for e in parse_etags(request.headers.get("If-None-Match", ""))}
+        if etag in client_etags or "*" in client_etags:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type="application/json")
+        response["ETag"] = etag
+        response["Cache-Control"] = "no-cache"
+        return response
+
+
+class OccupancyEventView(APIView):
+    """
+    Recebe do loop de visão a ocupação estável e os eventos de entrada/saída
+    por zona (OccupancyCounter). Os eventos vão para o Log (tipo "vision") e a
+    contagem vai para o vision_count do Environment, como no PATCH de /api/status/.
+    """
+    renderer_classes = [JSONRenderer]
 
-        # Buscar os dados do ESP32
-        esp32_url = "http://192.168.4.1/status"  # A URL do ESP32
+    def post(self, request):
+        data, errors = validate_occupancy_events(request.data)
+        if errors:
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        for event in data["events"]:
+            action = "Entrada na" if event["type"] == "entry" else "Saída da"
+            camera = f", câmera {event['camera']}" if event["camera"] else ""
+            event_log.record(
+                f"{action} zona {event['zone']} (trilha {event['track_id']}{camera})",
+                event_type=Log.VISION,
+                created_at=event["at"],
+            )
+
+        has_presence = data["has_presence"]
+        if has_presence is None:
+            has_presence = data["people_count"] > 0
+        env = apply_vision_presence(data["people_count"], has_presence)
+        return Response({"accepted": len(data["events"]), "vision_count": env.vision_count},
+                        status=status.HTTP_201_CREATED)
+
+
+async def status_stream(request):
+    """
+    Server-Sent Events com o status do Environment: um "snapshot" completo ao
+    conectar e depois só os campos que mudaram ("delta").
+    """
+    subscriber = await broadcaster.subscribe()
+    response = StreamingHttpResponse(broadcaster.stream(subscriber), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+class VisionHealthView(APIView):
+    """
+    Probe de prontidão do worker de visão: 200 quando os modelos e a câmera
+    estão carregados, 503 caso contrário.
+    """
+    renderer_classes = [JSONRenderer]
+
+    def get(self, request):
+        client = VisionClient(settings.VISION_WORKER_ADDRESS)
+        try:
+            info = client.ping()
+        except VisionWorkerUnavailable as e:
+            return Response({"ready": False, "error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        if not info.get("ready"):
+            return Response(info, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response(info, status=status.HTTP_200_OK)
+
+
+class TelemetryView(APIView):
+    """
+    Histórico de ocupação, temperatura e umidade.
+    GET /api/telemetry/?start=<ISO>&end=<ISO>&resolution=auto|raw|minute|hour
+    Sem start/end: última hora. "auto" escolhe a resolução pela janela.
+    """
+    renderer_classes = [JSONRenderer]
+    RESOLUTIONS = ("auto", "raw", "minute", "hour")
+
+    def get(self, request):
         try:
-            response = requests.get(esp32_url)
-            response.raise_for_status()
-            esp32_data = response.json()  # Dados do ESP32, como temperatura, umidade, RFID, etc.
+            end = parse_time(request.query_params.get("end"), timezone.now())
+            start = parse_time(request.query_params.get("start"), end - timedelta(hours=1))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Atualizando os dados do ambiente
-            temperatura = esp32_data.get('temperatura')
-            umidade = esp32_data.get('umidade')
-            ultimo_rfid = esp32_data.get('ultimo_rfid')
-            tem_presenca = esp32_data.get('tem_presenca')
+        resolution = request.query_params.get("resolution", "auto")
+        if resolution not in self.RESOLUTIONS:
+            return Response({"error": f"resolution deve ser um de {', '.join(self.RESOLUTIONS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if start >= end:
+            return Response({"error": "start deve ser anterior a end"}, status=status.HTTP_400_BAD_REQUEST)
 
-            if temperatura is not None and umidade is not None and ultimo_rfid is not None:
-                # Atualiza os dados no Django
-                env.temperature = temperatura
-                env.humidity = umidade
-                env.last_rfid = ultimo_rfid
-                env.has_presence = tem_presenca
+        resolution, points = telemetry.query(start, end, resolution)
+        return Response({
+            "start": start,
+            "end": end,
+            "resolution": resolution,
+            "points": points,
+        }, status=status.HTTP_200_OK)
 
-                # Se tem presença, atualize o contador de pessoas
-                if tem_presenca:
-                    env.people_count += 1  # Aumenta o contador de pessoas, ou outra lógica que você preferir
 
-                env.last_update = timezone.now()
-                env.save()
+class LogListView(APIView):
+    """
+    Log de eventos, do mais novo para o mais antigo, com paginação por cursor
+    (keyset em created_at, id): cada página custa o mesmo, não importa a
+    profundidade.
+    GET /api/logs/?limit=50&cursor=<next>&event_type=&outcome=&rfid=&start=<ISO>&end=<ISO>
+    """
+    renderer_classes = [JSONRenderer]
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 500
+    FILTERS = ("event_type", "outcome", "rfid")
 
-        except requests.exceptions.RequestException as e:
-            # Trate erros de conexão ou resposta inválida
-            return Response({"error": f"Erro ao conectar com o ESP32: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    @staticmethod
+    def encode_cursor(log):
+        raw = json.dumps([log.created_at.isoformat(), log.pk]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
-        return Response(EnvironmentSerializer(env).data, status=status.HTTP_200_OK)
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            created_at, pk = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            created_at = parse_time(created_at, None)
+            if created_at is None:
+                # [null, 5] ou ["", 5]: sem data não há posição na ordem
+                raise ValueError
+            return created_at, int(pk)
+        except (ValueError, TypeError):
+            raise ValueError("cursor inválido")
 
     def get(self, request):
-        """ Retorna o status atual do Environment """
-        env = Environment.objects.first()
-        if not env:
-            env = Environment.objects.create()
-        return Response(EnvironmentSerializer(env).data, status=status.HTTP_200_OK)
+        params = request.query_params
+        try:
+            limit = min(int(params.get("limit", self.DEFAULT_LIMIT)), self.MAX_LIMIT)
+            if limit < 1:
+                raise ValueError
+        except ValueError:
+            return Response({"error": f"limit deve ser inteiro entre 1 e {self.MAX_LIMIT}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        logs = Log.objects.order_by("-created_at", "-id")
+        try:
+            start = parse_time(params.get("start"), None)
+            end = parse_time(params.get("end"), None)
+            cursor = self.decode_cursor(params["cursor"]) if params.get("cursor") else None
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if start is not None:
+            logs = logs.filter(created_at__gte=start)
+        if end is not None:
+            logs = logs.filter(created_at__lt=end)
+        for name in self.FILTERS:
+            if params.get(name):
+                logs = logs.filter(**{name: params[name]})
+        if cursor is not None:
+            created_at, pk = cursor
+            logs = logs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+        # Um a mais só para saber se existe próxima página
+        rows = list(logs[:limit + 1])
+        next_cursor = self.encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return Response({"results": log_fast.to_list(rows[:limit]), "next": next_cursor},
+                        status=status.HTTP_200_OK)
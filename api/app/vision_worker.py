@@ -0,0 +1,312 @@
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+
+import numpy as np
+
+from .postprocess import box_tuples
+
+# Um processo de longa duração é dono da câmera e dos modelos. Tasks do Celery
+# e views do Django conversam com ele por um socket local (JSON, uma linha por
+# mensagem), então cada verificação de acesso paga só a inferência.
+#
+# Endereço: caminho de um Unix socket, ou "tcp://127.0.0.1:8765" (Windows).
+
+
+class VisionWorkerUnavailable(Exception):
+    pass
+
+
+def default_address():
+    if os.name == "nt":
+        return "tcp://127.0.0.1:8765"
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "vision.sock")
+
+
+def parse_address(address):
+    if address.startswith("tcp://"):
+        host, _, port = address[len("tcp://"):].rpartition(":")
+        return socket.AF_INET, (host or "127.0.0.1", int(port))
+    return socket.AF_UNIX, address
+
+
+class VisionClient:
+    """ Cliente do worker de visão; uma conexão curta por chamada """
+
+    def __init__(self, address=None, timeout=5.0):
+        self.address = address or default_address()
+        self.timeout = timeout
+
+    def call(self, command, timeout=None, **params):
+        family, addr = parse_address(self.address)
+        request = json.dumps({"cmd": command, **params}).encode() + b"\n"
+        try:
+            with socket.socket(family, socket.SOCK_STREAM) as sock:
+                sock.settimeout(timeout or self.timeout)
+                sock.connect(addr)
+                sock.sendall(request)
+                with sock.makefile("rb") as reader:
+                    line = reader.readline()
+        except OSError as e:
+            raise VisionWorkerUnavailable(f"Worker de visão indisponível em {self.address}: {e}") from e
+        if not line:
+            raise VisionWorkerUnavailable("Worker de visão fechou a conexão sem responder")
+        # Sem o "\n" final a conexão caiu no meio da resposta
+        if not line.endswith(b"\n"):
+            raise VisionWorkerUnavailable("Resposta do worker de visão veio truncada")
+        try:
+            response = json.loads(line)
+        except ValueError as e:
+            raise VisionWorkerUnavailable(f"Resposta inválida do worker de visão: {e}") from e
+        if not isinstance(response, dict):
+            raise VisionWorkerUnavailable("Resposta inválida do worker de visão")
+        if not response.get("ok"):
+            raise VisionWorkerUnavailable(response.get("error", "erro desconhecido no worker de visão"))
+        return response
+
+    def ping(self):
+        return self.call("ping", timeout=1.0)
+
+    def is_ready(self):
+        try:
+            return bool(self.ping().get("ready"))
+        except VisionWorkerUnavailable:
+            return False
+
+    def match_face(self, face_id):
+        return self.call("match_face", face_id=face_id)
+
+    def verify_face(self, face_id, max_frames=None, max_seconds=None):
+        """ Decisão por votação em vários frames; ver AccessDecisionEngine """
+        params = {"face_id": face_id}
+        if max_frames is not None:
+            params["max_frames"] = max_frames
+        if max_seconds is not None:
+            params["max_seconds"] = max_seconds
+        return self.call("verify_face", timeout=self.timeout + (max_seconds or 2.0), **params)
+
+    def stats(self):
+        return self.call("stats")
+
+
+class WorkerRequestHandler(socketserver.StreamRequestHandler):
+    """ Uma linha JSON por pedido e uma por resposta; o worker vem do servidor """
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                request = None
+            if isinstance(request, dict):
+                response = self.server.worker.handle(request)
+            else:
+                response = {"ok": False, "error": "JSON inválido"}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+# Os atributos ficam nas subclasses: alterar os do socketserver mudaria todo
+# servidor do processo, inclusive os de outras bibliotecas
+class VisionTCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class VisionUnixServer(socketserver.ThreadingUnixStreamServer):
+        allow_reuse_address = True
+        daemon_threads = True
+
+
+def make_server(worker, address):
+    """ Servidor (ainda parado) que atende `worker` no endereço; um socket antigo no caminho é removido """
+    family, addr = parse_address(address)
+    if family == socket.AF_UNIX:
+        if os.path.exists(addr):
+            os.unlink(addr)
+        server = VisionUnixServer(addr, WorkerRequestHandler)
+    else:
+        server = VisionTCPServer(addr, WorkerRequestHandler)
+    server.worker = worker
+    return server
+
+
+class VisionWorker:
+    """
+    Carrega YOLO, LBPH e Haar uma vez, abre a câmera, faz uma inferência de
+    aquecimento e só então se declara pronto.
+    """
+
+    def __init__(self, yolo_path, recognizer_path, camera_index=0, confidence_threshold=80,
+                 face_cache_ttl=10.0, width=640, height=480, decision_max_frames=15,
+                 decision_max_seconds=2.0, yolo_backend="torch", yolo_imgsz=640, face_model_check_interval=2.0):
+        self.yolo_path = yolo_path
+        self.recognizer_path = recognizer_path
+        self.face_model_check_interval = face_model_check_interval
+        self.camera_index = camera_index
+        self.confidence_threshold = confidence_threshold
+        self.face_cache_ttl = face_cache_ttl
+        self.width = width
+        self.height = height
+        self.decision_max_frames = decision_max_frames
+        self.decision_max_seconds = decision_max_seconds
+        self.yolo_backend = yolo_backend
+        self.yolo_imgsz = yolo_imgsz
+
+        self.ready = False
+        self.started_at = time.monotonic()
+        self.load_time = None
+        self.warmup_time = None
+        self.requests = 0
+        self.errors = 0
+
+        self.engine = None
+        self.grabber = None
+        self.recognizer = None
+        self.matcher = None
+        self.decider = None
+
+    def load(self):
+        import cv2
+        from .access_decision import AccessDecisionEngine
+        from .capture import FrameGrabber
+        from .inference import InferenceEngine, load_model
+        from .recognition import FaceMatcher, HotReloadingRecognizer
+
+        start = time.monotonic()
+        model = load_model(self.yolo_path, backend=self.yolo_backend, imgsz=self.yolo_imgsz)
+        self.recognizer = HotReloadingRecognizer(self.recognizer_path, self.face_model_check_interval).load()
+        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+        eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_eye.xml")
+        if face_cascade.empty() or eye_cascade.empty():
+            raise RuntimeError("Haar cascade não carregou")
+
+        self.engine = InferenceEngine(model=model, max_batch=4, max_latency=0.01).start()
+        self.matcher = FaceMatcher(self.recognizer, face_cascade, self.confidence_threshold,
+                                   cache_ttl=self.face_cache_ttl, eye_cascade=eye_cascade)
+        self.grabber = FrameGrabber(self.camera_index, width=self.width, height=self.height).start()
+        self.decider = AccessDecisionEngine(
+            self.matcher,
+            read_frame=lambda timeout: self.grabber.read(timeout=timeout)[0],
+            detect_people=self.detect_people,
+            confidence_threshold=self.confidence_threshold,
+            max_frames=self.decision_max_frames,
+            max_seconds=self.decision_max_seconds,
+        )
+        self.load_time = time.monotonic() - start
+
+        self.warm_up()
+        # Só depois de pronto: versões novas do modelo passam a ser trocadas em segundo plano
+        self.recognizer.start()
+        self.ready = True
+        return self
+
+    def warm_up(self):
+        """ A primeira inferência aloca buffers e compila kernels; pagamos isso aqui """
+        start = time.monotonic()
+        dummy = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        self.engine.infer({"warmup": dummy}, timeout=60)
+        recognizer = self.matcher.recognizer
+        recognizer.predict(recognizer.prepare(np.zeros((100, 100), dtype=np.uint8), (0, 0, 100, 100)))
+        frame, _ = self.grabber.read(timeout=5.0)
+        if frame is None:
+            raise RuntimeError(f"Câmera {self.camera_index} não entregou frames")
+        self.warmup_time = time.monotonic() - start
+
+    def close(self):
+        self.ready = False
+        if self.recognizer is not None:
+            self.recognizer.stop()
+        if self.grabber is not None:
+            self.grabber.stop()
+        if self.engine is not None:
+            self.engine.stop()
+
+    def detect_people(self, frame):
+        detection = self.engine.infer({self.camera_index: frame}, timeout=10)[self.camera_index]
+        return box_tuples(detection["boxes"])
+
+    # ---------------- Comandos ----------------
+
+    def cmd_ping(self, params):
+        return {
+            "ready": self.ready,
+            "uptime": round(time.monotonic() - self.started_at, 1),
+            "load_time": self.load_time,
+            "warmup_time": self.warmup_time,
+            "backend": self.yolo_backend,
+            "imgsz": self.yolo_imgsz,
+        }
+
+    def cmd_match_face(self, params):
+        start = time.monotonic()
+        frame, _ = self.grabber.read(timeout=2.0)
+        if frame is None:
+            raise RuntimeError("Erro ao ler frame da câmera")
+
+        people_boxes = self.detect_people(frame)
+        matched = self.matcher.match(frame, people_boxes, int(params["face_id"]))
+        return {
+            "match": matched,
+            "people_count": len(people_boxes),
+            "latency_ms": round((time.monotonic() - start) * 1000, 1),
+        }
+
+    def cmd_verify_face(self, params):
+        # O orçamento pode ser reduzido por chamada, nunca aumentado além do configurado
+        max_frames = params.get("max_frames")
+        max_seconds = params.get("max_seconds")
+        return self.decider.decide(
+            int(params["face_id"]),
+            max_frames=int(max_frames) if max_frames is not None else None,
+            max_seconds=float(max_seconds) if max_seconds is not None else None,
+        )
+
+    def cmd_stats(self, params):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "capture": self.grabber.stats() if self.grabber else {},
+            "inference": self.engine.stats() if self.engine else {},
+            "face_cache": self.matcher.stats() if self.matcher else {},
+            "face_model": self.recognizer.stats() if self.recognizer else {},
+            "decisions": self.decider.stats() if self.decider else {},
+        }
+
+    def handle(self, request):
+        self.requests += 1
+        command = request.get("cmd")
+        handler = getattr(self, f"cmd_{command}", None)
+        if handler is None:
+            return {"ok": False, "error": f"comando desconhecido: {command}"}
+        if command != "ping" and not self.ready:
+            return {"ok": False, "error": "worker de visão ainda não está pronto"}
+        try:
+            return {"ok": True, **handler(request)}
+        except Exception as e:
+            self.errors += 1
+            return {"ok": False, "error": str(e)}
+
+    # ---------------- Servidor ----------------
+
+    def serve_forever(self, address=None):
+        address = address or default_address()
+        family, addr = parse_address(address)
+
+        # O socket abre antes de carregar os modelos para o probe responder "not ready"
+        with make_server(self, address) as server:
+            thread = threading.Thread(target=server.serve_forever, name="vision-worker-server", daemon=True)
+            thread.start()
+            try:
+                self.load()
+                print(f"[VISION] Pronto em {address} (carga {self.load_time:.2f}s, aquecimento {self.warmup_time:.2f}s)")
+                thread.join()
+            finally:
+                server.shutdown()
+                self.close()
+                if family == socket.AF_UNIX and os.path.exists(addr):
+                    os.unlink(addr)
@@ -1,80 +1,192 @@
 import os
 import time
-import requests
 import cv2
-from ultralytics import YOLO
+
+from .capture import FrameGrabber, find_working_camera
+from .inference import InferenceEngine, load_model
+from .motion import MotionGate
+from .postprocess import box_tuples
+from .preview import create_preview, draw_detections
+from .publisher import PresencePublisher
+from .tracking import OccupancyCounter, SortTracker, combine_camera_counts, parse_camera_areas, parse_zones
+
+# Executar a partir da pasta api/:  python -m app.yolo_processor
 
 ESP32_STATUS_URL = "http://localhost:8000/api/status/"
+OCCUPANCY_EVENTS_URL = os.environ.get("OCCUPANCY_EVENTS_URL", "http://localhost:8000/api/occupancy/events/")
 
 CONFIDENCE_THRESHOLD = 80
 ID_NAMES = {1: "Israel", 2: "Maria", 3: "João"}
 
+# Câmeras separadas por vírgula (ex: "0,2"); vazio = primeira câmera que funcionar
+CAMERA_SOURCES = os.environ.get("CAMERA_SOURCES", "")
+
+# Sem janela nem desenho (servidores sem monitor). Padrão: headless se não houver DISPLAY
+HEADLESS = os.environ.get("HEADLESS", "" if os.environ.get("DISPLAY") or os.name == "nt" else "1") == "1"
+
+# Preview opcional fora do caminho quente: "mjpeg:8081" ou "file:/tmp/preview.avi"
+PREVIEW = os.environ.get("PREVIEW", "")
+PREVIEW_FPS = float(os.environ.get("PREVIEW_FPS", "5"))
+
+# Reenvia o status mesmo sem mudança a cada HEARTBEAT_INTERVAL segundos
+HEARTBEAT_INTERVAL = float(os.environ.get("PRESENCE_HEARTBEAT", "30"))
+
+# Micro-lotes de inferência quando há mais de uma câmera
+MAX_BATCH = int(os.environ.get("YOLO_MAX_BATCH", "8"))
+MAX_BATCH_LATENCY = float(os.environ.get("YOLO_MAX_BATCH_LATENCY", "0.02"))
+
+# Backend do YOLO (torch, onnx, openvino, int8) e resolução de entrada
+YOLO_BACKEND = os.environ.get("YOLO_BACKEND", "torch")
+YOLO_IMGSZ = int(os.environ.get("YOLO_IMGSZ", "640"))
+
+# Portão de movimento: sem movimento a última detecção é reaproveitada, mas o
+# YOLO roda pelo menos a cada MOTION_MIN_REFRESH segundos. MOTION_GATE=0 desliga
+MOTION_GATE = os.environ.get("MOTION_GATE", "1") == "1"
+MOTION_MIN_REFRESH = float(os.environ.get("MOTION_MIN_REFRESH", "2.0"))
+MOTION_THRESHOLD = int(os.environ.get("MOTION_THRESHOLD", "25"))
+MOTION_MIN_AREA = float(os.environ.get("MOTION_MIN_AREA", "0.01"))
+
+# Contagem por trilhas (SortTracker) e zonas: ZONES='{"porta": [[0, 0], [320, 0], [320, 480], [0, 480]]}'
+# (polígonos em pixels, aplicados a todas as câmeras; vazio = frame inteiro). Entrada/saída só
+# valem depois de OCCUPANCY_ENTER_AFTER/OCCUPANCY_EXIT_AFTER segundos no novo estado
+ZONES = os.environ.get("ZONES", "")
+# Área de cada câmera: "0:sala,2:corredor". Câmeras da mesma área (ou sem área) enxergam as
+# mesmas pessoas e contam pela maior; áreas diferentes são somadas (ver combine_camera_counts)
+CAMERA_AREAS = parse_camera_areas(os.environ.get("CAMERA_AREAS", ""))
+OCCUPANCY_ENTER_AFTER = float(os.environ.get("OCCUPANCY_ENTER_AFTER", "1.0"))
+OCCUPANCY_EXIT_AFTER = float(os.environ.get("OCCUPANCY_EXIT_AFTER", "3.0"))
+TRACK_MAX_AGE = float(os.environ.get("TRACK_MAX_AGE", "1.5"))
+TRACK_MIN_HITS = int(os.environ.get("TRACK_MIN_HITS", "3"))
+
+# De quanto em quanto tempo imprimir as métricas da captura (segundos)
+STATS_INTERVAL = 10
+
 # Caminhos
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-yolo_model = YOLO(os.path.join(BASE_DIR, "yolov8n.pt"))
-recognizer_path = os.path.join(BASE_DIR, "trainer.yml")
-recognizer = cv2.face.LBPHFaceRecognizer_create()
-recognizer.read(recognizer_path)
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
-
-# Câmera
-def find_working_camera(max_index=5):
-    for i in range(max_index + 1):
-        cap = cv2.VideoCapture(i)
-        if cap.isOpened():
-            cap.release()
-            return i
-        cap.release()
-    return None
-
-camera_index = find_working_camera()
-if camera_index is None:
-    raise RuntimeError("Nenhuma câmera funcional encontrada!")
-cap = cv2.VideoCapture(camera_index)
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-
-# Função para enviar PATCH
-def send_presence_to_django(people_count):
+YOLO_MODEL_PATH = os.path.join(BASE_DIR, "yolov8n.pt")
+# Reconhecimento facial fica no worker de visão (vision_worker.py); aqui só a contagem
+
+
+def parse_camera_sources(value):
+    sources = []
+    for item in value.split(","):
+        item = item.strip()
+        if item:
+            sources.append(int(item) if item.isdigit() else item)
+    return sources
+
+
+def main():
+    # Câmeras
+    sources = parse_camera_sources(CAMERA_SOURCES)
+    if not sources:
+        camera_index = find_working_camera()
+        if camera_index is None:
+            raise RuntimeError("Nenhuma câmera funcional encontrada!")
+        sources = [camera_index]
+
+    # A leitura de cada câmera roda em outra thread; aqui só pegamos o frame mais novo
+    grabbers = {source: FrameGrabber(source, width=640, height=480).start() for source in sources}
+    # Um único modelo atende todas as câmeras, em lote
+    yolo_model = load_model(YOLO_MODEL_PATH, backend=YOLO_BACKEND, imgsz=YOLO_IMGSZ)
+    engine = InferenceEngine(model=yolo_model, max_batch=MAX_BATCH, max_latency=MAX_BATCH_LATENCY).start()
+    gates = {
+        source: MotionGate(threshold=MOTION_THRESHOLD, min_area=MOTION_MIN_AREA, min_refresh=MOTION_MIN_REFRESH)
+        for source in sources
+    } if MOTION_GATE else {}
+    last_detections = {}
+    # A ocupação é a das trilhas dentro das zonas, não o número de caixas do frame
+    counters = {
+        source: OccupancyCounter(
+            parse_zones(ZONES),
+            tracker=SortTracker(max_age=TRACK_MAX_AGE, min_hits=TRACK_MIN_HITS),
+            enter_after=OCCUPANCY_ENTER_AFTER,
+            exit_after=OCCUPANCY_EXIT_AFTER,
+        )
+        for source in sources
+    }
+    # O envio para o Django sai de outra thread e só quando a contagem muda ou há eventos
+    publisher = PresencePublisher(ESP32_STATUS_URL, heartbeat=HEARTBEAT_INTERVAL,
+                                  events_url=OCCUPANCY_EVENTS_URL).start()
+    # O preview acompanha só a primeira câmera
+    preview = create_preview(PREVIEW, fps=PREVIEW_FPS)
+    if preview is not None:
+        preview.start()
+    last_stats = time.monotonic()
+
     try:
-        data = {
-            "people_count": people_count,
-            "has_presence": people_count > 0
-        }
-        response = requests.patch(ESP32_STATUS_URL, json=data, timeout=2)
-        if response.status_code != 200:
-            print(f"Falha ao enviar status ({response.status_code}): {response.text}")
-    except Exception as e:
-        print(f"Erro ao enviar status: {e}")
-
-
-# Loop principal
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        continue
-
-    results = yolo_model(frame, verbose=False)
-    people_boxes = []
-
-    for result in results:
-        for box in result.boxes:
-            if int(box.cls[0]) == 0 and float(box.conf[0]) > 0.5:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                people_boxes.append((x1, y1, x2, y2))
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                cv2.putText(frame, "Pessoa", (x1, y1-5),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,255,0), 1)
-
-    people_count = len(people_boxes)
-    send_presence_to_django(people_count)
-
-    cv2.putText(frame, f"Count: {people_count}", (10,30),
-                cv2.FONT_HERSHEY_SIMPLEX, 1, (0,0,255), 2)
-    cv2.imshow("Monitoramento de Pessoas", frame)
-
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
-
-cap.release()
-cv2.destroyAllWindows()
+        # Loop principal
+        while True:
+            frames = {}
+            for source, grabber in grabbers.items():
+                frame, _ = grabber.read(timeout=1.0 / len(grabbers))
+                if frame is not None:
+                    frames[source] = frame
+            if not frames:
+                continue
+
+            # Só vão para o YOLO as câmeras em que algo mudou (ou cuja detecção venceu)
+            pending = {
+                source: frame for source, frame in frames.items()
+                if source not in gates or gates[source].should_infer(frame)
+            }
+            if pending:
+                start = time.monotonic()
+                last_detections.update(engine.infer(pending))
+                elapsed = time.monotonic() - start
+                for source in pending:
+                    if source in gates:
+                        gates[source].record_inference(elapsed / len(pending))
+            detections = last_detections
+            camera_counts = {}
+            events = []
+
+            for source, frame in frames.items():
+                people_boxes = box_tuples(detections[source]["boxes"])
+
+                counter = counters[source]
+                for event in counter.update(people_boxes):
+                    events.append(dict(event, camera=str(source)))
+                camera_count = counter.count
+                camera_counts[source] = camera_count
+
+                if preview is not None and source == sources[0]:
+                    # O preview copia e desenha na thread dele
+                    preview.offer(frame, people_boxes, camera_count)
+                if not HEADLESS:
+                    # Com preview ligado o frame original não pode ser riscado aqui
+                    display = frame.copy() if preview is not None else frame
+                    draw_detections(display, people_boxes, camera_count)
+                    cv2.imshow(f"Monitoramento de Pessoas - {source}", display)
+
+            # Câmeras que se sobrepõem não contam a mesma pessoa duas vezes
+            publisher.publish(combine_camera_counts(camera_counts, CAMERA_AREAS), events)
+
+            if time.monotonic() - last_stats >= STATS_INTERVAL:
+                for grabber in grabbers.values():
+                    print(f"[CAPTURA] {grabber.stats()}")
+                print(f"[INFERENCIA] {engine.stats()}")
+                for source, gate in gates.items():
+                    print(f"[MOVIMENTO] {source}: {gate.stats()}")
+                for source, counter in counters.items():
+                    print(f"[OCUPACAO] {source}: {counter.stats()}")
+                print(f"[PUBLICACAO] {publisher.stats()}")
+                last_stats = time.monotonic()
+
+            if not HEADLESS and cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if preview is not None:
+            preview.stop()
+        publisher.stop()
+        engine.stop()
+        for grabber in grabbers.values():
+            grabber.stop()
+        if not HEADLESS:
+            cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import os
+
+import numpy as np
+
+from faces import FACE_SIZE
+from model_store import DEFAULT_DIR, load_current, mark_stale, publish
+from training import trained_labels, update_cache
+
+# Cadastro incremental: acrescenta ao modelo atual só as fotos novas do dataset.
+#
+# Coloque as fotos em dataset/<Pessoa>/ (pessoa nova ou existente) e rode este
+# script. Os rostos novos passam pelo mesmo cache do training.py e entram no
+# LBPH com update(), que só adiciona histogramas: o custo é proporcional às
+# fotos novas, não ao dataset inteiro. O resultado vira uma versão nova em
+# api/app/face_models/ e a API troca de modelo sozinha.
+#
+# O update() não esquece nada: se fotos foram trocadas ou apagadas, o
+# manifest fica marcado como desatualizado ("stale") e nenhuma versão nova é
+# publicada até um training.py refazer o modelo do zero.
+#
+# Uso: python enroll.py [--dataset dataset] [--models-dir ../api/app/face_models]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Acrescenta as fotos novas de dataset/<Pessoa>/ ao modelo LBPH atual")
+    parser.add_argument("--dataset", default="dataset")
+    parser.add_argument("--cache-dir", default="cache")
+    parser.add_argument("--models-dir", default=DEFAULT_DIR)
+    parser.add_argument("--face-size", type=int, default=FACE_SIZE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    recognizer, manifest = load_current(args.models_dir)
+    if recognizer is None:
+        raise SystemExit(f"[ERRO] Nenhum modelo em {args.models_dir}; rode o training.py primeiro")
+    if manifest["face_size"] != args.face_size:
+        raise SystemExit(f"[ERRO] O modelo atual usa rostos de {manifest['face_size']}px; rode o training.py")
+    if manifest.get("stale"):
+        stale = manifest["stale"]
+        raise SystemExit(f"[ERRO] A versão {manifest['version']} ainda tem amostras de {stale['modified']} fotos "
+                         f"alteradas e {stale['removed']} removidas (desde {stale['since']}); rode o training.py")
+
+    index, labels, stats = update_cache(args.dataset, args.cache_dir, args.face_size, args.workers)
+    print(f"[INFO] {stats['processed']} fotos processadas em {stats['seconds']:.1f}s, {stats['no_face']} sem rosto")
+    if stats["modified"] or stats["removed"]:
+        # O cache já registrou as mudanças: sem a marca no manifest, a próxima
+        # execução não as veria e publicaria por cima das amostras antigas
+        mark_stale(args.models_dir, stats["modified"], stats["removed"])
+        raise SystemExit(f"[ERRO] {stats['modified']} fotos alteradas e {stats['removed']} removidas não saem do "
+                         f"modelo com update(); rode o training.py para refazê-lo")
+
+    added = stats["added"]
+    if not added:
+        print(f"[INFO] Nenhum rosto novo; modelo continua na versão {manifest['version']}")
+        return
+
+    faces, ids = [], []
+    for person, crops in added.items():
+        faces.extend(crops)
+        ids.extend([labels[person]] * len(crops))
+    recognizer.update(faces, np.array(ids, dtype=np.int32))
+
+    new_manifest = publish(recognizer, args.models_dir, trained_labels(labels, index), args.face_size,
+                           manifest["samples"] + len(faces), mode="update")
+    summary = ", ".join(f"{person} +{len(crops)}" for person, crops in added.items())
+    print(f"[INFO] {summary}")
+    print(f"[INFO] Versão {manifest['version']} -> {new_manifest['version']} ({new_manifest['file']}, "
+          f"{new_manifest['samples']} rostos)")
+
+
+if __name__ == "__main__":
+    main()
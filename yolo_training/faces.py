@@ -0,0 +1,86 @@
+import math
+
+import cv2
+import numpy as np
+
+# Recorte e alinhamento de rostos para o LBPH (usado no treino e na captura).
+# Todo rosto sai em tons de cinza, com os olhos na horizontal, histograma
+# equalizado e tamanho FACE_SIZE x FACE_SIZE.
+
+FACE_SIZE = 200
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+# Recortes já alinhados (captura automática do trainer.py): não passam pelo Haar de novo
+ALIGNED_SUFFIX = ".face.png"
+
+_face_cascade = None
+_eye_cascade = None
+
+
+def cascades():
+    """ Carregados uma vez por processo (cada worker do pool tem os seus) """
+    global _face_cascade, _eye_cascade
+    if _face_cascade is None:
+        _face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+        _eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_eye.xml")
+    return _face_cascade, _eye_cascade
+
+
+def detect_largest_face(gray, min_size=60):
+    face_cascade, _ = cascades()
+    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(min_size, min_size))
+    if len(faces) == 0:
+        return None
+    return tuple(int(v) for v in max(faces, key=lambda f: f[2] * f[3]))
+
+
+def detect_eyes(gray, box):
+    """ Centros dos dois olhos (esquerdo, direito) na imagem inteira, ou None """
+    _, eye_cascade = cascades()
+    x, y, w, h = box
+    # Olhos ficam na metade de cima do rosto
+    roi = gray[y:y + h // 2, x:x + w]
+    eyes = eye_cascade.detectMultiScale(roi, scaleFactor=1.1, minNeighbors=5, minSize=(w // 10, w // 10))
+    if len(eyes) < 2:
+        return None
+    eyes = sorted(eyes, key=lambda e: e[2] * e[3], reverse=True)[:2]
+    centers = sorted((x + ex + ew / 2, y + ey + eh / 2) for ex, ey, ew, eh in eyes)
+    (lx, ly), (rx, ry) = centers
+    # Dois "olhos" muito próximos são a mesma detecção duas vezes
+    if rx - lx < w * 0.2:
+        return None
+    return (lx, ly), (rx, ry)
+
+
+def eye_angle(eyes):
+    (lx, ly), (rx, ry) = eyes
+    return math.degrees(math.atan2(ry - ly, rx - lx))
+
+
+def align_face(gray, box, size=FACE_SIZE, eyes=None):
+    """ Recorte do rosto com os olhos nivelados, equalizado e redimensionado """
+    x, y, w, h = box
+    eyes = eyes if eyes is not None else detect_eyes(gray, box)
+    if eyes is not None:
+        # Gira a imagem em torno do centro do rosto até os olhos ficarem na horizontal
+        center = (x + w / 2, y + h / 2)
+        rotation = cv2.getRotationMatrix2D(center, eye_angle(eyes), 1.0)
+        gray = cv2.warpAffine(gray, rotation, (gray.shape[1], gray.shape[0]), flags=cv2.INTER_LINEAR,
+                              borderMode=cv2.BORDER_REPLICATE)
+    crop = gray[max(0, y):y + h, max(0, x):x + w]
+    crop = cv2.resize(crop, (size, size), interpolation=cv2.INTER_AREA)
+    return cv2.equalizeHist(crop)
+
+
+def load_face(path, size=FACE_SIZE):
+    """ Lê uma foto e devolve o rosto alinhado (uint8 size x size) ou None se não achar rosto """
+    gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        return None
+    if path.endswith(ALIGNED_SUFFIX):
+        if gray.shape != (size, size):
+            gray = cv2.equalizeHist(cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA))
+        return np.ascontiguousarray(gray)
+    box = detect_largest_face(gray)
+    if box is None:
+        return None
+    return np.ascontiguousarray(align_face(gray, box, size))
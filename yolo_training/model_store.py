@@ -0,0 +1,113 @@
+import json
+import os
+import time
+
+import cv2
+
+# Modelos LBPH versionados numa pasta (padrão: api/app/face_models/)
+#
+#   trainer-v0001.yml, trainer-v0002.yml, ...  um arquivo por versão, nunca alterado
+#   manifest.json                               {"version", "file", "face_size", "labels", ...}
+#
+# "stale" no manifest: fotos foram alteradas/removidas depois desta versão e
+# só um treino completo tira as amostras antigas (o enroll.py se recusa a
+# publicar até lá).
+#
+# Cada versão é gravada num arquivo temporário e renomeada (os.replace); o
+# manifest é trocado do mesmo jeito e só depois do modelo, então quem lê o
+# manifest sempre encontra um arquivo completo. Os processos da API acompanham
+# o manifest e trocam de modelo sozinhos (app/recognition.py).
+
+MANIFEST = "manifest.json"
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api", "app", "face_models")
+# Versões antigas mantidas para quem ainda estiver lendo uma delas
+KEEP_VERSIONS = 5
+
+
+def read_manifest(directory):
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def model_file(directory, manifest):
+    return os.path.join(directory, manifest["file"])
+
+
+def load_current(directory):
+    """ (recognizer, manifest) da versão atual, ou (None, None) se nada foi publicado """
+    manifest = read_manifest(directory)
+    if manifest is None:
+        return None, None
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.read(model_file(directory, manifest))
+    return recognizer, manifest
+
+
+def write_atomic_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def publish(recognizer, directory, labels, face_size, samples, mode):
+    """ Grava o modelo como uma versão nova e aponta o manifest para ela """
+    os.makedirs(directory, exist_ok=True)
+    current = read_manifest(directory)
+    version = (current["version"] if current else 0) + 1
+    name = f"trainer-v{version:04d}.yml"
+    path = os.path.join(directory, name)
+
+    # O OpenCV escolhe o formato pela extensão: o temporário também termina em .yml
+    tmp = os.path.join(directory, f".{name}.tmp.yml")
+    recognizer.write(tmp)
+    with open(tmp, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+    manifest = {
+        "version": version,
+        "file": name,
+        "face_size": face_size,
+        "labels": labels,
+        "samples": samples,
+        "mode": mode,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+    write_atomic_json(os.path.join(directory, MANIFEST), manifest)
+    prune(directory, version)
+    return manifest
+
+
+def mark_stale(directory, modified, removed):
+    """
+    Registra no manifest que fotos do dataset mudaram ou sumiram depois da
+    versão atual. O update() do LBPH não tira histogramas, então o modelo
+    segue com as amostras antigas até um training.py completo, que grava um
+    manifest novo sem a marca. A marca soma as mudanças de cada execução:
+    o cache do dataset já foi atualizado e a próxima não as vê de novo.
+    """
+    manifest = read_manifest(directory)
+    stale = manifest.get("stale") or {"modified": 0, "removed": 0, "since": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+    stale["modified"] += modified
+    stale["removed"] += removed
+    manifest["stale"] = stale
+    write_atomic_json(os.path.join(directory, MANIFEST), manifest)
+    return manifest
+
+
+def prune(directory, version, keep=KEEP_VERSIONS):
+    for name in os.listdir(directory):
+        if not (name.startswith("trainer-v") and name.endswith(".yml")):
+            continue
+        try:
+            number = int(name[len("trainer-v"):-len(".yml")])
+        except ValueError:
+            continue
+        if number <= version - keep:
+            os.remove(os.path.join(directory, name))
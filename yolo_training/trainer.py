@@ -1,44 +1,197 @@
-import cv2
+import argparse
 import os
+import time
+from collections import Counter
+
+import cv2
+import numpy as np
+
+from faces import ALIGNED_SUFFIX, FACE_SIZE, align_face, detect_eyes, detect_largest_face, eye_angle
+
+# Captura de fotos de uma pessoa para dataset/<Pessoa>/
+#
+# Modo automático (padrão): cada frame passa por detecção de rosto e só é
+# aproveitado se o rosto for grande o bastante, estiver nítido (variância do
+# Laplaciano), de frente (olhos achados, pouca inclinação e pouco giro) e não
+# for quase igual a uma amostra já salva (dHash de 64 bits, distância de
+# Hamming). Salva apenas o recorte alinhado (<n>.face.png, FACE_SIZE x
+# FACE_SIZE), que o training.py usa direto, sem detectar o rosto de novo.
+#
+# Modo manual (--manual): salva o frame inteiro ao apertar 'c', como antes.
+#
+# Uso: python trainer.py --name Israel [--samples 120] [--camera 0] [--manual]
+
+
+def sharpness(gray):
+    """ Variância do Laplaciano: quanto menor, mais borrada """
+    return cv2.Laplacian(gray, cv2.CV_64F).var()
+
+
+def dhash(face, hash_size=8):
+    """ Hash perceptual: cada bit diz se um pixel é mais claro que o vizinho da direita """
+    small = cv2.resize(face, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class HashIndex:
+    """ Hashes das amostras já salvas; uma nova a menos de `min_distance` bits é repetida """
+
+    def __init__(self, min_distance):
+        self.min_distance = min_distance
+        self.hashes = []
+
+    def is_duplicate(self, value):
+        return any((value ^ h).bit_count() < self.min_distance for h in self.hashes)
+
+    def add(self, value):
+        self.hashes.append(value)
+
+
+def evaluate(gray, args):
+    """ (caixa, recorte alinhado, motivo da rejeição); recorte é None quando rejeitado """
+    box = detect_largest_face(gray)
+    if box is None:
+        return None, None, "sem rosto"
+    x, y, w, h = box
+    if w < args.min_face:
+        return box, None, "rosto pequeno"
+
+    # Nitidez medida sempre no mesmo tamanho, antes da equalização
+    raw = cv2.resize(gray[y:y + h, x:x + w], (args.face_size, args.face_size), interpolation=cv2.INTER_AREA)
+    if sharpness(raw) < args.min_sharpness:
+        return box, None, "borrado"
+
+    eyes = detect_eyes(gray, box)
+    if eyes is None:
+        return box, None, "olhos não encontrados"
+    if abs(eye_angle(eyes)) > args.max_roll:
+        return box, None, "cabeça inclinada"
+    # Rosto virado: o meio dos olhos sai do centro da caixa
+    (lx, _), (rx, _) = eyes
+    if abs((lx + rx) / 2 - (x + w / 2)) / w > args.max_yaw:
+        return box, None, "rosto de lado"
+
+    return box, align_face(gray, box, args.face_size, eyes=eyes), None
+
+
+def load_saved(folder, index):
+    """ Indexa os recortes que já estão na pasta; devolve o próximo número livre """
+    last = 0
+    for name in os.listdir(folder):
+        if not name.endswith(ALIGNED_SUFFIX):
+            continue
+        face = cv2.imread(os.path.join(folder, name), cv2.IMREAD_GRAYSCALE)
+        if face is not None:
+            index.add(dhash(face))
+        stem = name[:-len(ALIGNED_SUFFIX)]
+        if stem.isdigit():
+            last = max(last, int(stem))
+    return last + 1
+
+
+def capture_auto(cap, folder, args):
+    index = HashIndex(args.min_distance)
+    number = load_saved(folder, index)
+    count = len(index.hashes)
+    if count:
+        print(f"[INFO] {count} amostras já existentes em {folder}")
+
+    rejected = Counter()
+    last_saved = 0.0
+    while count < args.samples:
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        box, face, reason = evaluate(gray, args)
+        if face is not None:
+            value = dhash(face)
+            if index.is_duplicate(value):
+                face, reason = None, "repetido"
+            elif time.monotonic() - last_saved < args.interval:
+                face, reason = None, "aguardando"
+
+        if face is not None:
+            path = os.path.join(folder, f"{number:04d}{ALIGNED_SUFFIX}")
+            cv2.imwrite(path, face)
+            index.add(value)
+            number += 1
+            count += 1
+            last_saved = time.monotonic()
+            print(f"[INFO] Amostra {count}/{args.samples} salva em {path}")
+        else:
+            rejected[reason] += 1
+
+        if box is not None:
+            x, y, w, h = box
+            color = (0, 255, 0) if face is not None else (0, 0, 255)
+            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+            if reason:
+                cv2.putText(frame, reason, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        cv2.putText(frame, f"{count}/{args.samples}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 0), 2)
+        cv2.imshow("Captura de Fotos", frame)
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+
+    if rejected:
+        print("[INFO] Frames descartados: " + ", ".join(f"{r} {n}" for r, n in rejected.most_common()))
+    return count
+
 
-# Nome da pessoa (vai ser o nome da pasta)
-person_name = "Israel"
-dataset_path = "dataset"  # pasta onde vai salvar
-num_samples = 120      # número de fotos que você quer capturar
+def capture_manual(cap, folder, args):
+    count = 0
+    while count < args.samples:
+        ret, frame = cap.read()
+        if not ret:
+            break
 
-# Criar pasta da pessoa se não existir
-person_folder = os.path.join(dataset_path, person_name)
-os.makedirs(person_folder, exist_ok=True)
+        # Mostrar a imagem
+        cv2.imshow("Captura de Fotos", frame)
 
-# Abrir webcam
-cap = cv2.VideoCapture(0)  # 0 = câmera interna, mude se quiser usar outra
+        # Salvar foto ao pressionar 'c'
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord('c'):
+            img_path = os.path.join(folder, f"{count+1}.jpg")
+            cv2.imwrite(img_path, frame)
+            print(f"[INFO] Foto {count+1} salva em {img_path}")
+            count += 1
 
-count = 0
+        # Sair com 'q'
+        elif key == ord('q'):
+            break
+    return count
 
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
 
-    # Mostrar a imagem
-    cv2.imshow("Captura de Fotos", frame)
+def main():
+    parser = argparse.ArgumentParser(description="Captura amostras de rosto para dataset/<Pessoa>/")
+    parser.add_argument("--name", default="Israel", help="Nome da pessoa (vira o nome da pasta)")
+    parser.add_argument("--dataset", default="dataset")
+    parser.add_argument("--samples", type=int, default=120, help="Número de amostras desejado")
+    parser.add_argument("--camera", type=int, default=0)
+    parser.add_argument("--manual", action="store_true", help="Salva o frame inteiro ao apertar 'c'")
+    parser.add_argument("--face-size", type=int, default=FACE_SIZE)
+    parser.add_argument("--min-face", type=int, default=120, help="Largura mínima do rosto em pixels")
+    parser.add_argument("--min-sharpness", type=float, default=60.0, help="Variância mínima do Laplaciano")
+    parser.add_argument("--max-roll", type=float, default=15.0, help="Inclinação máxima dos olhos (graus)")
+    parser.add_argument("--max-yaw", type=float, default=0.1,
+                        help="Deslocamento máximo do meio dos olhos em relação ao centro (fração da largura)")
+    parser.add_argument("--min-distance", type=int, default=6, help="Bits de diferença para não ser repetida")
+    parser.add_argument("--interval", type=float, default=0.2, help="Intervalo mínimo entre amostras (s)")
+    args = parser.parse_args()
 
-    # Salvar foto ao pressionar 'c'
-    key = cv2.waitKey(1) & 0xFF
-    if key == ord('c'):
-        img_path = os.path.join(person_folder, f"{count+1}.jpg")
-        cv2.imwrite(img_path, frame)
-        print(f"[INFO] Foto {count+1} salva em {img_path}")
-        count += 1
+    folder = os.path.join(args.dataset, args.name)
+    os.makedirs(folder, exist_ok=True)
 
-    # Sair com 'q'
-    elif key == ord('q'):
-        break
+    cap = cv2.VideoCapture(args.camera)
+    try:
+        count = (capture_manual if args.manual else capture_auto)(cap, folder, args)
+    finally:
+        cap.release()
+        cv2.destroyAllWindows()
+    print(f"[INFO] Captura concluída! {count} amostras em {folder}")
 
-    # Quando atingir o número de fotos
-    if count >= num_samples:
-        break
 
-cap.release()
-cv2.destroyAllWindows()
-print("[INFO] Captura concluída!")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
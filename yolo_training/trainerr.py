@@ -1,9 +1,19 @@
+import os
+import time
+
 import cv2
 import numpy as np
 
-# 1) Carregar reconhecedor treinado
-recognizer = cv2.face.LBPHFaceRecognizer_create()
-recognizer.read("trainer.yml")  # seu arquivo treinado
+from faces import align_face
+from model_store import DEFAULT_DIR, MANIFEST, load_current
+
+# 1) Carregar reconhecedor treinado (versão atual em api/app/face_models/)
+recognizer, manifest = load_current(DEFAULT_DIR)
+if recognizer is None:
+    raise SystemExit("Nenhum modelo publicado; rode o training.py")
+face_size = manifest["face_size"]
+manifest_mtime = os.stat(os.path.join(DEFAULT_DIR, MANIFEST)).st_mtime_ns
+last_check = time.monotonic()
 
 person_name = "israel"  # nome da pessoa treinada
 
@@ -18,11 +28,21 @@ while True:
     if not ret:
         break
 
+    # Versão nova publicada pelo training.py/enroll.py: troca sem fechar a janela
+    if time.monotonic() - last_check > 2:
+        last_check = time.monotonic()
+        mtime = os.stat(os.path.join(DEFAULT_DIR, MANIFEST)).st_mtime_ns
+        if mtime != manifest_mtime:
+            recognizer, manifest = load_current(DEFAULT_DIR)
+            face_size, manifest_mtime = manifest["face_size"], mtime
+            print(f"Modelo atualizado para a versão {manifest['version']}")
+
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
     faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5)
 
     for (x, y, w, h) in faces:
-        face_roi = gray[y:y+h, x:x+w]
+        # Mesmo recorte do treino: olhos nivelados, equalizado, face_size x face_size
+        face_roi = align_face(gray, (x, y, w, h), face_size)
 
         # Reconhecimento
         label, confidence = recognizer.predict(face_roi)
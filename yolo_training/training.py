@@ -1,27 +1,244 @@
-import cv2
+import argparse
+import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
 import numpy as np
 
-# Caminho para o dataset
-dataset_path = "./dataset/israel"
-images = []
-labels = []
+from faces import FACE_SIZE, IMAGE_EXTENSIONS, load_face
+from model_store import DEFAULT_DIR, publish
+
+# Treino do LBPH a partir de dataset/<Pessoa>/*.jpg
+#
+# - Cada pasta em dataset/ é uma pessoa. Os labels ficam fixos em
+#   cache/index.json (o primeiro é 1, como o ID_NAMES da API) e uma pessoa
+#   nova ganha o próximo número, sem mudar os das outras.
+# - As fotos são lidas e os rostos recortados/alinhados num pool de processos.
+# - Os recortes ficam em cache/<Pessoa>.npy (uint8, N x FACE_SIZE x FACE_SIZE),
+#   abertos com memmap. Cada arquivo é lembrado por tamanho e data de
+#   modificação: num novo treino só as fotos novas ou alteradas são
+#   processadas, e só as pessoas que mudaram têm o .npy regravado.
+# - O modelo é publicado como uma versão nova em api/app/face_models/
+#   (model_store.py); a API troca para ela sem reiniciar. Para só acrescentar
+#   fotos novas sem treinar tudo de novo, use enroll.py.
+#
+# Uso: python training.py [--dataset dataset] [--models-dir ../api/app/face_models]
+
+INDEX_VERSION = 1
+
+
+def discover(dataset):
+    """ {pessoa: {caminho relativo: (mtime_ns, tamanho)}} """
+    people = {}
+    for person in sorted(os.listdir(dataset)):
+        folder = os.path.join(dataset, person)
+        if not os.path.isdir(folder):
+            continue
+        files = {}
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                stat = os.stat(os.path.join(folder, name))
+                files[f"{person}/{name}"] = (stat.st_mtime_ns, stat.st_size)
+        if files:
+            people[person] = files
+    return people
+
+
+def load_index(cache_dir, face_size):
+    path = os.path.join(cache_dir, "index.json")
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == INDEX_VERSION and index.get("face_size") == face_size:
+            return index
+        # Outro tamanho de recorte: os .npy não servem, mas os labels continuam
+        return {"version": INDEX_VERSION, "face_size": face_size, "labels": index.get("labels", {}), "people": {}}
+    return {"version": INDEX_VERSION, "face_size": face_size, "labels": {}, "people": {}}
+
+
+def save_index(cache_dir, index):
+    path = os.path.join(cache_dir, "index.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+def assign_labels(index, people):
+    labels = index["labels"]
+    next_label = max(labels.values(), default=0) + 1
+    for person in people:
+        if person not in labels:
+            labels[person] = next_label
+            next_label += 1
+    return labels
+
+
+def npy_path(cache_dir, person):
+    return os.path.join(cache_dir, f"{person}.npy")
+
+
+def open_faces(cache_dir, person):
+    path = npy_path(cache_dir, person)
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode="r")
+
+
+def write_faces(cache_dir, person, rows):
+    """ Grava os recortes de uma pessoa num .npy novo (troca atômica) """
+    path = npy_path(cache_dir, person)
+    tmp = path + ".tmp.npy"
+    size = rows[0].shape if rows else (0, 0)
+    out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.uint8, shape=(len(rows), *size))
+    for i, row in enumerate(rows):
+        out[i] = row
+    out.flush()
+    del out
+    os.replace(tmp, path)
+
+
+def init_worker():
+    # Paralelismo vem do pool; threads internas do OpenCV só disputariam os mesmos núcleos
+    cv2.setNumThreads(1)
+
+
+def load_one(args):
+    path, face_size = args
+    return load_face(path, face_size)
+
+
+def update_cache(dataset, cache_dir, face_size, workers):
+    os.makedirs(cache_dir, exist_ok=True)
+    index = load_index(cache_dir, face_size)
+    people = discover(dataset)
+    labels = assign_labels(index, people)
+
+    # Fotos novas ou alteradas de todas as pessoas vão juntas para o pool
+    todo = []
+    new = set()
+    modified = 0
+    for person, files in people.items():
+        known = index["people"].get(person, {})
+        for rel, (mtime, size) in files.items():
+            entry = known.get(rel)
+            if entry is None:
+                todo.append(rel)
+                new.add(rel)
+            elif entry["mtime"] != mtime or entry["size"] != size:
+                todo.append(rel)
+                modified += 1
+    removed = sum(1 for person, known in index["people"].items()
+                  for rel in known if rel not in people.get(person, {}))
+
+    start = time.monotonic()
+    crops = {}
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+            jobs = [(os.path.join(dataset, rel), face_size) for rel in todo]
+            for rel, crop in zip(todo, pool.map(load_one, jobs, chunksize=8)):
+                crops[rel] = crop
+    elapsed = time.monotonic() - start
+
+    # "added": recortes das fotos novas por pessoa (o enroll.py só precisa deles)
+    stats = {"processed": len(todo), "reused": 0, "no_face": 0, "rewritten": [],
+             "added": {}, "modified": modified, "removed": removed}
+    for person, files in people.items():
+        known = index["people"].get(person, {})
+        has_rows = any(e["row"] is not None for e in known.values())
+        changed = (any(rel in crops for rel in files) or set(known) != set(files)
+                   or has_rows != os.path.exists(npy_path(cache_dir, person)))
+        if not changed:
+            stats["reused"] += len(files)
+            stats["no_face"] += sum(1 for e in known.values() if e["row"] is None)
+            continue
+
+        old = open_faces(cache_dir, person)
+        rows = []
+        entries = {}
+        for rel, (mtime, size) in files.items():
+            if rel in crops:
+                crop = crops[rel]
+            else:
+                # Inalterada: copia o recorte que já estava no cache
+                entry = known[rel]
+                crop = old[entry["row"]] if entry["row"] is not None and old is not None else None
+                stats["reused"] += 1
+            if crop is None:
+                stats["no_face"] += 1
+                entries[rel] = {"mtime": mtime, "size": size, "row": None}
+                continue
+            entries[rel] = {"mtime": mtime, "size": size, "row": len(rows)}
+            rows.append(np.array(crop))
+            if rel in new:
+                stats["added"].setdefault(person, []).append(rows[-1])
+        del old
+        if rows:
+            write_faces(cache_dir, person, rows)
+        elif os.path.exists(npy_path(cache_dir, person)):
+            os.remove(npy_path(cache_dir, person))
+        index["people"][person] = entries
+        stats["rewritten"].append(person)
+
+    # Pessoas cuja pasta sumiu saem do cache (o label fica reservado)
+    for person in set(index["people"]) - set(people):
+        index["people"].pop(person)
+        if os.path.exists(npy_path(cache_dir, person)):
+            os.remove(npy_path(cache_dir, person))
+
+    save_index(cache_dir, index)
+    stats["seconds"] = elapsed
+    return index, labels, stats
+
+
+def load_training_set(cache_dir, index, labels):
+    faces, ids = [], []
+    for person in index["people"]:
+        data = open_faces(cache_dir, person)
+        if data is None or len(data) == 0:
+            continue
+        faces.extend(data[i] for i in range(len(data)))
+        ids.extend([labels[person]] * len(data))
+    return faces, np.array(ids, dtype=np.int32)
+
+
+def trained_labels(labels, index):
+    """ {pessoa: label} de quem tem pasta no dataset (vai para o manifest) """
+    return {person: label for person, label in labels.items() if person in index["people"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Treina o LBPH com os rostos de dataset/<Pessoa>/")
+    parser.add_argument("--dataset", default="dataset")
+    parser.add_argument("--cache-dir", default="cache")
+    parser.add_argument("--models-dir", default=DEFAULT_DIR)
+    parser.add_argument("--output", default=None, help="Cópia opcional do modelo num arquivo avulso")
+    parser.add_argument("--face-size", type=int, default=FACE_SIZE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    index, labels, stats = update_cache(args.dataset, args.cache_dir, args.face_size, args.workers)
+    print(f"[INFO] {stats['processed']} fotos processadas em {stats['seconds']:.1f}s, "
+          f"{stats['reused']} reaproveitadas do cache, {stats['no_face']} sem rosto")
+    if stats["rewritten"]:
+        print(f"[INFO] Cache atualizado: {', '.join(stats['rewritten'])}")
 
-label = 0  # só uma pessoa, então 0
+    faces, ids = load_training_set(args.cache_dir, index, labels)
+    if not faces:
+        raise SystemExit("[ERRO] Nenhum rosto encontrado no dataset")
 
-for filename in os.listdir(dataset_path):
-    if filename.endswith(".jpg") or filename.endswith(".png"):
-        img_path = os.path.join(dataset_path, filename)
-        gray = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-        images.append(gray)
-        labels.append(label)
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.train(faces, ids)
+    if args.output:
+        recognizer.write(args.output)
 
-images = np.array(images)
-labels = np.array(labels)
+    trained = trained_labels(labels, index)
+    manifest = publish(recognizer, args.models_dir, trained, args.face_size, len(faces), mode="train")
+    names = {label: person for person, label in trained.items()}
+    print(f"[INFO] Labels: {names}")
+    print(f"[INFO] Treinamento concluído! {len(faces)} rostos -> {manifest['file']} (versão {manifest['version']})")
 
-# Criar reconhecedor LBPH
-recognizer = cv2.face.LBPHFaceRecognizer_create()
-recognizer.train(images, labels)
 
-recognizer.write("trainer.yml")  # <--- aqui você cria o arquivo
-print("[INFO] Treinamento concluído!")
\ No newline at end of file
+if __name__ == "__main__":
+    main()